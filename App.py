@@ -1,28 +1,85 @@
-import spacy
-import cv2
+import os
 import time
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
-import networkx as nx
-from fer import FER
-from rake_nltk import Rake
-from typing import List, Dict
-from sklearn.neighbors import NearestNeighbors
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator, Optional
+from Memory import DEFAULT_USER, CosineStore, ShardedMemory, disk_shard_factory
+from Diagram import ConceptMapRenderer
+from Cache import TextResponseCache
+from Dedup import dedup_factory
+from Embedding import normalize_text
+from Keyphrase import RakeExtractor
+from Pipeline import PipelineRun, Stage, run_stages
+from Metrics import record_cache, traced
+from Engagement import DEFAULT_ENGAGEMENT, CameraSource, EngagementSampler, FERDetector, GatedDetector
+
+# ----------------------------- LAZY MODEL LOADING -----------------------------
+# spaCy, RAKE/NLTK, FER, cv2 and matplotlib are imported on first use, so
+# importing this module (or starting the CLI) doesn't pay for agents that never run.
+@lru_cache(maxsize=None)
+def get_nlp():
+    import spacy
+    # Triples and sentences need the parser, memory needs tok2vec's doc.vector; tags, lemmas and NER are unused
+    return spacy.load("en_core_web_sm", exclude=["tagger", "attribute_ruler", "lemmatizer", "ner"])
+
+@lru_cache(maxsize=None)
+def get_rake() -> RakeExtractor:
+    # One extractor per process: NLTK's stopword list is read once, the vocabulary is shared across calls
+    return RakeExtractor()
+
+def __getattr__(name):
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ----------------------------- AGENT 1: INPUT AGENT -----------------------------
+@traced("input_agent")
 def input_agent(text: str) -> str:
     return text.strip()
 
 # ----------------------------- AGENT 2: NLP AGENT -----------------------------
-nlp = spacy.load("en_core_web_sm")
+class DocCache:
+    # Bounded LRU of parsed Docs keyed on whitespace-normalized text; repeated questions skip nlp()
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._docs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(self, text: str):
+        key = " ".join(text.split())
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is not None:
+                self._docs.move_to_end(key)
+                self.hits += 1
+                record_cache("nlp_agent", True)
+                return doc
+            self.misses += 1
+            record_cache("nlp_agent", False)
+        doc = get_nlp()(key)
+        with self._lock:
+            self._docs[key] = doc
+            if len(self._docs) > self.maxsize:
+                self._docs.popitem(last=False)
+        return doc
 
-def extract_key_phrases(text: str) -> List[str]:
-    rake = Rake()
-    rake.extract_keywords_from_text(text)
-    return rake.get_ranked_phrases()[:5]
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._docs),
+                "hit_rate": self.hits / total if total else 0.0}
 
-def extract_triples(text: str) -> List[tuple]:
-    doc = nlp(text)
+doc_cache = DocCache()
+
+def extract_key_phrases(doc) -> List[str]:
+    # Same top 5 as rake_nltk's Rake().get_ranked_phrases()[:5] on the doc's sentences
+    return get_rake().ranked_phrases([sent.text for sent in doc.sents], topn=5)
+
+def extract_triples(doc) -> List[tuple]:
     triples = []
     for sent in doc.sents:
         for token in sent:
@@ -33,9 +90,11 @@ def extract_triples(text: str) -> List[tuple]:
                     triples.append((subject[0], token.text, obj[0]))
     return triples
 
-def nlp_agent(text: str) -> Dict:
-    key_terms = extract_key_phrases(text)
-    triples = extract_triples(text)
+@traced("nlp_agent")
+def nlp_agent(text: str, doc=None, key_terms: Optional[List[str]] = None) -> Dict:
+    doc = doc if doc is not None else doc_cache.parse(text)
+    key_terms = key_terms if key_terms is not None else extract_key_phrases(doc)
+    triples = extract_triples(doc)
     topic_type = "process" if "how" in text.lower() else "theory"
     return {
         "key_terms": key_terms,
@@ -43,53 +102,89 @@ def nlp_agent(text: str) -> Dict:
         "topic_type": topic_type
     }
 
+def nlp_fallback(text: str) -> Dict:
+    # What the pipeline uses when parsing or the NLP agent misses its deadline
+    return {"key_terms": [], "triples": [], "topic_type": "process" if "how" in text.lower() else "theory"}
+
+def nlp_agent_batch(texts: Iterable[str], batch_size: int = 64, n_process: int = 1) -> Iterator[Dict]:
+    # Streams one nlp_agent() result per input, in order, parsing through nlp.pipe; key phrases are ranked for
+    # a whole batch of docs at once
+    pairs = ((text, text) for text in texts)
+    parsed = get_nlp().pipe(pairs, as_tuples=True, batch_size=batch_size, n_process=n_process)
+    while True:
+        batch = list(islice(parsed, batch_size))
+        if not batch:
+            return
+        phrases = get_rake().ranked_phrases_many([[sent.text for sent in doc.sents] for doc, _ in batch], topn=5)
+        for (doc, text), key_terms in zip(batch, phrases):
+            yield nlp_agent(text, doc, key_terms)
+
 # ----------------------------- AGENT 3: VISUAL GENERATOR AGENT -----------------------------
-def generate_diagram(key_terms: List[str]):
-    G = nx.DiGraph()
-    for i in range(len(key_terms)):
-        G.add_node(key_terms[i])
-        if i > 0:
-            G.add_edge(key_terms[i - 1], key_terms[i])
-    nx.draw(G, with_labels=True, node_color='skyblue', node_size=2000, font_size=10)
-    plt.title("Concept Map")
-    plt.savefig("concept_map.png")
-    plt.show()
+concept_map_renderer = ConceptMapRenderer()
+
+@traced("generate_diagram")
+def generate_diagram(key_terms: List[str]) -> str:
+    # Headless render to a unique file per term list; concept_map_renderer.render() gives the PNG bytes
+    return concept_map_renderer.render_to_file(key_terms, out_dir="diagrams")
 
 # ----------------------------- AGENT 4: DIALOGUE MEMORY AGENT -----------------------------
-dialogue_memory = []
-memory_embeddings = []
+# One shard per user, so lookups only scan that user's history; DIALOGUE_STORE=<dir> keeps each shard in a
+# memory-mapped store that survives restarts. Every shard is fronted by a MinHash LSH index, so literal and
+# near-literal repeats (Jaccard >= 0.8 on character 5-grams) are found without a vector search or a parse.
+# run_pipeline checks the index first, so an exact repeat that is also in the response cache skips the parse.
+dialogue_memory = ShardedMemory(dedup_factory(disk_shard_factory(os.environ["DIALOGUE_STORE"], "cosine")
+                                              if os.environ.get("DIALOGUE_STORE")
+                                              else lambda user_id: CosineStore(capacity=16)))
 
-def store_dialogue(text: str):
-    doc = nlp(text)
+@traced("store_dialogue")
+def store_dialogue(text: str, doc=None, user_id: str = DEFAULT_USER):
+    doc = doc if doc is not None else doc_cache.parse(text)
     vec = doc.vector
-    dialogue_memory.append(text)
-    memory_embeddings.append(vec)
-
-def retrieve_similar_query(current_text: str):
-    if not memory_embeddings:
-        return None
-    model = NearestNeighbors(n_neighbors=1, metric="cosine").fit(memory_embeddings)
-    current_vec = nlp(current_text).vector.reshape(1, -1)
-    dist, ind = model.kneighbors(current_vec)
-    if dist[0][0] < 0.2:
-        return dialogue_memory[ind[0][0]]
-    return None
+    dialogue_memory.add(user_id, text, vec)
+
+def find_duplicate(text: str, user_id: str = DEFAULT_USER) -> Optional[str]:
+    hit = dialogue_memory.apply(user_id, lambda store: store.find_duplicate(text))
+    return hit[0] if hit else None
+
+@traced("retrieve_similar_query")
+def retrieve_similar_query(current_text: str, threshold: float = 0.2, doc=None, user_id: str = DEFAULT_USER):
+    # Repeats are answered by the MinHash index; only new questions pay for a parse and a vector lookup
+    duplicate = find_duplicate(current_text, user_id)
+    if duplicate is not None:
+        return duplicate
+    doc = doc if doc is not None else doc_cache.parse(current_text)
+    current_vec = doc.vector
+    hits = dialogue_memory.search(user_id, current_vec, k=1, threshold=threshold)
+    return hits[0][0] if hits else None
+
+def retrieve_similar_queries(texts: List[str], threshold: float = 0.2, user_id: str = DEFAULT_USER) -> List:
+    results = [find_duplicate(text, user_id) for text in texts]
+    missing = [i for i, found in enumerate(results) if found is None]
+    if missing:
+        vecs = np.array([doc.vector for doc in get_nlp().pipe(texts[i] for i in missing)])
+        for i, hits in zip(missing, dialogue_memory.search_many(user_id, vecs, k=1, threshold=threshold)):
+            results[i] = hits[0][0] if hits else None
+    return results
 
 # ----------------------------- AGENT 5: ENGAGEMENT MONITOR AGENT -----------------------------
+engagement_sampler = None
+_sampler_lock = threading.Lock()
+
+def start_engagement_sampler(source=None, rate_hz: float = 2.0, window: int = 10) -> EngagementSampler:
+    # One long-running sampler per process; pass FakeFrameSource(frames) to run without a webcam
+    global engagement_sampler
+    with _sampler_lock:
+        if engagement_sampler is None:
+            engagement_sampler = EngagementSampler(source or CameraSource(0),
+                                                   lambda: GatedDetector(FERDetector()), rate_hz, window)
+        return engagement_sampler.start()
+
+@traced("monitor_engagement")
 def monitor_engagement() -> float:
-    detector = FER(mtcnn=True)
-    cap = cv2.VideoCapture(0)
-    ret, frame = cap.read()
-    cap.release()
-    result = detector.detect_emotions(frame)
-    if result:
-        emotion = detector.top_emotion(frame)[0]
-        if emotion in ['happy', 'surprise']: return 0.8
-        elif emotion in ['neutral']: return 0.5
-        else: return 0.2
-    return 0.5
+    return start_engagement_sampler().current_engagement()
 
 # ----------------------------- AGENT 6: ADAPTIVE TEACHING AGENT -----------------------------
+@traced("adaptive_teaching")
 def adaptive_teaching(response: str, engagement_score: float):
     if engagement_score < 0.4:
         return response + "\n(Simplified with visual aid)"
@@ -98,34 +193,112 @@ def adaptive_teaching(response: str, engagement_score: float):
     else:
         return response
 
+# ----------------------------- RESPONSE CACHE -----------------------------
+def model_version() -> str:
+    # Cached answers are only valid for the model that produced them
+    meta = get_nlp().meta
+    return f"{meta.get('name')}-{meta.get('version')}"
+
+# A repeat question (same normalized text) reuses the NLP output, concept map and base response of the earlier
+# one. Keyed by text, not by a cosine threshold: en_core_web_sm's tok2vec doc vectors aren't trained for
+# similarity, and short templated questions ("What is X?") can land within 0.05 of each other.
+response_cache = TextResponseCache(maxsize=1024, version=model_version)
+BASE_RESPONSE = "Here's your explanation based on the input."
+
 # ----------------------------- MAIN SYSTEM FLOW -----------------------------
-def teaching_assistant_pipeline(user_text: str):
+# Per-stage deadlines in seconds, used by run_pipeline(); a stage that misses its deadline is replaced
+# by its fallback. NLP and adaptive teaching are only bounded by the overall budget, if one is given.
+STAGE_BUDGETS = {"engagement": 0.1, "diagram": 0.5, "memory": 0.25}
+
+def run_pipeline(user_text: str, budget: Optional[float] = None,
+                 stage_budgets: Optional[Dict[str, float]] = None, user_id: str = DEFAULT_USER) -> PipelineRun:
+    budgets = STAGE_BUDGETS if stage_budgets is None else stage_budgets
+
     # Input Agent
     input_text = input_agent(user_text)
 
+    # The response cache is keyed on this question's own text only: near-duplicates (MinHash LSH, microseconds)
+    # can differ by the one word that matters ("question 3" / "question 5"), so they only feed the memory note
+    duplicate = find_duplicate(input_text, user_id)
+    cached = response_cache.get(input_text)
+    repeat = duplicate is not None and normalize_text(duplicate) == normalize_text(input_text)
+
+    # Dialogue Memory
+    def memory_stage(parse):
+        if parse is None:
+            return duplicate
+        similar = duplicate
+        if similar is None:
+            similar = retrieve_similar_query(input_text, doc=parse, user_id=user_id)
+        store_dialogue(input_text, parse, user_id)
+        return similar
+
     # NLP Agent
-    parsed = nlp_agent(input_text)
-    print("\n🔍 NLP Agent Output:", parsed)
+    def nlp_stage(parse):
+        return nlp_agent(input_text, parse) if parse is not None else nlp_fallback(input_text)
 
     # Visual Generator
-    generate_diagram(parsed['key_terms'])
+    def diagram_stage(nlp, lookup):
+        if lookup and os.path.exists(lookup["diagram"]):
+            return lookup["diagram"]
+        return generate_diagram(nlp['key_terms'])
 
-    # Dialogue Memory
-    store_dialogue(input_text)
-    similar = retrieve_similar_query(input_text)
-    if similar:
-        print(f"\n🧠 You've asked something similar before: {similar}")
+    # Adaptive Teaching
+    def adaptive_stage(engagement, lookup=None, **_):
+        return adaptive_teaching(lookup["response"] if lookup else BASE_RESPONSE, engagement)
 
-    # Engagement Monitor
-    engagement_score = monitor_engagement()
-    print(f"\n📊 Engagement Score: {engagement_score}")
+    # Engagement starts right away. A cache hit answers from the entry: no NLP agent, and the diagram is the
+    # cached file; if this user asked exactly this before, there's no parse and memory returns that turn.
+    # Otherwise one parse feeds the NLP agent and memory, diagram waits for key terms; adaptive teaching waits
+    # for the rest. Late stages fall back: engagement -> 0.5, diagram -> already-rendered file or none,
+    # memory -> None.
+    stages = [
+        Stage("engagement", monitor_engagement, budget=budgets.get("engagement"), fallback=DEFAULT_ENGAGEMENT),
+        Stage("lookup", lambda: cached),
+    ]
+    if cached is None or not repeat:
+        stages += [Stage("parse", lambda: doc_cache.parse(input_text), budget=budgets.get("parse"), fallback=None),
+                   Stage("memory", memory_stage, ("parse",), budget=budgets.get("memory"), fallback=None)]
+    else:
+        stages.append(Stage("memory", lambda: duplicate))
+    if cached is None:
+        stages.append(Stage("nlp", nlp_stage, ("parse",), budget=budgets.get("nlp"),
+                            fallback=lambda parse: nlp_fallback(input_text)))
+    else:
+        stages.append(Stage("nlp", lambda lookup: lookup["nlp"], ("lookup",)))
+    stages += [
+        Stage("diagram", diagram_stage, ("nlp", "lookup"), budget=budgets.get("diagram"),
+              fallback=lambda nlp, lookup: concept_map_renderer.cached_file(nlp['key_terms'], out_dir="diagrams")),
+        Stage("adaptive", adaptive_stage, ("engagement", "lookup", "diagram", "memory"),
+              budget=budgets.get("adaptive"), fallback=adaptive_stage),
+    ]
+    run = run_stages(stages, budget=budget)
+    response_cache.observe(cached is not None, run.total)
+    if cached is None and run.outputs["parse"] is not None and run.outputs["diagram"] \
+            and not {"parse", "nlp", "diagram"} & run.degraded.keys():  # never cache fallbacks
+        response_cache.put(input_text, {"nlp": run.outputs["nlp"], "diagram": run.outputs["diagram"],
+                                        "response": BASE_RESPONSE})
+    return run
 
-    # Adaptive Teaching
-    response = "Here's your explanation based on the input."
-    final = adaptive_teaching(response, engagement_score)
-    print("\n🤖 Final Response:\n", final)
+def teaching_assistant_pipeline(user_text: str, budget: Optional[float] = None,
+                                stage_budgets: Optional[Dict[str, float]] = None, user_id: str = DEFAULT_USER) -> str:
+    run = run_pipeline(user_text, budget, stage_budgets, user_id)
+    if run.outputs["lookup"]:
+        print("\n⚡ Answered from the response cache")
+    print("\n🔍 NLP Agent Output:", run.outputs["nlp"])
+    if run.outputs["diagram"]:
+        print(f"\n🖼️ Concept Map: {run.outputs['diagram']}")
+    if run.outputs["memory"]:
+        print(f"\n🧠 You've asked something similar before: {run.outputs['memory']}")
+    print(f"\n📊 Engagement Score: {run.outputs['engagement']}")
+    print("\n🤖 Final Response:\n", run.outputs["adaptive"])
+    print(f"\n⏱️ Stage timings: {run.timing_report()}")
+    if run.degraded:
+        print(f"\n⚠️ Degraded stages: {run.degraded}")
+    return run.outputs["adaptive"]
 
 # ----------------------------- RUN -----------------------------
 if __name__ == "__main__":
+    start_engagement_sampler()  # warms up camera and model while the user types
     query = input("Enter your question: ")
     teaching_assistant_pipeline(query)
@@ -0,0 +1,129 @@
+# Assistant API - async /api/assistant/ask on the pooled chat backend (Chat.py), whole answers or SSE token streams,
+# grounded in the student's earlier turns (Context.py). Grounding needs a user_id in the request: questions without
+# one are answered ungrounded and counted as "anonymous" in /api/assistant/stats.
+
+# Requirements:
+# pip install fastapi uvicorn httpx spacy
+# python -m spacy download en_core_web_md   (question vectors for the context; ASSISTANT_CONTEXT_TOKENS=0 skips it)
+# Run: uvicorn Assistant:app --port 8000
+#      CHAT_PROVIDER=stub uvicorn Assistant:app   (with python -m benchmarks.stub_llm running, fully offline)
+
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from Chat import ChatBusy, ChatError, ChatTimeout, backend_from_env
+from Context import builder_from_env
+
+chat_backend = backend_from_env()
+context_builder = builder_from_env()
+questions = {"grounded": 0, "anonymous": 0}
+
+async def get_chat_response(prompt: str, context: str = "") -> str:
+    return await chat_backend.chat(prompt, context)
+
+def stream_chat_response(prompt: str, context: str = ""):
+    return chat_backend.stream(prompt, context)
+
+async def build_context(prompt: str, user_id: Optional[str]) -> str:
+    # Embedding and search are CPU work, so they run off the event loop. Anonymous questions (no user_id) aren't
+    # grounded: one shared history would put one student's answers in another's prompt.
+    if context_builder is None:
+        return ""
+    if user_id is None:
+        questions["anonymous"] += 1
+        return ""
+    questions["grounded"] += 1
+    return (await asyncio.to_thread(context_builder.build, prompt, user_id))["context"]
+
+async def remember(prompt: str, answer: str, user_id: Optional[str]):
+    if context_builder is not None and user_id is not None:
+        await asyncio.to_thread(context_builder.remember, prompt, answer, user_id)
+
+def sse(data: dict, event: Optional[str] = None) -> str:
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
+# ----------------------------- ROUTES -----------------------------
+router = APIRouter(prefix="/api/assistant")
+
+class Query(BaseModel):
+    query: str
+    stream: bool = False
+    user_id: Optional[str] = Field(None, description="Stable id of the student. Their earlier questions and answers "
+                                   "ground this one; without it the answer is not grounded.")
+
+def http_error(exc: ChatError) -> HTTPException:
+    if isinstance(exc, ChatBusy):
+        return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+    if isinstance(exc, ChatTimeout):
+        return HTTPException(status_code=504, detail=str(exc))
+    return HTTPException(status_code=502, detail=str(exc))
+
+@router.post("/ask")
+async def ask(query: Query):
+    # Waiting on the provider yields the event loop instead of holding a threadpool worker
+    if query.stream:
+        return await ask_stream(query.query, query.user_id)
+    context = await build_context(query.query, query.user_id)
+    try:
+        response = await get_chat_response(query.query, context)
+    except ChatError as exc:
+        raise http_error(exc)
+    if response:
+        await remember(query.query, response, query.user_id)
+    return {"answer": response}
+
+async def ask_stream(prompt: str, user_id: Optional[str] = None) -> StreamingResponse:
+    # Server-sent events: one `data: {"token": ...}` per delta as the provider emits it, then `event: done`
+    # with time-to-first-token and total latency. The first token is awaited before responding, so a busy,
+    # slow or failing provider still gets a proper status code; later failures arrive as `event: error`.
+    start = time.perf_counter()
+    tokens = stream_chat_response(prompt, await build_context(prompt, user_id))
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except ChatError as exc:
+        raise http_error(exc)
+    ttft = time.perf_counter() - start
+
+    async def events():
+        parts = []
+        try:
+            if first is not None:
+                parts.append(first)
+                yield sse({"token": first})
+                async for token in tokens:
+                    parts.append(token)
+                    yield sse({"token": token})
+        except ChatError as exc:
+            yield sse({"detail": str(exc)}, event="error")
+            return
+        finally:
+            await tokens.aclose()  # frees the upstream slot even if the client went away mid-stream
+        answer = "".join(parts)
+        if answer:  # an empty answer isn't worth grounding later questions in
+            await remember(prompt, answer, user_id)
+        yield sse({"ttft_ms": ttft * 1000, "total_ms": (time.perf_counter() - start) * 1000}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/stats")
+def stats():
+    return {**chat_backend.stats(), "questions": dict(questions),
+            "context": context_builder.stats() if context_builder is not None else None}
+
+# ----------------------------- APP -----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await chat_backend.aclose()
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(router)
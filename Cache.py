@@ -0,0 +1,271 @@
+# Semantic Response Cache - shared by Main.py and App.py; TTL result cache and singleflight for the chat backend
+
+# Requirements:
+# pip install numpy
+
+
+import asyncio
+import threading
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from Embedding import normalize_text
+from Metrics import Histogram, record_cache
+
+# ----------------------------- RESPONSE CACHE -----------------------------
+class BaseResponseCache(ABC):
+    # Finished pipeline work (NLP output, diagram reference, base response) under at most `maxsize` keys.
+    # Entries are dropped least recently used first, after `ttl` seconds, or all at once when `version()` (the
+    # models in use) changes. Subclasses map a question to a key: _find() on lookup, _slot() on store.
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, version: Callable[[], str] = lambda: ""):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.latency = {"hit": Histogram(), "miss": Histogram()}
+        self._version = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (entry, stored_at), LRU order
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prepare(self, question):
+        return question
+
+    @abstractmethod
+    def _find(self, question) -> Optional[Hashable]:
+        # Key of the stored entry answering `question`, or None; called under the lock
+        ...
+
+    @abstractmethod
+    def _slot(self, question) -> Hashable:
+        # Key to store `question` under, making room if needed; called under the lock
+        ...
+
+    def get(self, question) -> Optional[Dict]:
+        question = self._prepare(question)
+        with self._lock:
+            key = self._find(question)
+            entry = None
+            if key is not None:
+                entry, stored_at = self._entries[key]
+                if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                    self._drop(key)
+                    entry = None
+                elif self.version() != self._version:
+                    self._clear()
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache("response_cache", entry is not None)
+        return entry
+
+    def put(self, question, entry: Dict):
+        question = self._prepare(question)
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+            key = self._slot(question)
+            self._entries[key] = (entry, time.monotonic())
+            self._entries.move_to_end(key)
+
+    def _evict_oldest(self) -> Hashable:
+        key = next(iter(self._entries))
+        self._drop(key)
+        self.evictions += 1
+        return key
+
+    def _drop(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def _clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def observe(self, hit: bool, seconds: float):
+        # End-to-end latency of requests answered from the cache vs through the full pipeline
+        with self._lock:
+            self.latency["hit" if hit else "miss"].record(seconds)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries), "evictions": self.evictions, "invalidations": self.invalidations,
+                "latency_hit": self.latency["hit"].summary(), "latency_miss": self.latency["miss"].summary()}
+
+
+class ResponseCache(BaseResponseCache):
+    # Keyed by question embedding. A lookup is an exact scan over at most `maxsize` slots, so it costs
+    # microseconds; a hit is the nearest entry closer than `threshold` (same metric and vectors as the memory
+    # agent). A threshold <= 0 disables the cache.
+    def __init__(self, threshold: float = 0.05, metric: str = "l2", maxsize: int = 1024,
+                 ttl: Optional[float] = None, version: Callable[[], str] = lambda: ""):
+        if metric not in ("l2", "cosine"):
+            raise ValueError(f"Unknown metric '{metric}', expected 'l2' or 'cosine'")
+        super().__init__(maxsize=maxsize, ttl=ttl, version=version)
+        self.threshold = threshold
+        self.metric = metric
+        self._vectors = None
+        self._sq_norms = np.zeros(maxsize, dtype=np.float32)
+        self._valid = np.zeros(maxsize, dtype=bool)
+
+    def _prepare(self, vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm > 0 else vector
+        return vector
+
+    def _nearest(self, vector: np.ndarray):
+        if self._vectors is None or not self._entries or self._vectors.shape[1] != len(vector):
+            return None, np.inf
+        if self.metric == "cosine":
+            dist = 1.0 - self._vectors @ vector
+        else:
+            dist = self._sq_norms - 2.0 * (self._vectors @ vector) + vector @ vector
+        dist[~self._valid] = np.inf
+        slot = int(np.argmin(dist))
+        return slot, max(0.0, float(dist[slot]))
+
+    def get(self, vector: np.ndarray) -> Optional[Dict]:
+        return super().get(vector) if self.threshold > 0 else None
+
+    def put(self, vector: np.ndarray, entry: Dict):
+        if self.threshold > 0:
+            super().put(vector, entry)
+
+    def _find(self, vector: np.ndarray) -> Optional[int]:
+        slot, dist = self._nearest(vector)
+        return slot if slot is not None and dist < self.threshold else None
+
+    def _slot(self, vector: np.ndarray) -> int:
+        if self._vectors is None or self._vectors.shape[1] != len(vector):
+            self._vectors = np.zeros((self.maxsize, len(vector)), dtype=np.float32)
+            self._valid[:] = False
+            self._entries.clear()
+        slot = self._find(vector)  # refresh a near-identical entry in place
+        if slot is None:
+            free = np.flatnonzero(~self._valid)
+            slot = int(free[0]) if len(free) else self._evict_oldest()
+        self._vectors[slot] = vector
+        self._sq_norms[slot] = vector @ vector
+        self._valid[slot] = True
+        return slot
+
+    def _drop(self, slot: int):
+        self._valid[slot] = False
+        super()._drop(slot)
+
+    def _clear(self):
+        self._valid[:] = False
+        super()._clear()
+
+
+class TextResponseCache(BaseResponseCache):
+    # Keyed by the normalized question text. For vectors not trained for similarity (App.py's en_core_web_sm
+    # tok2vec doc vectors) a distance threshold lets short templated questions collide and serve each other's
+    # answers.
+    def _prepare(self, text: str) -> str:
+        return normalize_text(text)
+
+    def _find(self, key: str) -> Optional[str]:
+        return key if key in self._entries else None
+
+    def _slot(self, key: str) -> str:
+        if key not in self._entries and len(self._entries) >= self.maxsize:
+            self._evict_oldest()
+        return key
+
+# ----------------------------- TTL RESULT CACHE (Chat.py) -----------------------------
+class TTLCache:
+    # Exact-key LRU holding at most `maxsize` values, each for `ttl` seconds; expired entries are dropped lazily
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at), LRU order
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[1] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries), "evictions": self.evictions, "expirations": self.expirations}
+
+# ----------------------------- SINGLEFLIGHT (Chat.py) -----------------------------
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller starts it as a task, callers that
+    # arrive while it runs await the same task. A caller giving up (cancelled, timed out) doesn't cancel it for
+    # the others; errors reach every waiter and are not remembered.
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, so a failure nobody waited for isn't logged as unhandled
+
+    def stats(self) -> Dict:
+        return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self._calls)}
@@ -0,0 +1,278 @@
+# Chat Backend - async, connection-pooled LLM providers behind /api/assistant/ask (Assistant.py)
+
+# Requirements:
+# pip install httpx
+
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from Cache import SingleFlight, TTLCache
+from Metrics import Histogram
+
+# ----------------------------- ERRORS -----------------------------
+class ChatError(Exception):
+    # The provider failed or answered with something we can't use
+    pass
+
+
+class ChatBusy(ChatError):
+    # Every upstream slot stayed taken for longer than queue_timeout
+    pass
+
+
+class ChatTimeout(ChatError):
+    # The provider didn't answer within the request timeout
+    pass
+
+# ----------------------------- PROVIDERS -----------------------------
+class ChatProvider(ABC):
+    # Turns messages into one HTTP request and the JSON answer back into text; the backend owns the connection
+    # pool, limits and timeouts, so a provider is only the wire format. Streaming providers also build a
+    # streaming request and parse its body line by line; with streaming = False those two are never called.
+    base_url = ""
+    streaming = False
+
+    @abstractmethod
+    def request(self, messages: List[Dict], **params) -> Tuple[str, Dict, Dict]:
+        # (path relative to base_url, JSON body, headers)
+        ...
+
+    @abstractmethod
+    def parse(self, data: Dict) -> str:
+        ...
+
+    @abstractmethod
+    def stream_request(self, messages: List[Dict], **params) -> Tuple[str, Dict, Dict]:
+        ...
+
+    @abstractmethod
+    def parse_line(self, line: str) -> Optional[str]:
+        # The text delta carried by one line of a streamed body, or None for keep-alives and bookkeeping
+        ...
+
+
+class OpenAIProvider(ChatProvider):
+    # /chat/completions of the OpenAI API, or of anything that speaks it (vLLM, llama.cpp server, the stub);
+    # with "stream": true the answer arrives as SSE lines "data: {chunk}" ending in "data: [DONE]"
+    streaming = True
+
+    def __init__(self, base_url: str = "https://api.openai.com/v1", model: str = "gpt-4",
+                 api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY", "")
+
+    def request(self, messages: List[Dict], **params) -> Tuple[str, Dict, Dict]:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return "/chat/completions", {"model": self.model, "messages": messages, **params}, headers
+
+    def parse(self, data: Dict) -> str:
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as exc:
+            raise ChatError(f"Unexpected response from {self.base_url}: {data!r:.200}") from exc
+
+    def stream_request(self, messages: List[Dict], **params) -> Tuple[str, Dict, Dict]:
+        path, body, headers = self.request(messages, **params)
+        return path, {**body, "stream": True}, {**headers, "Accept": "text/event-stream"}
+
+    def parse_line(self, line: str) -> Optional[str]:
+        if not line.startswith("data:"):
+            return None
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return None
+        try:
+            return json.loads(payload)["choices"][0]["delta"].get("content") or None
+        except (ValueError, KeyError, IndexError, TypeError) as exc:
+            raise ChatError(f"Unexpected stream chunk from {self.base_url}: {payload!r:.200}") from exc
+
+
+class StubProvider(OpenAIProvider):
+    # The local stand-in from benchmarks/stub_llm.py, for offline development and load tests
+    def __init__(self, base_url: str = "http://127.0.0.1:8001/v1", model: str = "stub"):
+        super().__init__(base_url, model, api_key="")
+
+
+PROVIDERS = {"openai": OpenAIProvider, "stub": StubProvider}
+
+def provider_from_env() -> ChatProvider:
+    # CHAT_PROVIDER=openai|stub, CHAT_BASE_URL and CHAT_MODEL override the provider's defaults
+    name = os.environ.get("CHAT_PROVIDER", "openai")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown chat provider '{name}', expected one of {tuple(PROVIDERS)}")
+    options = {key: os.environ[env] for key, env in (("base_url", "CHAT_BASE_URL"), ("model", "CHAT_MODEL"))
+               if os.environ.get(env)}
+    return PROVIDERS[name](**options)
+
+# ----------------------------- BACKEND -----------------------------
+def request_key(prompt: str, context: str = "", **params) -> str:
+    # Same question modulo case and whitespace, same grounding context and sampling params -> same answer
+    normalized = " ".join(prompt.casefold().split())
+    payload = json.dumps([normalized, context, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ChatBackend:
+    # One pooled httpx.AsyncClient per backend, created on first use (inside the serving event loop, which it is
+    # then bound to): keep-alive connections are reused across requests instead of a TLS handshake per question.
+    # max_concurrency caps upstream calls in flight; a request that can't get a slot within queue_timeout fails
+    # fast with ChatBusy rather than piling up behind a slow provider.
+    # stream() yields text deltas as the provider emits them and records time-to-first-token separately.
+    # chat() coalesces: identical requests (request_key) in flight share one upstream call, and answers are
+    # kept for cache_ttl seconds (cache_size entries, LRU) so a burst of the same question costs one call.
+    # `transport` replaces the network, e.g. httpx.MockTransport in tests.
+    def __init__(self, provider: ChatProvider, max_concurrency: int = 64, max_connections: int = 100,
+                 max_keepalive: int = 20, timeout: float = 30.0, connect_timeout: float = 5.0,
+                 queue_timeout: Optional[float] = 10.0, coalesce: bool = True, cache_ttl: float = 10.0,
+                 cache_size: int = 1024, transport=None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.queue_timeout = queue_timeout
+        self.transport = transport
+        self.requests = 0
+        self.errors = 0
+        self.busy = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.latency = Histogram()
+        self.ttft = Histogram()
+        self.singleflight = SingleFlight() if coalesce else None
+        self.cache = TTLCache(cache_ttl, cache_size) if cache_ttl > 0 else None
+        self._client = None
+        self._semaphore = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.provider.base_url,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout), transport=self.transport)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def chat(self, prompt: str, context: str = "", **params) -> str:
+        messages = [{"role": "system", "content": context}, {"role": "user", "content": prompt}]
+        if self.singleflight is None and self.cache is None:
+            return await self.complete(messages, **params)
+        key = request_key(prompt, context, **params)
+        if self.cache is not None:
+            answer = self.cache.get(key)
+            if answer is not None:
+                return answer
+        if self.singleflight is None:
+            return await self._complete_and_cache(key, messages, params)
+        return await self.singleflight.do(key, lambda: self._complete_and_cache(key, messages, params))
+
+    async def _complete_and_cache(self, key: str, messages: List[Dict], params: Dict) -> str:
+        answer = await self.complete(messages, **params)
+        if self.cache is not None and answer:  # an empty completion is a glitch, not an answer to replay
+            self.cache.put(key, answer)
+        return answer
+
+    async def complete(self, messages: List[Dict], **params) -> str:
+        async with self._upstream() as client:
+            path, body, headers = self.provider.request(messages, **params)
+            response = await client.post(path, json=body, headers=headers)
+            response.raise_for_status()
+            return self.provider.parse(response.json())
+
+    async def stream(self, prompt: str, context: str = "", **params) -> AsyncIterator[str]:
+        # A cached answer comes back as one chunk; live streams aren't shared, each gets its own tokens
+        key = request_key(prompt, context, **params)
+        answer = self.cache.get(key) if self.cache is not None else None
+        if answer is not None:
+            yield answer
+            return
+        messages = [{"role": "system", "content": context}, {"role": "user", "content": prompt}]
+        parts = []
+        async for token in self.stream_complete(messages, **params):
+            parts.append(token)
+            yield token
+        answer = "".join(parts)
+        if self.cache is not None and answer:
+            self.cache.put(key, answer)
+
+    async def stream_complete(self, messages: List[Dict], **params) -> AsyncIterator[str]:
+        if not self.provider.streaming:  # the whole answer as one chunk
+            yield await self.complete(messages, **params)
+            return
+        async with self._upstream() as client:
+            start = time.perf_counter()
+            first = True
+            path, body, headers = self.provider.stream_request(messages, **params)
+            async with client.stream("POST", path, json=body, headers=headers) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    token = self.provider.parse_line(line)
+                    if token is None:
+                        continue
+                    if first:
+                        self.ttft.record(time.perf_counter() - start)
+                        first = False
+                    yield token
+
+    @asynccontextmanager
+    async def _upstream(self):
+        # One upstream call: a concurrency slot, the pooled client, and httpx errors mapped to ChatError
+        import httpx
+        client = self.client
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.busy += 1
+            raise ChatBusy(f"{self.max_concurrency} upstream calls in flight for {self.queue_timeout}s") from None
+        start = time.perf_counter()
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            yield client
+        except httpx.TimeoutException as exc:
+            self.timeouts += 1
+            raise ChatTimeout(f"No answer from {self.provider.base_url} within {self.timeout}s") from exc
+        except (httpx.HTTPError, ValueError) as exc:
+            self.errors += 1
+            raise ChatError(f"{self.provider.base_url}: {exc}") from exc
+        except ChatError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self.latency.record(time.perf_counter() - start)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict:
+        return {"requests": self.requests, "in_flight": self.in_flight, "errors": self.errors, "busy": self.busy,
+                "timeouts": self.timeouts, "latency": self.latency.summary(), "ttft": self.ttft.summary(),
+                "singleflight": self.singleflight.stats() if self.singleflight is not None else None,
+                "cache": self.cache.stats() if self.cache is not None else None}
+
+
+def backend_from_env() -> ChatBackend:
+    # CHAT_MAX_CONCURRENCY, CHAT_MAX_CONNECTIONS, CHAT_TIMEOUT and CHAT_QUEUE_TIMEOUT (seconds) tune the limits;
+    # CHAT_COALESCE=0 turns off singleflight, CHAT_CACHE_TTL=0 the result cache (CHAT_CACHE_SIZE entries)
+    env = os.environ.get
+    return ChatBackend(provider_from_env(), max_concurrency=int(env("CHAT_MAX_CONCURRENCY", 64)),
+                       max_connections=int(env("CHAT_MAX_CONNECTIONS", 100)),
+                       timeout=float(env("CHAT_TIMEOUT", 30.0)),
+                       queue_timeout=float(env("CHAT_QUEUE_TIMEOUT", 10.0)),
+                       coalesce=env("CHAT_COALESCE", "1") != "0", cache_ttl=float(env("CHAT_CACHE_TTL", 10.0)),
+                       cache_size=int(env("CHAT_CACHE_SIZE", 1024)))
@@ -0,0 +1,221 @@
+# Context Builder - grounds /api/assistant/ask (Assistant.py) in the user's earlier turns from dialogue memory,
+# packed under a prompt token budget and laid out so consecutive prompts share a byte-identical prefix
+
+# Requirements:
+# pip install numpy
+# pip install tiktoken   (optional: exact BPE counts; without it a regex approximation is used)
+
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from Memory import DEFAULT_USER, ShardedMemory, VectorIndex, disk_shard_factory
+from Metrics import Histogram
+
+SYSTEM_PROMPT = ("You are a patient teaching assistant. Explain step by step, at the student's level, and stay "
+                 "consistent with what you told this student before.")
+HISTORY_HEADER = "Earlier questions from this student and your answers:"
+SEPARATOR = "\n\n"
+
+# ----------------------------- TOKENIZER -----------------------------
+# Approximates BPE when tiktoken isn't installed: a short word (with its leading space) is one token, longer
+# words one per 6 letters, numbers one per 3 digits, a punctuation run one token
+_PIECE = re.compile(r" ?[^\W\d_]{1,6}| ?\d{1,3}| ?[^\w\s]+| ?_+|\s+")
+
+
+class Tokenizer:
+    # Token counts for budgeting, local and fast: tiktoken's BPE (`encoding`) if it can be loaded, else _PIECE.
+    # Stored turns come back again and again, so their counts are memoized.
+    def __init__(self, encoding: Optional[str] = "cl100k_base", cache_size: int = 4096):
+        self.name = "regex"
+        self._encode = _PIECE.findall
+        if encoding:
+            try:
+                import tiktoken
+                self._encode = tiktoken.get_encoding(encoding).encode_ordinary
+                self.name = encoding
+            except (ImportError, OSError, ValueError):
+                pass
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def encode(self, text: str) -> list:
+        return self._encode(text)
+
+    def _count(self, text: str) -> int:
+        return len(self._encode(text))
+
+
+def common_prefix(a: str, b: str) -> int:
+    # Length of the leading substring a and b share; binary search on slice equality, which compares in C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+# ----------------------------- CONTEXT BUILDER -----------------------------
+def format_turn(prompt: str, answer: str) -> str:
+    return f"Q: {prompt.strip()}\nA: {answer.strip()}"
+
+
+def same_question(turn: str, prompt: str) -> bool:
+    # Whether a format_turn() turn asked `prompt`, modulo case and whitespace like Chat.request_key
+    asked = turn[len("Q: "):].partition("\nA: ")[0]
+    return asked.casefold().split() == prompt.casefold().split()
+
+
+class ContextBuilder:
+    # The system message is SYSTEM_PROMPT, then up to k earlier turns of this user similar to the question
+    # (squared L2 under `threshold` on unit vectors), nearest first until `budget` tokens are spent. The question
+    # itself goes in the user message after it. Providers that cache prompt prefixes (OpenAI, vLLM, llama.cpp)
+    # only reuse a byte-identical start, so the layout never varies: fixed instructions, then the chosen turns in
+    # canonical (sorted) order whatever order the search returned them in, and no scores or timestamps.
+    # cached_tokens counts the tokens each prompt shares with the same user's previous one - what a prefix cache
+    # can skip; trimmed_tokens what the budget kept out. Searches and adds rely on ShardedMemory's per-shard
+    # locking; remember() also holds one of `stripes` per-user locks so two copies of a question can't both pass
+    # the repeat check, and self._lock only guards the builder's own counters and prompt LRU.
+    def __init__(self, memory: ShardedMemory, embed: Callable[[str], np.ndarray], k: int = 4, budget: int = 512,
+                 threshold: Optional[float] = 0.8, tokenizer: Optional[Tokenizer] = None,
+                 system: str = SYSTEM_PROMPT, canonical: bool = True, max_users: int = 10_000, stripes: int = 64):
+        self.memory = memory
+        self.embed = embed
+        self.k = k
+        self.budget = budget
+        self.threshold = threshold
+        self.tokenizer = tokenizer or Tokenizer()
+        self.system = system
+        self.canonical = canonical
+        self.max_users = max_users
+        self.builds = 0
+        self.failures = 0
+        self.repeats = 0
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.context_tokens = 0
+        self.cached_tokens = 0
+        self.trimmed_tokens = 0
+        self.latency = Histogram()
+        self._last: "OrderedDict[str, str]" = OrderedDict()  # user -> previous prompt, LRU order
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(stripes)]
+
+    def retrieve(self, prompt: str, user_id: str = DEFAULT_USER) -> List[str]:
+        vector = self.embed(prompt)
+        hits = self.memory.search(user_id, vector, k=self.k, threshold=self.threshold)
+        return [text for text, _ in hits]
+
+    def pack(self, turns: List[str]) -> tuple:
+        # (chosen turns, their tokens, tokens left out); a turn that doesn't fit is skipped, a shorter one may
+        chosen, used, trimmed = [], 0, 0
+        for turn in turns:
+            tokens = self.tokenizer.count(turn)
+            if used + tokens <= self.budget:
+                chosen.append(turn)
+                used += tokens
+            else:
+                trimmed += tokens
+        return chosen, used, trimmed
+
+    def render(self, turns: List[str]) -> List[str]:
+        # The context's parts, joined with SEPARATOR
+        if not turns:
+            return [self.system]
+        return [self.system, HISTORY_HEADER, *(sorted(turns) if self.canonical else turns)]
+
+    def count_prefix(self, parts: List[str], chars: int) -> int:
+        # Tokens in the first `chars` characters of SEPARATOR.join(parts), from the memoized counts of whole
+        # parts; only a part cut in the middle is encoded
+        tokens, count = 0, self.tokenizer.count
+        for i, part in enumerate(parts):
+            if i:
+                if chars < len(SEPARATOR):
+                    break
+                chars -= len(SEPARATOR)
+                tokens += count(SEPARATOR)
+            if chars < len(part):
+                return tokens + (len(self.tokenizer.encode(part[:chars])) if chars else 0)
+            chars -= len(part)
+            tokens += count(part)
+        return tokens
+
+    def build(self, prompt: str, user_id: str = DEFAULT_USER) -> Dict:
+        # The context string for ChatBackend.chat(prompt, context) plus its token accounting. Grounding is
+        # best effort: if the embedding model can't be loaded the question goes out with the bare instructions.
+        start = time.perf_counter()
+        try:
+            found, failed = self.retrieve(prompt, user_id), False
+        except (ImportError, OSError):
+            found, failed = [], True
+        turns, used, trimmed = self.pack(found)
+        parts = self.render(turns) + [prompt]
+        full = SEPARATOR.join(parts)
+        prompt_tokens = self.count_prefix(parts, len(full))
+        with self._lock:
+            previous = self._last.pop(user_id, None)
+            self._last[user_id] = full
+            while len(self._last) > self.max_users:
+                self._last.popitem(last=False)
+        shared = common_prefix(previous, full) if previous is not None else 0
+        cached = self.count_prefix(parts, shared) if shared else 0
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.builds += 1
+            self.failures += failed
+            self.turns += len(turns)
+            self.prompt_tokens += prompt_tokens
+            self.context_tokens += used
+            self.cached_tokens += cached
+            self.trimmed_tokens += trimmed
+            self.latency.record(elapsed)
+        return {"context": SEPARATOR.join(parts[:-1]), "turns": len(turns), "context_tokens": used,
+                "prompt_tokens": prompt_tokens, "cached_tokens": cached, "trimmed_tokens": trimmed}
+
+    def remember(self, prompt: str, answer: str, user_id: str = DEFAULT_USER) -> bool:
+        # Keyed by the question's vector, so later questions find it by what was asked; best effort like build().
+        # A question already stored (the nearest turn asked the same) isn't stored again: another copy would
+        # change the next context, and with it Chat.request_key, on every repeat. True if the turn was stored.
+        try:
+            vector = self.embed(prompt)
+        except (ImportError, OSError):
+            with self._lock:
+                self.failures += 1
+            return False
+        with self._user_locks[hash(user_id) % len(self._user_locks)]:
+            nearest = self.memory.search(user_id, vector, k=1)
+            repeat = bool(nearest) and same_question(nearest[0][0], prompt)
+            if not repeat:
+                self.memory.add(user_id, format_turn(prompt, answer), vector)
+        if repeat:
+            with self._lock:
+                self.repeats += 1
+        return not repeat
+
+    def stats(self) -> Dict:
+        return {"builds": self.builds, "failures": self.failures, "repeats": self.repeats,
+                "tokenizer": self.tokenizer.name,
+                "budget": self.budget, "turns": self.turns, "prompt_tokens": self.prompt_tokens,
+                "context_tokens": self.context_tokens, "cached_tokens": self.cached_tokens,
+                "cached_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+                "trimmed_tokens": self.trimmed_tokens, "latency": self.latency.summary()}
+
+
+def builder_from_env() -> Optional[ContextBuilder]:
+    # ASSISTANT_CONTEXT_TOKENS is the budget (0 = no context, the old empty system message), ASSISTANT_CONTEXT_TURNS
+    # the k; ASSISTANT_STORE=<dir> keeps each user's turns on disk, EMBEDDING_CACHE as in Main.py
+    env = os.environ.get
+    budget = int(env("ASSISTANT_CONTEXT_TOKENS", 512))
+    if budget <= 0:
+        return None
+    from Embedding import Embedder
+    root = env("ASSISTANT_STORE")
+    memory = ShardedMemory(disk_shard_factory(root, "l2") if root else lambda user_id: VectorIndex(capacity=16))
+    embedder = Embedder(cache_path=env("EMBEDDING_CACHE"))
+    return ContextBuilder(memory, embedder.embed, k=int(env("ASSISTANT_CONTEXT_TURNS", 4)), budget=budget)
@@ -0,0 +1,192 @@
+# Near-Duplicate Detection - MinHash LSH in front of the dialogue memory (App.py)
+
+# Requirements:
+# pip install numpy
+
+
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+from Embedding import normalize_text
+from Memory import VectorBuffer
+from Metrics import record_cache
+
+def shingles(text: str, k: int = 5) -> FrozenSet[int]:
+    # crc32 hashes of the byte k-grams of the normalized text (the whole text if shorter)
+    data = normalize_text(text).encode("utf-8")
+    return frozenset(zlib.crc32(data[i:i + k]) for i in range(max(1, len(data) - k + 1)))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+# ----------------------------- MINHASH LSH INDEX -----------------------------
+class MinHashLSH:
+    # num_perm MinHash values per text, split into `bands` bands of num_perm // bands rows. Two texts share a
+    # bucket in some band with high probability once their Jaccard similarity passes ~(1/bands)^(1/rows)
+    # (0.5 for 64/16); the hash family is (a*h + b) mod 2^32 over uint32, with odd a. Candidates are ranked by
+    # signature agreement in one vectorized pass and only the best `verify` are confirmed on their exact shingle
+    # sets, so every hit is >= threshold. Exact repeats (same normalized text) skip hashing altogether.
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, k: int = 5, seed: int = 0,
+                 verify: int = 3):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.k = k
+        self.verify = verify
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 2**32, num_perm, dtype=np.uint64) | 1).astype(np.uint32)[:, None]
+        self._b = rng.integers(0, 2**32, num_perm, dtype=np.uint64).astype(np.uint32)[:, None]
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        # id -> (text, key, shingles, band keys), oldest first
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._signatures = VectorBuffer(num_perm, capacity=64, dtype=np.uint32)  # row = id - self._first_id
+        self._first_id = 0
+        self._exact: Dict[str, int] = {}  # normalized text -> newest id
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        # Signatures plus roughly 8 bytes per stored shingle hash
+        return self._signatures.nbytes + sum(8 * len(entry[2]) for entry in self._entries.values())
+
+    def _signature(self, sh: FrozenSet[int]) -> np.ndarray:
+        hashes = np.fromiter(sh, dtype=np.uint32, count=len(sh))
+        return (self._a * hashes[None, :] + self._b).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        raw, width = signature.tobytes(), 4 * self.rows
+        return [raw[i:i + width] for i in range(0, len(raw), width)]
+
+    def add(self, text: str):
+        key = normalize_text(text)
+        sh = shingles(text, self.k)
+        signature = self._signature(sh)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._signatures.extend(signature[None, :])
+            self._entries[entry_id] = (text, key, sh, band_keys)
+            self._exact[key] = entry_id
+            for buckets, band_key in zip(self._buckets, band_keys):
+                buckets.setdefault(band_key, []).append(entry_id)
+
+    def drop_oldest(self, n: int):
+        with self._lock:
+            n = min(n, len(self._entries))
+            self._signatures.drop_front(n)
+            self._first_id += n
+            for _ in range(n):
+                entry_id, (_, key, _, band_keys) = self._entries.popitem(last=False)
+                if self._exact.get(key) == entry_id:
+                    del self._exact[key]
+                for buckets, band_key in zip(self._buckets, band_keys):
+                    ids = buckets[band_key]
+                    ids.remove(entry_id)
+                    if not ids:
+                        del buckets[band_key]
+
+    def find(self, text: str) -> Optional[Tuple[str, float]]:
+        # The most similar stored text and its Jaccard distance (1 - similarity), or None below threshold
+        key = normalize_text(text)
+        with self._lock:
+            entry_id = self._exact.get(key)
+            if entry_id is not None:
+                self.exact_hits += 1
+                record_cache("near_duplicate", True)
+                return self._entries[entry_id][0], 0.0
+        sh = shingles(text, self.k)
+        signature = self._signature(sh)
+        band_keys = self._band_keys(signature)
+        best, best_sim = None, self.threshold
+        with self._lock:
+            candidates = {entry_id for buckets, band_key in zip(self._buckets, band_keys)
+                          for entry_id in buckets.get(band_key, ())}
+            if candidates:
+                ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                estimates = (self._signatures.view[ids - self._first_id] == signature).mean(axis=1)
+                for i in np.argsort(-estimates)[:self.verify]:
+                    stored_text, _, stored_sh, _ = self._entries[int(ids[i])]
+                    sim = jaccard(sh, stored_sh)
+                    if sim >= best_sim:
+                        best, best_sim = stored_text, sim
+            if best is None:
+                self.misses += 1
+            else:
+                self.near_hits += 1
+        record_cache("near_duplicate", best is not None)
+        return (best, 1.0 - best_sim) if best is not None else None
+
+    def stats(self) -> Dict:
+        total = self.exact_hits + self.near_hits + self.misses
+        hits = self.exact_hits + self.near_hits
+        return {"exact_hits": self.exact_hits, "near_hits": self.near_hits, "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0, "size": len(self._entries)}
+
+# ----------------------------- DEDUP-FRONTED DIALOGUE STORE -----------------------------
+class DedupStore:
+    # Wraps a dialogue store (CosineStore, VectorIndex, DiskDialogueStore) with a MinHashLSH over the same turns.
+    # add/drop_oldest keep both in step, so ShardedMemory's turn caps and eviction cover the LSH as well, and
+    # find_duplicate() answers literal and near-literal repeats before anything needs a vector.
+    def __init__(self, store, lsh: Optional[MinHashLSH] = None):
+        self.store = store
+        self.lsh = lsh if lsh is not None else MinHashLSH()
+        for text in store.texts:  # a reopened disk store brings its history with it
+            self.lsh.add(text)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def texts(self) -> List[str]:
+        return self.store.texts
+
+    @property
+    def nbytes(self) -> int:
+        return self.store.nbytes + self.lsh.nbytes
+
+    def add(self, text: str, vector: np.ndarray):
+        self.add_many([text], np.asarray(vector).reshape(1, -1))
+
+    def add_many(self, texts: List[str], vectors: np.ndarray):
+        self.store.add_many(texts, vectors)
+        for text in texts:
+            self.lsh.add(text)
+
+    def drop_oldest(self, n: int):
+        self.store.drop_oldest(n)
+        self.lsh.drop_oldest(n)
+
+    def find_duplicate(self, text: str) -> Optional[Tuple[str, float]]:
+        return self.lsh.find(text)
+
+    def search(self, vector: np.ndarray, k: int = 1, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        return self.store.search(vector, k, threshold)
+
+    def search_many(self, vectors: np.ndarray, k: int = 1,
+                    threshold: Optional[float] = None) -> List[List[Tuple[str, float]]]:
+        return self.store.search_many(vectors, k, threshold)
+
+    def close(self):
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            close()
+
+
+def dedup_factory(factory: Callable[[str], object], **lsh_options) -> Callable[[str], DedupStore]:
+    # Shard factory for ShardedMemory that fronts every shard with its own MinHashLSH
+    return lambda user_id: DedupStore(factory(user_id), MinHashLSH(**lsh_options))
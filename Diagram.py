@@ -0,0 +1,199 @@
+# Concept Diagram Renderers - shared by Main.py and App.py
+
+# Requirements:
+# pip install graphviz matplotlib
+
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from Metrics import record_cache, traced
+
+def diagram_key(key_terms: List[str], topic_type: str, fmt: str) -> str:
+    payload = json.dumps([list(key_terms), topic_type, fmt], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+# ----------------------------- GRAPHVIZ DIAGRAM SERVICE (Main.py) -----------------------------
+class DiagramService:
+    # Content-addressed renders: the path is a hash of (key_terms, topic_type, fmt), an existing file is a
+    # cache hit, identical in-flight requests share one Future, and `dot` runs on a bounded worker pool
+    def __init__(self, out_dir: str = "diagrams", fmt: str = "png", max_workers: int = 2):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.hits = 0
+        self.misses = 0
+        self.render_times = deque(maxlen=1000)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diagram")
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, key_terms: List[str], topic_type: str, fmt: Optional[str] = None) -> str:
+        fmt = fmt or self.fmt
+        return os.path.join(self.out_dir, f"concept_{diagram_key(key_terms, topic_type, fmt)}.{fmt}")
+
+    def cached(self, key_terms: List[str], topic_type: str, fmt: Optional[str] = None) -> Optional[str]:
+        path = self.path_for(key_terms, topic_type, fmt)
+        return path if os.path.exists(path) else None
+
+    def submit(self, key_terms: List[str], topic_type: str, fmt: Optional[str] = None) -> Future:
+        fmt = fmt or self.fmt
+        path = self.path_for(key_terms, topic_type, fmt)
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is not None and pending.done():  # finished but not yet forgotten: a failure is retried
+                pending = None
+            if pending is not None or os.path.exists(path):
+                self.hits += 1
+                record_cache("generate_diagram", True)
+                if pending is not None:
+                    return pending
+                done = Future()
+                done.set_result(path)
+                return done
+            self.misses += 1
+            record_cache("generate_diagram", False)
+            future = self._pool.submit(self._render, list(key_terms), fmt, path)
+            self._pending[path] = future
+        future.add_done_callback(lambda done: self._forget(path, done))
+        return future
+
+    def render(self, key_terms: List[str], topic_type: str, fmt: Optional[str] = None) -> str:
+        return self.submit(key_terms, topic_type, fmt).result()
+
+    def _forget(self, path: str, future: Future):
+        with self._lock:
+            if self._pending.get(path) is future:  # not a retry submitted since
+                del self._pending[path]
+
+    @traced("generate_diagram")  # timed on the worker: submit() only returns a Future
+    def _render(self, key_terms: List[str], fmt: str, path: str) -> str:
+        import graphviz
+        start = time.perf_counter()
+        os.makedirs(self.out_dir, exist_ok=True)
+        dot = graphviz.Digraph(comment='Concept Graph')
+        for i, term in enumerate(key_terms):
+            dot.node(str(i), term)
+            if i > 0:
+                dot.edge(str(i - 1), str(i))
+        # Render under a private name, then rename, so readers never see a half-written file
+        stem = f"{os.path.splitext(os.path.basename(path))[0]}.{os.getpid()}.{threading.get_ident()}"
+        rendered = dot.render(filename=stem, directory=self.out_dir, format=fmt, cleanup=True)
+        os.replace(rendered, path)
+        self.render_times.append(time.perf_counter() - start)
+        return path
+
+    def metrics(self) -> Dict:
+        times = sorted(self.render_times)
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "pending": len(self._pending), "renders": len(times),
+                "render_ms_p50": _percentile(times, 0.50) * 1000, "render_ms_p95": _percentile(times, 0.95) * 1000,
+                "render_ms_max": (times[-1] if times else 0.0) * 1000}
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+# ----------------------------- HEADLESS CONCEPT MAP RENDERER (App.py) -----------------------------
+class ConceptMapRenderer:
+    # Draws on an Agg canvas without pyplot (no GUI backend, no global figure registry to leak into),
+    # reuses one Figure per thread and memoizes identical term lists
+    def __init__(self, cache_size: int = 256, figsize=(8, 3), dpi: int = 100):
+        self.cache_size = cache_size
+        self.figsize = figsize
+        self.dpi = dpi
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _figure(self):
+        figure = getattr(self._local, "figure", None)
+        if figure is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            figure = Figure(figsize=self.figsize, dpi=self.dpi)
+            FigureCanvasAgg(figure)
+            self._local.figure = figure
+        return figure
+
+    def _draw(self, key_terms: List[str], fmt: str) -> bytes:
+        figure = self._figure()
+        figure.clear()
+        ax = figure.add_subplot()
+        # Key terms form a chain, so lay them out left to right instead of running spring_layout
+        positions = {}
+        for term in key_terms:
+            positions.setdefault(term, (len(positions), 0.0))
+        xs = [x for x, _ in positions.values()]
+        ax.scatter(xs, [0.0] * len(xs), s=2000, c='skyblue', zorder=2)
+        for term, (x, y) in positions.items():
+            ax.text(x, y, term, ha='center', va='center', fontsize=10, zorder=3)
+        for prev, term in zip(key_terms, key_terms[1:]):
+            if prev == term:
+                continue
+            (x0, y0), (x1, y1) = positions[prev], positions[term]
+            curve = 0.0 if x1 - x0 == 1 else 0.4  # arc around nodes for back edges and skips
+            ax.annotate("", xy=(x1, y1), xytext=(x0, y0), zorder=1,
+                        arrowprops=dict(arrowstyle="-|>", shrinkA=24, shrinkB=24,
+                                        connectionstyle=f"arc3,rad={curve}"))
+        ax.set_xlim(-0.6, max(len(xs) - 0.4, 0.6))
+        ax.set_ylim(-1.0, 1.0)
+        ax.set_axis_off()
+        ax.set_title("Concept Map")
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=fmt)
+        return buffer.getvalue()
+
+    def render(self, key_terms: List[str], fmt: str = "png") -> bytes:
+        key = (tuple(key_terms), fmt)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                record_cache("generate_diagram", True)
+                return data
+            self.misses += 1
+            record_cache("generate_diagram", False)
+        data = self._draw(list(key_terms), fmt)
+        with self._lock:
+            self._cache[key] = data
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+    def path_for(self, key_terms: List[str], out_dir: str = "diagrams", fmt: str = "png") -> str:
+        return os.path.join(out_dir, f"concept_map_{diagram_key(key_terms, 'map', fmt)}.{fmt}")
+
+    def cached_file(self, key_terms: List[str], out_dir: str = "diagrams", fmt: str = "png") -> Optional[str]:
+        path = self.path_for(key_terms, out_dir, fmt)
+        return path if os.path.exists(path) else None
+
+    def render_to_file(self, key_terms: List[str], out_dir: str = "diagrams", fmt: str = "png") -> str:
+        path = self.path_for(key_terms, out_dir, fmt)
+        if not os.path.exists(path):
+            os.makedirs(out_dir, exist_ok=True)
+            data = self.render(key_terms, fmt)  # before opening the temp file, so a failed draw leaves nothing
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return path
+
+    def metrics(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "cached": len(self._cache)}
@@ -0,0 +1,148 @@
+# Sentence Embeddings - batched spaCy vectors behind an LRU + on-disk cache (Main.py's memory agent)
+
+# Requirements:
+# pip install spacy numpy
+# python -m spacy download en_core_web_md   (300-d static vectors; en_core_web_sm works, with 96-d context vectors)
+
+
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+import numpy as np
+from Metrics import record_cache
+
+_PUNCT = re.compile(r"[^\w\s]+")
+
+def normalize_text(text: str) -> str:
+    # "What is Photosynthesis?" and "what is  photosynthesis" share one cache entry
+    return " ".join(_PUNCT.sub(" ", text.casefold()).split())
+
+
+def load_vectors_model(names=("en_core_web_md", "en_core_web_lg", "en_core_web_sm")):
+    # Only what doc.vector needs: static-vector models just tokenize; models without vectors keep tok2vec
+    import spacy
+    for name in names:
+        try:
+            nlp = spacy.load(name)
+        except OSError:
+            continue
+        keep = () if nlp.vocab.vectors.shape[0] else ("tok2vec",)
+        nlp.select_pipes(enable=[pipe for pipe in nlp.pipe_names if pipe in keep])
+        return nlp
+    raise OSError(f"None of the spaCy models {names} are installed")
+
+# ----------------------------- DISK CACHE -----------------------------
+class DiskEmbeddingCache:
+    # SQLite table of normalized text -> float32 bytes, one table per model so a model swap never
+    # serves stale vectors
+    def __init__(self, path: str, model_id: str):
+        self.table = "emb_" + re.sub(r"\W", "_", model_id)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, vec BLOB)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(f"SELECT key, vec FROM {self.table} WHERE key IN "
+                                          f"({','.join('?' * len(chunk))})", chunk)
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?)",
+                                   [(key, vec.astype(np.float32).tobytes()) for key, vec in items.items()])
+
+    def close(self):
+        self._conn.close()
+
+# ----------------------------- EMBEDDER -----------------------------
+class Embedder:
+    # Unit-length sentence vectors (so squared L2 = 2 - 2cos) for normalized text. Lookups go
+    # LRU -> disk cache -> model, and misses are parsed together through nlp.pipe.
+    def __init__(self, load: Callable = load_vectors_model, maxsize: int = 10_000,
+                 cache_path: Optional[str] = None, batch_size: int = 256):
+        self._load = load
+        self.maxsize = maxsize
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._nlp = None
+        self._disk = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            with self._lock:
+                if self._nlp is None:
+                    self._nlp = self._load()
+                    if self.cache_path:
+                        self._disk = DiskEmbeddingCache(self.cache_path, self.model_id)
+        return self._nlp
+
+    @property
+    def model_id(self) -> str:
+        meta = self.nlp.meta
+        return f"{meta.get('lang', 'xx')}_{meta.get('name', 'model')}_{meta.get('version', '0')}"
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: Iterable[str]) -> np.ndarray:
+        keys = [normalize_text(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._cache.get(key)
+                if vec is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = vec
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        nlp = self.nlp
+        disk_hits = 0
+        if missing and self._disk is not None:
+            from_disk = self._disk.get_many(missing)
+            found.update(from_disk)
+            disk_hits = len(from_disk)
+            missing = [key for key in missing if key not in from_disk]
+        if missing:
+            computed = {key: self._unit(doc.vector)
+                        for key, doc in zip(missing, nlp.pipe(missing, batch_size=self.batch_size))}
+            found.update(computed)
+            if self._disk is not None:
+                self._disk.put_many(computed)
+        with self._lock:
+            for key in keys:
+                self._cache[key] = found[key]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+            # Every text that didn't need the model counts as a hit, including repeats within one batch
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            self.disk_hits += disk_hits
+        computed = set(missing)  # the first occurrence of each of these was a miss, like self.misses
+        for key in keys:
+            record_cache("embed", key not in computed)
+            computed.discard(key)
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _unit(vec: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self._cache),
+                "hit_rate": self.hits / total if total else 0.0}
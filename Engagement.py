@@ -0,0 +1,305 @@
+# Engagement Monitor - shared by Main.py and App.py
+
+# Requirements:
+# pip install numpy opencv-python deepface fer
+
+
+import logging
+import threading
+import time
+import numpy as np
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------- EMOTION -> ENGAGEMENT SCORE -----------------------------
+DEFAULT_ENGAGEMENT = 0.5  # default medium
+
+def emotion_to_score(emotion: Optional[str]) -> float:
+    if emotion in ['happy', 'surprise']: return 0.8
+    elif emotion in ['neutral'] or emotion is None: return 0.5
+    else: return 0.2
+
+# ----------------------------- FRAME SOURCES -----------------------------
+class CameraSource:
+    # Holds one capture handle for the sampler's lifetime instead of opening the camera per query
+    def __init__(self, index: int = 0):
+        self.index = index
+        self._cap = None
+
+    def read(self) -> Optional[np.ndarray]:
+        if self._cap is None:
+            import cv2
+            self._cap = cv2.VideoCapture(self.index)
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class FakeFrameSource:
+    # Replays in-memory frames so the sampler runs without a webcam (tests, benchmarks)
+    def __init__(self, frames: List[np.ndarray], loop: bool = True):
+        self.frames = list(frames)
+        self.loop = loop
+        self.reads = 0
+
+    def read(self) -> Optional[np.ndarray]:
+        if not self.frames or (not self.loop and self.reads >= len(self.frames)):
+            return None
+        frame = self.frames[self.reads % len(self.frames)]
+        self.reads += 1
+        return frame
+
+    def release(self):
+        pass
+
+# ----------------------------- EMOTION DETECTORS -----------------------------
+class FERDetector:
+    # App.py's model
+    def __init__(self, mtcnn: bool = True):
+        from fer import FER
+        self._fer = FER(mtcnn=mtcnn)
+
+    def dominant_emotion(self, frame: np.ndarray, faces=None) -> Optional[str]:
+        # One inference: top_emotion() would re-run detect_emotions() and take the first face anyway
+        result = self._fer.detect_emotions(frame, face_rectangles=faces)
+        if not result:
+            return None
+        emotions = result[0]["emotions"]
+        return max(emotions, key=emotions.get)
+
+
+class DeepFaceDetector:
+    # Main.py's model
+    def __init__(self):
+        from deepface import DeepFace
+        self._deepface = DeepFace
+
+    def dominant_emotion(self, frame: np.ndarray, faces=None) -> Optional[str]:
+        if faces is not None and len(faces):
+            # A face was already found, so analyze the crop and skip DeepFace's own detector
+            x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+            result = self._deepface.analyze(frame[y:y + h, x:x + w], actions=['emotion'],
+                                            enforce_detection=False, detector_backend='skip')
+        else:
+            result = self._deepface.analyze(frame, actions=['emotion'], enforce_detection=False)
+        return result[0]['dominant_emotion']
+
+# ----------------------------- STAGED ENGAGEMENT PATH -----------------------------
+class HaarFaceDetector:
+    # OpenCV's bundled Haar cascade: a few ms on a downscaled frame vs tens of ms for the emotion CNN
+    def __init__(self, scale_factor: float = 1.2, min_neighbors: int = 5, min_size=(24, 24)):
+        import cv2
+        self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def faces(self, gray: np.ndarray):
+        return self._cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                              minNeighbors=self.min_neighbors, minSize=self.min_size)
+
+
+class GatedDetector:
+    # Cheapest stage first: downscale -> skip if the scene hasn't changed -> skip if no face -> emotion model
+    def __init__(self, detector, face_detector=None, scale: float = 0.5, diff_threshold: float = 4.0):
+        self.detector = detector
+        self.face_detector = face_detector if face_detector is not None else HaarFaceDetector()
+        self.scale = scale
+        self.diff_threshold = diff_threshold  # mean absolute grey-level change, 0-255
+        self.stats = {"frames": 0, "unchanged": 0, "no_face": 0, "inferred": 0}
+        self._reference = None
+        self._last_emotion = None
+
+    def dominant_emotion(self, frame: np.ndarray) -> Optional[str]:
+        import cv2
+        self.stats["frames"] += 1
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if (self._reference is not None and self._reference.shape == gray.shape
+                and cv2.absdiff(gray, self._reference).mean() < self.diff_threshold):
+            self.stats["unchanged"] += 1
+            return self._last_emotion
+        self._reference = gray
+        faces = self.face_detector.faces(gray)
+        if len(faces) == 0:
+            self.stats["no_face"] += 1
+            self._last_emotion = None
+            return None
+        self.stats["inferred"] += 1
+        self._last_emotion = self.detector.dominant_emotion(frame, faces)
+        return self._last_emotion
+
+# ----------------------------- BACKGROUND SAMPLER -----------------------------
+class EngagementSampler:
+    # One thread owns the frame source and a warmed-up detector, sampling at rate_hz into a ring
+    # buffer; current_engagement() never touches the camera or the model. If detector_factory fails the
+    # error is kept and start() stops respawning: the default score is served until the process restarts.
+    # `clock` and `wait` stand in for time.monotonic and the stop event's wait (tests run on a fake clock).
+    def __init__(self, source, detector_factory: Callable, rate_hz: float = 2.0, window: int = 10,
+                 default: float = DEFAULT_ENGAGEMENT, clock: Callable[[], float] = time.monotonic,
+                 wait: Optional[Callable[[float], object]] = None):
+        self.source = source
+        self.detector_factory = detector_factory
+        self.rate_hz = rate_hz
+        self.default = default
+        self.clock = clock
+        self.samples = 0
+        self.error = None
+        self._scores = np.zeros(window)
+        self._filled = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wait = wait if wait is not None else self._stop.wait
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "EngagementSampler":
+        if not self.running and self.error is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="engagement-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.source.release()
+
+    def record(self, score: float):
+        with self._lock:
+            self._scores[self.samples % len(self._scores)] = score
+            self.samples += 1
+            self._filled = min(self._filled + 1, len(self._scores))
+
+    def current_engagement(self) -> float:
+        with self._lock:
+            if not self._filled:
+                return self.default
+            return float(self._scores[:self._filled].mean())
+
+    def score_frame(self, detector, frame: np.ndarray) -> float:
+        try:
+            return emotion_to_score(detector.dominant_emotion(frame))
+        except Exception:
+            return self.default
+
+    def _run(self):
+        try:
+            detector = self.detector_factory()
+        except Exception as exc:  # missing model/package: keep serving the default score
+            self.error = exc
+            return
+        period = 1.0 / self.rate_hz
+        while not self._stop.is_set():
+            started = self.clock()
+            frame = self.source.read()
+            if frame is not None:
+                self.record(self.score_frame(detector, frame))
+            self._wait(max(0.0, period - (self.clock() - started)))
+
+# ----------------------------- OFFLINE VIDEO ANALYSIS -----------------------------
+DETECTORS = {"fer": FERDetector, "deepface": DeepFaceDetector}
+_worker_detector = None
+
+def _init_video_worker(model: str, gated: bool):
+    global _worker_detector
+    detector = DETECTORS[model]()
+    _worker_detector = GatedDetector(detector) if gated else detector
+
+
+def _score_frames(frames: List[np.ndarray]) -> List[float]:
+    # One model call per frame: FER.detect_emotions and DeepFace.analyze take a single image, and the gated
+    # detector's unchanged-frame check depends on the frame before it. Batching only bounds decoded frames.
+    scores = []
+    for frame in frames:
+        try:
+            scores.append(emotion_to_score(_worker_detector.dominant_emotion(frame)))
+        except Exception:
+            scores.append(DEFAULT_ENGAGEMENT)
+    return scores
+
+
+def _score_segment(args) -> np.ndarray:
+    # Each task decodes only its own frame indices; at most batch_size frames are held at once
+    path, indices, batch_size = args
+    import cv2
+    cap = cv2.VideoCapture(path)
+    rows, batch, batch_idx, position = [], [], [], -1
+    try:
+        for idx in indices:
+            if idx - position > 30:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)  # long jump: seek instead of decoding
+            else:
+                for _ in range(idx - position - 1):
+                    cap.grab()
+            position = idx
+            ret, frame = cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+            batch_idx.append(idx)
+            if len(batch) == batch_size:
+                rows.extend(zip(batch_idx, _score_frames(batch)))
+                batch, batch_idx = [], []
+        rows.extend(zip(batch_idx, _score_frames(batch)))
+    finally:
+        cap.release()
+    return np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+
+def analyze_video(path: str, stride_s: float = 1.0, batch_size: int = 16, workers: Optional[int] = None,
+                  model: str = "fer", gated: bool = True, segment_size: int = 256,
+                  out_path: Optional[str] = None) -> np.ndarray:
+    # Returns an (n, 2) array of (timestamp_s, engagement score); optionally saved as .csv or .npy
+    import cv2
+    from concurrent.futures import ProcessPoolExecutor
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video file '{path}'")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    step = max(1, int(round(stride_s * fps)))
+    indices = list(range(0, frame_count, step))
+    tasks = [(path, indices[i:i + segment_size], batch_size) for i in range(0, len(indices), segment_size)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_video_worker,
+                             initargs=(model, gated)) as pool:
+        parts = list(pool.map(_score_segment, tasks))
+    elapsed = time.perf_counter() - start
+
+    series = np.concatenate(parts) if parts else np.empty((0, 2))
+    series[:, 0] /= fps
+    logger.info("Processed %d frames in %.1fs (%.1f frames/sec)", len(series), elapsed,
+                len(series) / max(elapsed, 1e-9))
+
+    if out_path and out_path.endswith(".npy"):
+        np.save(out_path, series)
+    elif out_path:
+        np.savetxt(out_path, series, delimiter=",", fmt=["%.3f", "%.1f"],
+                   header="timestamp_s,engagement", comments="")
+    return series
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python Engagement.py <video> [stride_s] [workers] [out.csv|out.npy]")
+        sys.exit(1)
+    analyze_video(sys.argv[1],
+                  stride_s=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0,
+                  workers=int(sys.argv[3]) if len(sys.argv) > 3 else None,
+                  out_path=sys.argv[4] if len(sys.argv) > 4 else "engagement.csv")
@@ -84,17 +84,14 @@ class Settings:
 settings = Settings()
 
 # 🧠 Chatbot Engine: ai_services/chatbot/chat_engine.py
-import openai
+# Async and connection-pooled; providers, limits and timeouts live in Chat.py (CHAT_PROVIDER=stub runs offline)
+from Chat import ChatBackend, OpenAIProvider
 from backend.app.core.config import settings
 
-openai.api_key = settings.OPENAI_API_KEY
+chat_backend = ChatBackend(OpenAIProvider(api_key=settings.OPENAI_API_KEY), max_concurrency=64, timeout=30.0)
 
-def get_chat_response(prompt, context=""):
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[{"role": "system", "content": context}, {"role": "user", "content": prompt}]
-    )
-    return response['choices'][0]['message']['content']
+async def get_chat_response(prompt, context=""):
+    return await chat_backend.chat(prompt, context)
 
 # 👩‍🏫 Frontend: Assistant.tsx (React + Tailwind)
 // frontend/src/components/Assistant.tsx
@@ -124,8 +121,10 @@ export default function Assistant() {
 }
 
 # 🧩 Assistant API Endpoint: backend/app/api/assistant.py
-from fastapi import APIRouter, Request
+# Awaits the provider instead of holding a threadpool worker; Assistant.py is the runnable version, with SSE streaming
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
+from Chat import ChatBusy, ChatError, ChatTimeout
 from backend.app.services.chatbot import get_chat_response
 
 router = APIRouter(prefix="/api/assistant")
@@ -134,14 +133,25 @@ class Query(BaseModel):
     query: str
 
 @router.post("/ask")
-def ask(query: Query):
-    response = get_chat_response(query.query)
+async def ask(query: Query):
+    try:
+        response = await get_chat_response(query.query)
+    except ChatBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+    except ChatTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+    except ChatError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
     return {"answer": response}
 
 # 🧪 Sample Test: tests/test_chatbot.py
+# Against the local stub (python -m benchmarks.stub_llm), so it runs offline
+import asyncio
+
 def test_chat_response():
-    from ai_services.chatbot.chat_engine import get_chat_response
-    result = get_chat_response("What is photosynthesis?")
+    from Chat import ChatBackend, StubProvider
+    backend = ChatBackend(StubProvider())
+    result = asyncio.run(backend.chat("What is photosynthesis?"))
     assert "process" in result.lower()
 
 // Updated AI Educational Platform Code with Advanced Features (including Multimodal Input and AI Integration)
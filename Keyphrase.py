@@ -0,0 +1,139 @@
+# RAKE Keyphrase Extraction - built once per process for App.py's NLP agent; same ranking as rake_nltk's Rake
+
+# Requirements:
+# pip install numpy nltk
+# python -m nltk.downloader stopwords
+
+
+import re
+import string
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# nltk.tokenize.wordpunct_tokenize
+_WORDPUNCT = re.compile(r"\w+|[^\w\s]+")
+
+
+def load_stopwords(language: str = "english") -> List[str]:
+    import nltk
+    return nltk.corpus.stopwords.words(language)
+
+# ----------------------------- RAKE EXTRACTOR -----------------------------
+class RakeExtractor:
+    # rake_nltk's Rake with its defaults (degree/frequency ratio, repeated phrases kept), minus the per-call setup:
+    # the stopword list is read and the regex compiled once, and words are interned to ids in a vocabulary that
+    # outlives calls, stopwords and punctuation first so `id < n_ignored` flags them. Per document, a candidate
+    # phrase is a run of non-ignored words inside one sentence; freq(w) counts w's occurrences and deg(w) adds the
+    # length of the phrase for each of them; a phrase scores sum(deg/freq) over its words, ranked high to low with
+    # ties broken by the phrase text, high to low - exactly Rake.get_ranked_phrases(). Scores are computed for a
+    # whole batch of documents with NumPy, adding word scores column by column so sums round like Rake's loop.
+    # Most of the per-call saving is Rake's construction; against a Rake built once a single document ranks at
+    # about the same speed, and ranked_phrases_many is faster per document (benchmarks/bench_keyphrase.py).
+    def __init__(self, stopwords: Optional[Iterable[str]] = None, punctuations: Optional[Iterable[str]] = None,
+                 language: str = "english", max_vocab: int = 200_000):
+        self.stopwords = set(stopwords) if stopwords else set(load_stopwords(language))
+        self.punctuations = set(punctuations) if punctuations else set(string.punctuation)
+        self.max_vocab = max_vocab
+        self._lock = threading.Lock()
+        self._reset_vocab()
+
+    def _reset_vocab(self):
+        self.words: List[str] = sorted(self.stopwords | self.punctuations)
+        self.vocab: Dict[str, int] = {word: i for i, word in enumerate(self.words)}
+        self.n_ignored = len(self.words)
+
+    def tokenize(self, sentence: str) -> List[str]:
+        # wordpunct_tokenize, then lowercase each token (the whole sentence at once when that can't change the split)
+        if sentence.isascii():
+            return _WORDPUNCT.findall(sentence.lower())
+        return [word.lower() for word in _WORDPUNCT.findall(sentence)]
+
+    def _intern(self, docs: List[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str], np.ndarray]:
+        # (word id, ignored flag and sentence-start flag per token, the vocabulary, document of each token)
+        ids, starts, doc_of = [], [], []
+        with self._lock:
+            if len(self.vocab) > self.max_vocab:
+                self._reset_vocab()
+            vocab, words, n_ignored = self.vocab, self.words, self.n_ignored
+            for d, sentences in enumerate(docs):
+                for sentence in sentences:
+                    tokens = self.tokenize(sentence)
+                    if not tokens:
+                        continue
+                    starts.append(len(ids))
+                    found = list(map(vocab.get, tokens))
+                    if None in found:  # first sighting of some words: give them the next ids
+                        for k, token in enumerate(tokens):
+                            if found[k] is None:
+                                found[k] = vocab.get(token)
+                                if found[k] is None:
+                                    found[k] = vocab[token] = len(words)
+                                    words.append(token)
+                    ids.extend(found)
+                    doc_of.extend([d] * len(tokens))
+        ids = np.array(ids, dtype=np.int64)
+        sentence_start = np.zeros(len(ids), dtype=bool)
+        sentence_start[starts] = True
+        return ids, ids < n_ignored, sentence_start, words, np.array(doc_of, dtype=np.int64)
+
+    def score(self, docs: List[List[str]]):
+        # (word ids of the candidate phrases back to back, the vocabulary they index, and per document its phrases'
+        # scores, offsets and lengths into those ids, in document order)
+        ids, ignored, sentence_start, words, doc_of = self._intern(docs)
+        keep = ~ignored
+        phrase_start = keep.copy()  # a kept word after an ignored one or at a sentence start
+        phrase_start[1:] &= ignored[:-1] | sentence_start[1:]
+        token_ids = ids[keep]
+        token_phrase = np.cumsum(phrase_start)[keep] - 1
+        n_phrases = int(phrase_start.sum())
+        if not n_phrases:
+            empty = np.zeros(0, dtype=np.int64)
+            return token_ids, words, [(np.zeros(0), empty, empty) for _ in docs]
+        phrase_doc = doc_of[phrase_start]
+        lengths = np.bincount(token_phrase, minlength=n_phrases)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        # deg and freq per (document, word): count each occurrence, weighted by its phrase length for deg
+        pairs = phrase_doc[token_phrase] * len(words) + token_ids
+        _, slot = np.unique(pairs, return_inverse=True)
+        freq = np.bincount(slot)
+        degree = np.bincount(slot, weights=lengths[token_phrase])
+        word_score = (degree / freq)[slot]
+        # Phrase sums in word order: one column per position, so each add rounds like Rake's `rank += ...`
+        position = np.arange(len(token_ids)) - offsets[token_phrase]
+        table = np.zeros((n_phrases, int(lengths.max())))
+        table[token_phrase, position] = word_score
+        scores = np.zeros(n_phrases)
+        for column in table.T:
+            scores += column
+        bounds = np.searchsorted(phrase_doc, np.arange(len(docs) + 1))
+        return token_ids, words, [(scores[a:b], offsets[a:b], lengths[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def rank(scores: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, token_ids: List[int], words: List[str],
+             topn: Optional[int] = None) -> List[str]:
+        # Rake's sort(reverse=True) on (score, text); only phrases scoring at least the topn-th best need their text
+        if topn is not None and topn < len(scores):
+            if topn <= 0:
+                return []
+            cutoff = np.partition(scores, len(scores) - topn)[len(scores) - topn]
+            candidates = np.flatnonzero(scores >= cutoff)
+        else:
+            candidates = range(len(scores))
+        ranked = []
+        for i in candidates:
+            start = offsets[i]
+            ranked.append((float(scores[i]), " ".join([words[w] for w in token_ids[start:start + lengths[i]]])))
+        ranked.sort(reverse=True)
+        return [text for _, text in ranked[:topn]]
+
+    def ranked_phrases(self, sentences: List[str], topn: Optional[int] = 5) -> List[str]:
+        # Rake().extract_keywords_from_sentences(sentences); get_ranked_phrases()[:topn] (all of them for None)
+        return self.ranked_phrases_many([sentences], topn)[0]
+
+    def ranked_phrases_many(self, docs: List[List[str]], topn: Optional[int] = 5) -> List[List[str]]:
+        # One ranking per document (a list of sentences), scored together in one pass
+        token_ids, words, ranked = self.score(docs)
+        token_ids = token_ids.tolist()
+        return [self.rank(scores, offsets.tolist(), lengths.tolist(), token_ids, words, topn)
+                for scores, offsets, lengths in ranked]
@@ -2,27 +2,46 @@
 
 # Requirements:
 # pip install spacy textacy faiss-cpu opencv-python deepface matplotlib graphviz
+# python -m spacy download en_core_web_sm en_core_web_md
 
 
-import spacy
-import textacy.extract
-import faiss
 import numpy as np
-from deepface import DeepFace
-import cv2
-import time
-import graphviz
-from typing import List, Dict
+import os
+import threading
+from functools import lru_cache
+from typing import List, Dict, Iterable, Iterator, Optional
+from Memory import DEFAULT_USER, ShardedMemory, VectorIndex, compressed_shard_factory, disk_shard_factory
+from Embedding import Embedder
+from Cache import ResponseCache
+from Diagram import DiagramService
+from Pipeline import PipelineRun, Stage, run_stages
+from Metrics import traced
+from Engagement import DEFAULT_ENGAGEMENT, CameraSource, DeepFaceDetector, EngagementSampler, GatedDetector
+
+# ----------------------------- LAZY MODEL LOADING -----------------------------
+# spaCy, textacy, graphviz, cv2 and DeepFace are imported on first use, so importing
+# this module (or starting the CLI) doesn't pay for agents that never run.
+@lru_cache(maxsize=None)
+def get_nlp():
+    import spacy
+    # textrank needs tags and lemmas, semistructured_statements needs the parser; NER is unused
+    return spacy.load("en_core_web_sm", exclude=["ner"])
+
+def __getattr__(name):
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ----------------------------- AGENT 1: INPUT AGENT -----------------------------
+@traced("input_agent")
 def input_agent(text: str) -> str:
     return text  # Start simple with text only input
 
 # ----------------------------- AGENT 2: NLP AGENT -----------------------------
-nlp = spacy.load("en_core_web_sm")
-
-def nlp_agent(text: str) -> Dict:
-    doc = nlp(text)
+@traced("nlp_agent")
+def nlp_agent(text: str, doc=None) -> Dict:
+    import textacy.extract
+    doc = doc if doc is not None else get_nlp()(text)
     key_terms = textacy.ke.textrank(doc, topn=5)
     triples = list(textacy.extract.semistructured_statements(doc, cue="is"))
     topic_type = "process" if "how" in text.lower() else "theory"
@@ -32,51 +51,83 @@ def nlp_agent(text: str) -> Dict:
         "topic_type": topic_type
     }
 
+def nlp_fallback(text: str) -> Dict:
+    # What the pipeline uses when the NLP agent misses its deadline
+    return {"key_terms": [], "triples": [], "topic_type": "process" if "how" in text.lower() else "theory"}
+
+def nlp_agent_batch(texts: Iterable[str], batch_size: int = 64, n_process: int = 1) -> Iterator[Dict]:
+    # Streams one nlp_agent() result per input, in order, parsing through nlp.pipe
+    pairs = ((text, text) for text in texts)
+    for doc, text in get_nlp().pipe(pairs, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        yield nlp_agent(text, doc)
+
 # ----------------------------- AGENT 3: VISUAL GENERATOR AGENT -----------------------------
+diagram_service = DiagramService(out_dir="diagrams", fmt="png", max_workers=2)
+
 def generate_diagram(key_terms: List[str], topic_type: str):
-    dot = graphviz.Digraph(comment='Concept Graph')
-    for i, term in enumerate(key_terms):
-        dot.node(str(i), term)
-        if i > 0:
-            dot.edge(str(i - 1), str(i))
-    dot.render('concept_graph', view=True, format='png')
+    # Returns a Future of the PNG path; cached diagrams resolve immediately, new ones render in the background
+    return diagram_service.submit(key_terms, topic_type)
 
 # ----------------------------- AGENT 4: DIALOGUE MEMORY AGENT -----------------------------
-dialogue_memory = []
-
-def store_dialogue(text: str, embedding: np.ndarray):
-    dialogue_memory.append((text, embedding))
-
-def retrieve_similar_query(embedding: np.ndarray):
-    if not dialogue_memory:
-        return None
-    dim = len(embedding)
-    index = faiss.IndexFlatL2(dim)
-    data = np.array([e for _, e in dialogue_memory]).astype('float32')
-    index.add(data)
-    D, I = index.search(np.array([embedding]).astype('float32'), 1)
-    return dialogue_memory[I[0][0]][0] if D[0][0] < 0.1 else None
+# One shard per user, so lookups only scan that user's history; DIALOGUE_STORE=<dir> keeps each shard in a
+# memory-mapped store that survives restarts. MEMORY_CODEC=fp16|sq|ivfpq keeps only compressed codes in RAM
+# (MEMORY_CODE_SIZE bytes per vector, codec trained on MEMORY_TRAIN_SAMPLE=vectors.npy if given) and re-ranks
+# against the exact vectors, which stay on disk (so MEMORY_CODEC needs DIALOGUE_STORE). Shards keep at most
+# MAX_TURNS_PER_SHARD turns, too few to train ivfpq (9984 vectors), so it needs MEMORY_TRAIN_SAMPLE.
+MAX_TURNS_PER_SHARD = 500
+
+def memory_shard_factory():
+    root, codec = os.environ.get("DIALOGUE_STORE"), os.environ.get("MEMORY_CODEC")
+    if codec:
+        if not root:
+            raise ValueError("MEMORY_CODEC needs DIALOGUE_STORE: without it the exact vectors stay in RAM "
+                             "next to the codes, which uses more memory than no codec at all")
+        code_size = os.environ.get("MEMORY_CODE_SIZE")
+        sample = os.environ.get("MEMORY_TRAIN_SAMPLE")
+        return compressed_shard_factory(root, codec, np.load(sample) if sample else None,
+                                        max_turns=MAX_TURNS_PER_SHARD, code_size=int(code_size) if code_size else None)
+    return disk_shard_factory(root, "l2") if root else lambda user_id: VectorIndex(capacity=16)
+
+dialogue_memory = ShardedMemory(memory_shard_factory(), max_turns_per_shard=MAX_TURNS_PER_SHARD)
+# Unit-length spaCy sentence vectors; EMBEDDING_CACHE=embeddings.sqlite keeps them across restarts
+embedder = Embedder(cache_path=os.environ.get("EMBEDDING_CACHE"))
+
+@traced("embed_text")
+def embed_text(text: str) -> np.ndarray:
+    return embedder.embed(text)
+
+def embed_texts(texts: Iterable[str]) -> np.ndarray:
+    return embedder.embed_many(texts)
+
+@traced("store_dialogue")
+def store_dialogue(text: str, embedding: np.ndarray, user_id: str = DEFAULT_USER):
+    dialogue_memory.add(user_id, text, embedding)
+
+@traced("retrieve_similar_query")
+def retrieve_similar_query(embedding: np.ndarray, threshold: float = 0.1, user_id: str = DEFAULT_USER):
+    # On unit vectors squared L2 = 2 - 2cos, so 0.1 means cosine similarity above 0.95
+    hits = dialogue_memory.search(user_id, embedding, k=1, threshold=threshold)
+    return hits[0][0] if hits else None
 
 # ----------------------------- AGENT 5: ENGAGEMENT MONITOR AGENT -----------------------------
+engagement_sampler = None
+_sampler_lock = threading.Lock()
+
+def start_engagement_sampler(source=None, rate_hz: float = 2.0, window: int = 10) -> EngagementSampler:
+    # One long-running sampler per process; pass FakeFrameSource(frames) to run without a webcam
+    global engagement_sampler
+    with _sampler_lock:
+        if engagement_sampler is None:
+            engagement_sampler = EngagementSampler(source or CameraSource(0),
+                                                   lambda: GatedDetector(DeepFaceDetector()), rate_hz, window)
+        return engagement_sampler.start()
+
+@traced("monitor_engagement")
 def monitor_engagement() -> float:
-    cap = cv2.VideoCapture(0)
-    start_time = time.time()
-    engagement_score = 0.5  # default medium
-    try:
-        ret, frame = cap.read()
-        result = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
-        emotion = result[0]['dominant_emotion']
-        if emotion in ['happy', 'surprise']: engagement_score = 0.8
-        elif emotion in ['neutral']: engagement_score = 0.5
-        else: engagement_score = 0.2
-    except:
-        engagement_score = 0.5
-    finally:
-        cap.release()
-        cv2.destroyAllWindows()
-    return engagement_score
+    return start_engagement_sampler().current_engagement()
 
 # ----------------------------- AGENT 6: ADAPTIVE TEACHING AGENT -----------------------------
+@traced("adaptive_teaching")
 def adaptive_teaching(response: str, engagement_score: float):
     if engagement_score < 0.4:
         print("\n🧠 You seem disengaged. Here's a simplified explanation with a diagram:")
@@ -86,34 +137,108 @@ def adaptive_teaching(response: str, engagement_score: float):
     else:
         return response
 
+# ----------------------------- RESPONSE CACHE -----------------------------
+def model_version() -> str:
+    # Cached answers are only valid for the models that produced them
+    meta = get_nlp().meta
+    return f"{embedder.model_id}+{meta.get('name')}-{meta.get('version')}"
+
+# A repeat question (squared L2 < 0.05 between unit embeddings, i.e. cosine > 0.975) reuses the NLP output,
+# diagram and base response of the earlier one; threshold=0 turns the cache off
+response_cache = ResponseCache(threshold=0.05, metric="l2", maxsize=1024, version=model_version)
+BASE_RESPONSE = "Here’s your explanation based on input."
+
 # ----------------------------- MAIN SYSTEM FLOW -----------------------------
-def teaching_assistant_pipeline(text: str):
+# Per-stage deadlines in seconds, used by run_pipeline(); a stage that misses its deadline is replaced
+# by its fallback. NLP and adaptive teaching are only bounded by the overall budget, if one is given.
+STAGE_BUDGETS = {"engagement": 0.1, "diagram": 0.5, "memory": 0.25}
+
+def run_pipeline(text: str, budget: Optional[float] = None,
+                 stage_budgets: Optional[Dict[str, float]] = None, user_id: str = DEFAULT_USER) -> PipelineRun:
+    budgets = STAGE_BUDGETS if stage_budgets is None else stage_budgets
+
     # Step 1: Input Agent
     input_text = input_agent(text)
 
+    # The question is embedded once, for both the cache lookup and dialogue memory
+    def embed_stage():
+        return embed_text(input_text)
+
+    # Response cache: a hit skips the NLP agent and the diagram render
+    def lookup_stage(embed):
+        return response_cache.get(embed) if embed is not None else None
+
     # Step 2: NLP Agent
-    parsed = nlp_agent(input_text)
-    print("\n🔍 NLP Agent Output:", parsed)
+    def nlp_stage(lookup):
+        return lookup["nlp"] if lookup else nlp_agent(input_text)
 
-    # Step 3: Visual Generation
-    generate_diagram(parsed["key_terms"], parsed["topic_type"])
+    # Step 3: Diagram Generation
+    def diagram_stage(nlp, lookup):
+        if lookup and os.path.exists(lookup["diagram"]):
+            return lookup["diagram"]
+        return generate_diagram(nlp["key_terms"], nlp["topic_type"])
 
     # Step 4: Dialogue Memory
-    embed_vector = np.random.rand(300).astype('float32')  # Placeholder for real embeddings
-    store_dialogue(input_text, embed_vector)
-    similar = retrieve_similar_query(embed_vector)
-    if similar:
-        print(f"\n🧠 Previously you asked something similar: '{similar}'")
-
-    # Step 5: Engagement Monitor
-    engagement = monitor_engagement()
-    print(f"\n📊 Engagement Score: {engagement}")
+    def memory_stage(embed):
+        if embed is None:
+            return None
+        similar = retrieve_similar_query(embed, user_id=user_id)
+        store_dialogue(input_text, embed, user_id)
+        return similar
 
     # Step 6: Adaptive Teaching
-    final_response = adaptive_teaching("Here’s your explanation based on input.", engagement)
-    print("\n🤖 Final Teaching Response:\n", final_response)
+    def adaptive_stage(engagement, lookup=None, **_):
+        return adaptive_teaching(lookup["response"] if lookup else BASE_RESPONSE, engagement)
+
+    # Engagement and the embedding start right away; the cache lookup and memory wait for the embedding, NLP
+    # for the lookup, diagram for NLP; adaptive teaching waits for the rest.
+    # Late stages fall back: engagement -> 0.5, embedding -> None (no lookup, nothing remembered),
+    # diagram -> already-rendered file or none, memory -> None.
+    run = run_stages([
+        Stage("engagement", monitor_engagement, budget=budgets.get("engagement"),
+              fallback=DEFAULT_ENGAGEMENT),
+        Stage("embed", embed_stage, budget=budgets.get("embed"), fallback=None),
+        Stage("lookup", lookup_stage, ("embed",), budget=budgets.get("lookup"), fallback=None),
+        Stage("nlp", nlp_stage, ("lookup",), budget=budgets.get("nlp"),
+              fallback=lambda lookup: nlp_fallback(input_text)),
+        Stage("diagram", diagram_stage, ("nlp", "lookup"), budget=budgets.get("diagram"),
+              fallback=lambda nlp, lookup: diagram_service.cached(nlp["key_terms"], nlp["topic_type"])),
+        Stage("memory", memory_stage, ("embed",), budget=budgets.get("memory"), fallback=None),
+        Stage("adaptive", adaptive_stage, ("engagement", "lookup", "diagram", "memory"),
+              budget=budgets.get("adaptive"), fallback=adaptive_stage),
+    ], budget=budget)
+    hit = run.outputs["lookup"] is not None
+    response_cache.observe(hit, run.total)
+    if not hit and not {"embed", "lookup", "nlp", "diagram"} & run.degraded.keys():  # never cache fallbacks
+        nlp = run.outputs["nlp"]
+        response_cache.put(run.outputs["embed"], {
+            "nlp": nlp, "diagram": diagram_service.path_for(nlp["key_terms"], nlp["topic_type"]),
+            "response": BASE_RESPONSE})
+    return run
+
+def teaching_assistant_pipeline(text: str, budget: Optional[float] = None,
+                                stage_budgets: Optional[Dict[str, float]] = None, user_id: str = DEFAULT_USER) -> str:
+    run = run_pipeline(text, budget, stage_budgets, user_id)
+    if run.outputs["lookup"]:
+        print("\n⚡ Answered from the response cache")
+    print("\n🔍 NLP Agent Output:", run.outputs["nlp"])
+    diagram = run.outputs["diagram"]
+    if hasattr(diagram, "add_done_callback"):
+        diagram.add_done_callback(
+            lambda f: None if f.exception() else print(f"\n🖼️ Concept diagram: {f.result()}"))
+    elif diagram:
+        print(f"\n🖼️ Concept diagram (cached): {diagram}")
+    if run.outputs["memory"]:
+        print(f"\n🧠 Previously you asked something similar: '{run.outputs['memory']}'")
+    print(f"\n📊 Engagement Score: {run.outputs['engagement']}")
+    print("\n🤖 Final Teaching Response:\n", run.outputs["adaptive"])
+    print(f"\n⏱️ Stage timings: {run.timing_report()}")
+    if run.degraded:
+        print(f"\n⚠️ Degraded stages: {run.degraded}")
+    return run.outputs["adaptive"]
 
 # ----------------------------- TEST -----------------------------
 if __name__ == "__main__":
+    start_engagement_sampler()  # warms up camera and model while the user types
     user_query = input("Enter your question: ")
     teaching_assistant_pipeline(user_query)
@@ -0,0 +1,847 @@
+# Dialogue Memory Stores - shared by Main.py and App.py
+
+# Requirements:
+# pip install numpy faiss-cpu
+
+
+import hashlib
+import os
+import shutil
+import struct
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ----------------------------- GROWABLE VECTOR BUFFER -----------------------------
+class VectorBuffer:
+    # Contiguous (capacity, dim) array that doubles when full, so appends are amortized O(1)
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024, dtype=np.float32):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._initial_capacity = max(1, capacity)
+        self._data = None if dim is None else np.empty((self._initial_capacity, dim), dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._data is None else len(self._data)
+
+    @property
+    def view(self) -> np.ndarray:
+        if self._data is None:
+            return np.empty((0, self.dim or 0), dtype=self.dtype)
+        return self._data[:self.count]
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._data is None else self._data.nbytes
+
+    def _reserve(self, extra: int):
+        needed = self.count + extra
+        if self._data is None:
+            self._data = np.empty((max(self._initial_capacity, needed), self.dim), dtype=self.dtype)
+            return
+        if needed <= len(self._data):
+            return
+        new_capacity = len(self._data)
+        while new_capacity < needed:
+            new_capacity *= 2
+        grown = np.empty((new_capacity, self.dim), dtype=self.dtype)
+        grown[:self.count] = self._data[:self.count]
+        self._data = grown
+
+    def drop_front(self, n: int):
+        # Forget the oldest n rows; shrinks the allocation once it is mostly empty
+        n = min(n, self.count)
+        if n <= 0:
+            return
+        remaining = self.count - n
+        if len(self._data) > 4 * max(remaining, self._initial_capacity):
+            self._data = self._data[n:self.count].copy()
+        else:
+            self._data[:remaining] = self._data[n:self.count]
+        self.count = remaining
+
+    def extend(self, vectors: np.ndarray) -> int:
+        if self.dim is None:
+            self.dim = int(np.shape(vectors)[-1])
+        vectors = np.asarray(vectors, dtype=self.dtype).reshape(-1, self.dim)
+        start = self.count
+        self._reserve(len(vectors))
+        self._data[start:start + len(vectors)] = vectors
+        self.count += len(vectors)
+        return start
+
+
+def _l2_dist(data: np.ndarray, sq_norms: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    # Squared L2 via |x|^2 - 2x.q + |q|^2, matching faiss.IndexFlatL2 distances
+    dist = sq_norms[None, :] - 2.0 * (queries @ data.T) + np.einsum("ij,ij->i", queries, queries)[:, None]
+    return np.maximum(dist, 0.0, out=dist)
+
+
+def _l2_topk(data: np.ndarray, sq_norms: np.ndarray, queries: np.ndarray, k: int):
+    return _topk(_l2_dist(data, sq_norms, queries), k)
+
+
+def _topk(dist: np.ndarray, k: int):
+    # Smallest k per row, sorted ascending: (distances, column indices)
+    k = min(k, dist.shape[1])
+    idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(dist, idx, axis=1)
+    order = np.argsort(top, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+# ----------------------------- L2 VECTOR INDEX (Main.py) -----------------------------
+class VectorIndex:
+    # Long-lived index: "flat" scans the buffer exactly, "ivf"/"hnsw" add a faiss index for large histories
+    MODES = ("flat", "ivf", "hnsw")
+
+    def __init__(self, dim: Optional[int] = None, mode: str = "flat", capacity: int = 1024,
+                 nlist: int = 1024, nprobe: int = 16, hnsw_m: int = 32, ef_search: int = 64,
+                 train_size: Optional[int] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown index mode '{mode}', expected one of {self.MODES}")
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.train_size = train_size or nlist * 39  # faiss warns below ~39 points per centroid
+        self.texts: List[str] = []
+        self.vectors = VectorBuffer(dim, capacity)
+        self._sq_norms = VectorBuffer(1, capacity)
+        self._index = None
+        self._quantizer = None
+        self._indexed = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self._sq_norms.nbytes
+
+    def add(self, text: str, vector: np.ndarray):
+        self.add_many([text], np.asarray(vector).reshape(1, -1))
+
+    def add_many(self, texts: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        self.vectors.extend(vectors)
+        self._sq_norms.extend(np.einsum("ij,ij->i", vectors, vectors))
+        self.texts.extend(texts)
+        self._sync_index()
+
+    def drop_oldest(self, n: int):
+        self.vectors.drop_front(n)
+        self._sq_norms.drop_front(n)
+        del self.texts[:n]
+        if self._index is not None:
+            self._index, self._quantizer, self._indexed = None, None, 0  # faiss ids shifted: rebuild
+            self._sync_index()
+
+    def _build_index(self):
+        import faiss
+        dim = self.vectors.dim
+        if self.mode == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m)
+            index.hnsw.efSearch = self.ef_search
+            return index
+        if len(self) < self.train_size:
+            return None  # IVF needs enough points to train; exact scan until then
+        self._quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(self._quantizer, dim, self.nlist)
+        index.train(self.vectors.view)
+        index.nprobe = self.nprobe
+        return index
+
+    def _sync_index(self):
+        if self.mode == "flat":
+            return
+        if self._index is None:
+            self._index = self._build_index()
+            if self._index is None:
+                return
+        if self._indexed < len(self):
+            self._index.add(self.vectors.view[self._indexed:])
+            self._indexed = len(self)
+
+    def texts_at(self, positions: np.ndarray) -> List[str]:
+        return [self.texts[i] for i in positions]
+
+    def vectors_at(self, positions: np.ndarray) -> np.ndarray:
+        # Exact vectors of live turns by position, oldest = 0
+        return self.vectors.view[positions]
+
+    def search(self, vector: np.ndarray, k: int = 1, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        if not self.texts:
+            return []
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        if self._index is None:
+            D, I = _l2_topk(self.vectors.view, self._sq_norms.view[:, 0], query, k)
+        else:
+            D, I = self._index.search(query, min(k, len(self)))
+        hits = []
+        for dist, i in zip(D[0], I[0]):
+            if i < 0 or (threshold is not None and dist >= threshold):
+                continue
+            hits.append((self.texts[i], float(dist)))
+        return hits
+
+# ----------------------------- COSINE VECTOR STORE (App.py) -----------------------------
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class CosineStore:
+    # Rows are L2-normalized on insert, so cosine top-k is one matmul plus argpartition
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024):
+        self.texts: List[str] = []
+        self.vectors = VectorBuffer(dim, capacity)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+    def add(self, text: str, vector: np.ndarray):
+        self.add_many([text], np.asarray(vector).reshape(1, -1))
+
+    def add_many(self, texts: List[str], vectors: np.ndarray):
+        self.vectors.extend(_normalize(np.reshape(vectors, (len(texts), -1))))
+        self.texts.extend(texts)
+
+    def drop_oldest(self, n: int):
+        self.vectors.drop_front(n)
+        del self.texts[:n]
+
+    def search_many(self, vectors: np.ndarray, k: int = 1,
+                    threshold: Optional[float] = None) -> List[List[Tuple[str, float]]]:
+        queries = _normalize(np.reshape(vectors, (-1, np.shape(vectors)[-1])))
+        if not self.texts:
+            return [[] for _ in range(len(queries))]
+        sims = queries @ self.vectors.view.T
+        k = min(k, sims.shape[1])
+        idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(sims, idx, axis=1)
+        order = np.argsort(-top, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        dist = np.clip(1.0 - np.take_along_axis(top, order, axis=1), 0.0, 2.0)  # sklearn's cosine distance
+        results = []
+        for row_dist, row_idx in zip(dist, idx):
+            results.append([(self.texts[i], float(d)) for d, i in zip(row_dist, row_idx)
+                            if threshold is None or d < threshold])
+        return results
+
+    def search(self, vector: np.ndarray, k: int = 1, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        return self.search_many(np.reshape(vector, (1, -1)), k, threshold)[0]
+
+
+# ----------------------------- MEMORY-MAPPED DIALOGUE STORE (Main.py / App.py) -----------------------------
+class DiskDialogueStore:
+    # Persistent drop-in for VectorIndex (metric="l2") and CosineStore (metric="cosine"). A directory of:
+    #   header.bin   magic, version, metric, dim, first, count - rewritten last, so it is the commit point;
+    #                rows before `first` were dropped by drop_oldest() and are never searched
+    #   vectors.f32  append-only float32 rows, np.memmap'd; grown by doubling (cosine rows stored unit-length)
+    #   texts.bin    UTF-8 texts back to back
+    #   offsets.u64  end offset of each text in texts.bin
+    # Opening maps the files without reading the vectors, so restarts cost milliseconds at any size. Once dropped
+    # rows outnumber compact_ratio of all rows, the live ones are rewritten to <path>.compact and swapped in.
+    HEADER = struct.Struct("<4sHHIQQ")
+    MAGIC = b"DLGS"
+    METRICS = ("l2", "cosine")
+
+    def __init__(self, path: str, dim: Optional[int] = None, metric: str = "l2", chunk_rows: int = 65_536,
+                 compact_ratio: float = 0.5):
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {self.METRICS}")
+        self._recover(path)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.metric = metric
+        self.dim = dim
+        self.chunk_rows = chunk_rows
+        self.compact_ratio = compact_ratio
+        self.compactions = 0
+        self.first = 0
+        self.count = 0
+        self._vectors = None
+        self._sq_norms = VectorBuffer(1)  # l2 only, filled lazily on the first search after a restart
+        self._lock = threading.Lock()
+        header = os.path.join(path, "header.bin")
+        if os.path.exists(header):
+            self._open_existing(header)
+        self._open_files()
+
+    @staticmethod
+    def _recover(path: str):
+        # <path>.old only exists once <path>.compact is complete, so a crash mid-swap is finished here and a
+        # crash while writing <path>.compact just discards it
+        staged, old = path + ".compact", path + ".old"
+        if os.path.isdir(old):
+            if not os.path.isdir(path):
+                os.rename(staged, path)
+            shutil.rmtree(old)
+        shutil.rmtree(staged, ignore_errors=True)
+
+    def _open_files(self):
+        self._texts = open(self._file("texts.bin"), "ab+")
+        self._offsets_file = open(self._file("offsets.u64"), "ab+")
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open_existing(self, header: str):
+        with open(header, "rb") as f:
+            magic, version, metric, dim, first, count = self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC or version != 1:
+            raise ValueError(f"{self.path} is not a dialogue store")
+        if self.METRICS[metric] != self.metric:
+            raise ValueError(f"{self.path} was written with metric '{self.METRICS[metric]}', not '{self.metric}'")
+        if self.dim is not None and dim != self.dim:
+            raise ValueError(f"{self.path} holds {dim}-dim vectors, not {self.dim}")
+        self.dim, self.first, self.count = dim, first, count
+        # Drop anything a crashed writer appended past the committed count
+        with open(self._file("offsets.u64"), "r+b") as f:
+            f.truncate(count * 8)
+        offsets = np.fromfile(self._file("offsets.u64"), dtype=np.uint64)
+        self._offsets = VectorBuffer(1, max(1024, count), dtype=np.uint64)
+        self._offsets.extend(offsets.reshape(-1, 1))
+        with open(self._file("texts.bin"), "r+b") as f:
+            f.truncate(int(offsets[-1]) if count else 0)
+        self._map(os.path.getsize(self._file("vectors.f32")) // (4 * dim))
+
+    def _map(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+        path = self._file("vectors.f32")
+        with open(path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _write_header(self, path: Optional[str] = None, first: Optional[int] = None, count: Optional[int] = None):
+        path = path or self.path
+        tmp = os.path.join(path, "header.bin.tmp")
+        with open(tmp, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, 1, self.METRICS.index(self.metric), self.dim,
+                                     self.first if first is None else first,
+                                     self.count if count is None else count))
+        os.replace(tmp, os.path.join(path, "header.bin"))
+
+    def __len__(self) -> int:
+        return self.count - self.first
+
+    @property
+    def nbytes(self) -> int:
+        # Resident bookkeeping only; vectors and texts stay in the page cache
+        return self._sq_norms.nbytes + (self._offsets.nbytes if self.count else 0)
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(os.path.getsize(self._file(name)) for name in ("vectors.f32", "texts.bin", "offsets.u64"))
+
+    def add(self, text: str, vector: np.ndarray):
+        self.add_many([text], np.asarray(vector).reshape(1, -1))
+
+    def add_many(self, texts: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        if self.metric == "cosine":
+            vectors = _normalize(vectors)
+        blobs = [text.encode("utf-8") for text in texts]
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if self._vectors is None:
+                self._offsets = VectorBuffer(1, 1024, dtype=np.uint64)
+                self._map(max(1024, len(texts)))
+            if self.count + len(texts) > len(self._vectors):
+                capacity = max(1024, len(self._vectors))
+                while capacity < self.count + len(texts):
+                    capacity *= 2
+                self._map(capacity)
+            self._vectors[self.count:self.count + len(texts)] = vectors
+            self._vectors.flush()
+            end = int(self._offsets.view[-1, 0]) if self.count else 0
+            ends = end + np.cumsum([len(blob) for blob in blobs], dtype=np.uint64)
+            self._texts.write(b"".join(blobs))
+            self._texts.flush()
+            self._offsets_file.write(ends.astype("<u8").tobytes())
+            self._offsets_file.flush()
+            self._offsets.extend(ends.reshape(-1, 1))
+            self.count += len(texts)
+            self._write_header()
+
+    def drop_oldest(self, n: int):
+        # Logical delete: the rows stay in the append-only files, searches start after them, until compaction
+        with self._lock:
+            self.first = min(self.count, self.first + n)
+            self._write_header()
+            if self.first > self.compact_ratio * self.count:
+                self._compact()
+
+    def _compact(self):
+        # Copies the live rows into <path>.compact (header last), swaps the directories and renumbers rows from
+        # 0, so the files, offsets and cached norms stop growing with dropped rows. Each row is copied at most
+        # once per compaction and compactions need as many new drops as there are live rows: O(1) amortized.
+        live, first = self.count - self.first, self.first
+        staged, old = self.path + ".compact", self.path + ".old"
+        shutil.rmtree(staged, ignore_errors=True)
+        os.makedirs(staged)
+        capacity = max(1024, live)
+        vectors = np.memmap(os.path.join(staged, "vectors.f32"), dtype=np.float32, mode="w+",
+                            shape=(capacity, self.dim))
+        for start in range(0, live, self.chunk_rows):
+            end = min(live, start + self.chunk_rows)
+            vectors[start:end] = self._vectors[first + start:first + end]
+        vectors.flush()
+        del vectors
+        offsets = self._offsets.view[first:self.count, 0]
+        base = int(self._offsets.view[first - 1, 0]) if first else 0
+        self._texts.seek(base)
+        with open(os.path.join(staged, "texts.bin"), "wb") as f:
+            remaining = int(offsets[-1]) - base if live else 0
+            while remaining:
+                block = self._texts.read(min(remaining, 1 << 20))
+                f.write(block)
+                remaining -= len(block)
+        offsets = offsets - np.uint64(base)
+        offsets.astype("<u8").tofile(os.path.join(staged, "offsets.u64"))
+        self._write_header(staged, 0, live)
+        self._vectors.flush()
+        self._vectors = None
+        self._texts.close()
+        self._offsets_file.close()
+        os.rename(self.path, old)
+        os.rename(staged, self.path)
+        shutil.rmtree(old)
+        self._open_files()
+        self._map(capacity)
+        compacted = VectorBuffer(1, max(1024, live), dtype=np.uint64)
+        compacted.extend(offsets.reshape(-1, 1))
+        self._offsets = compacted
+        norms = VectorBuffer(1)
+        if len(self._sq_norms) > first:
+            norms.extend(self._sq_norms.view[first:])
+        self._sq_norms = norms
+        self.first, self.count = 0, live
+        self.compactions += 1
+
+    @property
+    def texts(self) -> List[str]:
+        # Live turns, oldest first (read back from texts.bin, like VectorIndex.texts / CosineStore.texts)
+        with self._lock:
+            return [self._text(i) for i in range(self.first, self.count)]
+
+    def texts_at(self, positions: np.ndarray) -> List[str]:
+        with self._lock:
+            return [self._text(self.first + int(i)) for i in positions]
+
+    def vectors_at(self, positions: np.ndarray) -> np.ndarray:
+        # Exact vectors of live turns by position, oldest = 0, paged in from the mapped file
+        with self._lock:
+            return np.array(self._vectors[np.asarray(positions, dtype=np.int64) + self.first])
+
+    def _text(self, i: int) -> str:
+        offsets = self._offsets.view[:, 0]
+        start = int(offsets[i - 1]) if i else 0
+        self._texts.seek(start)  # "ab+": reads honour the seek, writes still append
+        return self._texts.read(int(offsets[i]) - start).decode("utf-8")
+
+    def _dist(self, start: int, end: int, queries: np.ndarray) -> np.ndarray:
+        rows = self._vectors[start:end]
+        if self.metric == "cosine":
+            return np.clip(1.0 - queries @ rows.T, 0.0, 2.0)  # sklearn's cosine distance
+        if len(self._sq_norms) < end:
+            missing = self._vectors[len(self._sq_norms):end]
+            self._sq_norms.extend(np.einsum("ij,ij->i", missing, missing))
+        return _l2_dist(rows, self._sq_norms.view[start:end, 0], queries)
+
+    def search_many(self, vectors: np.ndarray, k: int = 1,
+                    threshold: Optional[float] = None) -> List[List[Tuple[str, float]]]:
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, np.shape(vectors)[-1])
+        if self.metric == "cosine":
+            queries = _normalize(queries)
+        with self._lock:
+            first, count = self.first, self.count
+            if count == first:
+                return [[] for _ in range(len(queries))]
+            # Exact scan in chunks: bounded scratch memory, pages streamed from the mapped file
+            best_d = np.full((len(queries), 0), np.inf, dtype=np.float32)
+            best_i = np.empty((len(queries), 0), dtype=np.int64)
+            for start in range(first, count, self.chunk_rows):
+                end = min(count, start + self.chunk_rows)
+                D, I = _topk(self._dist(start, end, queries), k)
+                D, I = np.hstack([best_d, D]), np.hstack([best_i, I + start])
+                order = np.argsort(D, axis=1)[:, :k]
+                best_d, best_i = np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+            return [[(self._text(int(i)), float(d)) for d, i in zip(row_d, row_i)
+                     if threshold is None or d < threshold]
+                    for row_d, row_i in zip(best_d, best_i)]
+
+    def search(self, vector: np.ndarray, k: int = 1, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        return self.search_many(np.reshape(vector, (1, -1)), k, threshold)[0]
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._texts.close()
+            self._offsets_file.close()
+
+# ----------------------------- COMPRESSED L2 INDEX (Main.py) -----------------------------
+class CompressedIndex:
+    # Holds compact faiss codes in RAM and re-ranks a shortlist against the exact float32 vectors, which live in
+    # a DiskDialogueStore when `path` is given (otherwise an in-RAM VectorIndex). code_size is bytes per vector:
+    #   fp16   IndexScalarQuantizer QT_fp16, always 2*dim
+    #   sq     IndexScalarQuantizer with 8, 6 or 4 bits per dimension: dim, 3*dim/4 or dim/2 (default dim)
+    #   ivfpq  IndexIVFPQ with code_size 8-bit sub-quantizers over nlist lists; dim must divide evenly
+    # Codecs are trained on train_size stored vectors (or train(sample) / a trained `template` shared across
+    # shards); until then search scans the exact store. Codes carry global ids, so drop_oldest removes a range.
+    CODECS = ("fp16", "sq", "ivfpq")
+    SQ_TYPES = {8: "QT_8bit", 6: "QT_6bit", 4: "QT_4bit"}
+
+    def __init__(self, dim: Optional[int] = None, codec: str = "sq", code_size: Optional[int] = None,
+                 shortlist: int = 16, rerank: bool = True, nlist: int = 256, nprobe: int = 16,
+                 train_size: Optional[int] = None, path: Optional[str] = None, template=None, capacity: int = 1024):
+        if codec not in self.CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {self.CODECS}")
+        self.codec = codec
+        self.code_size = code_size
+        self.shortlist = shortlist
+        self.rerank = rerank
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or {"fp16": 1, "sq": 256, "ivfpq": max(nlist, 256) * 39}[codec]
+        self.exact = DiskDialogueStore(path, dim, "l2") if path else VectorIndex(dim, capacity=capacity)
+        self._index = None
+        self._dropped = 0  # global id of live position 0
+        self._encoded = 0  # global id of the first row not yet encoded
+        if template is not None:
+            import faiss
+            self._index = faiss.clone_index(template)
+        if self._index is not None or len(self.exact) >= self.train_size:
+            self._sync()  # a reopened disk store is re-encoded from its exact vectors
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    @property
+    def texts(self) -> List[str]:
+        return self.exact.texts
+
+    @property
+    def trained(self) -> bool:
+        return self._index is not None
+
+    def code_bytes(self, dim: int) -> int:
+        if self.codec == "fp16":
+            return 2 * dim
+        if self.codec == "sq":
+            return self.code_size or dim
+        return self.code_size or max(m for m in range(1, dim // 4 + 1) if dim % m == 0)
+
+    @property
+    def nbytes(self) -> int:
+        # Codes plus one int64 id per vector, on top of whatever the exact store keeps resident
+        codes = 0 if self._index is None else self._index.ntotal * (self.code_bytes(self.exact_dim) + 8)
+        return codes + self.exact.nbytes
+
+    @property
+    def exact_dim(self) -> int:
+        return self.exact.dim if isinstance(self.exact, DiskDialogueStore) else self.exact.vectors.dim
+
+    def make_index(self, dim: int):
+        # Untrained faiss index for this codec; train() it once and pass it as `template` to share it
+        import faiss
+        size = self.code_bytes(dim)
+        if self.codec == "ivfpq":
+            if dim % size:
+                raise ValueError(f"ivfpq code_size {size} must divide dim {dim}")
+            index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, self.nlist, size, 8)
+            index.nprobe = self.nprobe
+            return index
+        if self.codec == "fp16":
+            if self.code_size not in (None, size):
+                raise ValueError(f"fp16 codes are 2*dim = {size} bytes, not {self.code_size}")
+            qtype = faiss.ScalarQuantizer.QT_fp16
+        else:
+            bits = size * 8 // dim
+            if bits not in self.SQ_TYPES or bits * dim != size * 8:
+                raise ValueError(f"sq code_size must be {dim}, {3 * dim // 4} or {dim // 2} bytes for dim {dim}")
+            qtype = getattr(faiss.ScalarQuantizer, self.SQ_TYPES[bits])
+        return faiss.IndexIDMap(faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2))
+
+    def train(self, sample: Optional[np.ndarray] = None, seed: int = 0):
+        # Learns the codec from `sample` (default: up to train_size stored vectors) and encodes everything stored
+        if sample is None:
+            n = len(self.exact)
+            positions = np.arange(n) if n <= self.train_size else \
+                np.sort(np.random.default_rng(seed).choice(n, self.train_size, replace=False))
+            sample = self.exact.vectors_at(positions)
+        sample = np.ascontiguousarray(sample, dtype=np.float32)
+        index = self.make_index(sample.shape[1])
+        index.train(sample)
+        self._index = index
+        self._encoded = self._dropped
+        self._sync()
+
+    def _sync(self, chunk: int = 65_536):
+        if self._index is None:
+            self.train()
+            return
+        end = self._dropped + len(self.exact)
+        for start in range(self._encoded, end, chunk):
+            stop = min(end, start + chunk)
+            vectors = np.ascontiguousarray(self.exact.vectors_at(np.arange(start, stop) - self._dropped))
+            self._index.add_with_ids(vectors, np.arange(start, stop, dtype=np.int64))
+        self._encoded = end
+
+    def add(self, text: str, vector: np.ndarray):
+        self.add_many([text], np.asarray(vector).reshape(1, -1))
+
+    def add_many(self, texts: List[str], vectors: np.ndarray):
+        self.exact.add_many(texts, vectors)
+        if self._index is not None or len(self.exact) >= self.train_size:
+            self._sync()
+
+    def drop_oldest(self, n: int):
+        import faiss
+        n = min(n, len(self.exact))
+        self.exact.drop_oldest(n)
+        if self._index is not None:
+            self._index.remove_ids(faiss.IDSelectorRange(self._dropped, self._dropped + n))
+        self._dropped += n
+        self._encoded = max(self._encoded, self._dropped)
+
+    def search(self, vector: np.ndarray, k: int = 1, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        if self._index is None:
+            return self.exact.search(vector, k, threshold)
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        D, I = self._index.search(query, max(k, self.shortlist) if self.rerank else k)
+        found = I[0] >= 0
+        positions, dist = I[0][found] - self._dropped, D[0][found]
+        if self.rerank and len(positions):
+            # Exact squared L2 over the shortlist: approximate codes pick candidates, exact vectors decide
+            diff = self.exact.vectors_at(positions) - query
+            dist = np.einsum("ij,ij->i", diff, diff)
+            order = np.argsort(dist)[:k]
+            positions, dist = positions[order], dist[order]
+        keep = dist < threshold if threshold is not None else np.ones(len(dist), dtype=bool)
+        positions, dist = positions[keep][:k], dist[keep][:k]
+        return list(zip(self.exact.texts_at(positions), map(float, dist)))
+
+    def close(self):
+        if isinstance(self.exact, DiskDialogueStore):
+            self.exact.close()
+
+# ----------------------------- PER-USER SHARDED MEMORY (Main.py / App.py) -----------------------------
+DEFAULT_USER = "default"  # single-user CLI runs
+
+def shard_path(root: str, user_id: str) -> str:
+    # One directory per user, named by a hash so any user id is a safe path
+    return os.path.join(root, hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:16])
+
+
+def disk_shard_factory(root: str, metric: str) -> Callable[[str], DiskDialogueStore]:
+    def open_shard(user_id: str) -> DiskDialogueStore:
+        return DiskDialogueStore(shard_path(root, user_id), metric=metric)
+    return open_shard
+
+
+def compressed_shard_factory(root: Optional[str], codec: str, sample: Optional[np.ndarray] = None,
+                             max_turns: Optional[int] = None, **options) -> Callable[[str], CompressedIndex]:
+    # CompressedIndex per user, exact vectors on disk under `root` (or in RAM when root is None). With a
+    # training `sample` the codec is trained once and every shard starts from a clone of it. Without one each
+    # shard trains on its own turns, so a shard capped at max_turns must be able to reach train_size.
+    train_size = CompressedIndex(codec=codec, **options).train_size
+    if sample is None and max_turns is not None and max_turns < train_size:
+        raise ValueError(f"{codec} trains on {train_size} vectors but a shard keeps at most {max_turns} turns; "
+                         f"pass a training sample")
+    template = None
+    if sample is not None:
+        sample = np.ascontiguousarray(sample, dtype=np.float32)
+        template = CompressedIndex(codec=codec, **options).make_index(sample.shape[1])
+        template.train(sample)
+
+    def open_shard(user_id: str) -> CompressedIndex:
+        return CompressedIndex(codec=codec, path=shard_path(root, user_id) if root else None,
+                               template=template, **options)
+    return open_shard
+
+
+class ShardedMemory:
+    # Each user/session gets its own small store, so a lookup only scans that user's history.
+    # Caps: a shard keeps its newest max_turns_per_shard turns; when all shards together hold more than
+    # max_total_bytes, or one sits idle longer than ttl seconds, whole shards are evicted least recently
+    # used first. More than max_shards open shards also evicts: a disk shard holds ~3 file descriptors but
+    # only a few KB of nbytes, so the byte cap alone would run out of descriptors long before memory.
+    # Evicting an in-RAM shard forgets it; a disk shard is closed and reopens later. A shard with a call in
+    # flight is never evicted, so a reopened disk shard can't have a second writer on its directory. Shards are
+    # built outside the global lock (a disk open or re-encode doesn't block other users); concurrent first
+    # calls for one user wait for a single build.
+    def __init__(self, factory: Callable[[str], object], max_turns_per_shard: int = 500,
+                 max_total_bytes: int = 256 * 2**20, ttl: Optional[float] = None, max_shards: int = 256):
+        self.factory = factory
+        self.max_turns_per_shard = max_turns_per_shard
+        self.max_total_bytes = max_total_bytes
+        self.ttl = ttl
+        self.max_shards = max_shards
+        self.evictions = 0
+        self._total_bytes = 0  # running sum, resynced by nbytes/usage()
+        self._shards: "OrderedDict[str, object]" = OrderedDict()
+        self._shard_locks: Dict[str, threading.Lock] = {}  # the stores aren't thread-safe on their own
+        self._in_use: Dict[str, int] = {}  # calls holding each shard, see _use()
+        self._opening: Dict[str, threading.Event] = {}  # shards being built by factory(), set once inserted
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def shard(self, user_id: str, create: bool = True):
+        with self._use(user_id, create) as (store, _):
+            return store
+
+    def _open(self, user_id: str, create: bool = True):
+        # (store, the lock every add/search on it holds), or (None, None) for an unknown user when not create.
+        # The store is held against eviction until the matching _release()
+        while True:
+            with self._lock:
+                self._expire(time.monotonic())
+                if user_id in self._shards:
+                    return self._pin(user_id)
+                if not create:
+                    return None, None
+                opening = self._opening.get(user_id)
+                if opening is None:
+                    opening = self._opening[user_id] = threading.Event()
+                    break
+            opening.wait()  # another call is building this shard; take it from self._shards once it's in
+        try:
+            store = self.factory(user_id)
+        except BaseException:
+            with self._lock:
+                del self._opening[user_id]
+            opening.set()
+            raise
+        with self._lock:
+            self._shards[user_id] = store
+            self._shard_locks[user_id] = threading.Lock()
+            self._total_bytes += store.nbytes
+            del self._opening[user_id]
+            opening.set()
+            pinned = self._pin(user_id)
+            self._enforce_caps(keep=user_id)
+            return pinned
+
+    def _pin(self, user_id: str):
+        # Caller holds self._lock
+        self._shards.move_to_end(user_id)
+        self._last_used[user_id] = time.monotonic()
+        self._in_use[user_id] = self._in_use.get(user_id, 0) + 1
+        return self._shards[user_id], self._shard_locks[user_id]
+
+    def _release(self, user_id: str):
+        # Caller holds self._lock
+        if self._in_use[user_id] == 1:
+            del self._in_use[user_id]
+        else:
+            self._in_use[user_id] -= 1
+
+    @contextmanager
+    def _use(self, user_id: str, create: bool = True):
+        store, lock = self._open(user_id, create)
+        if store is None:
+            yield None, None
+            return
+        try:
+            with lock:
+                yield store, lock
+        finally:
+            with self._lock:
+                self._release(user_id)
+                self._enforce_caps(keep=user_id)
+
+    def add(self, user_id: str, text: str, vector: np.ndarray):
+        with self._use(user_id) as (store, _):
+            before = store.nbytes
+            store.add(text, vector)
+            overflow = len(store) - self.max_turns_per_shard
+            if overflow > 0:
+                store.drop_oldest(overflow)
+            grown = store.nbytes - before
+            with self._lock:
+                self._total_bytes += grown
+
+    def search(self, user_id: str, vector: np.ndarray, k: int = 1,
+               threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        with self._use(user_id, create=False) as (store, _):
+            return store.search(vector, k, threshold) if store is not None else []
+
+    def search_many(self, user_id: str, vectors: np.ndarray, k: int = 1,
+                    threshold: Optional[float] = None) -> List[List[Tuple[str, float]]]:
+        with self._use(user_id, create=False) as (store, _):
+            if store is None:
+                return [[] for _ in range(len(vectors))]
+            return store.search_many(vectors, k, threshold)
+
+    def apply(self, user_id: str, fn: Callable[[object], object], default=None):
+        # fn(store) under the shard's lock, for store methods ShardedMemory doesn't wrap; default for unknown users
+        with self._use(user_id, create=False) as (store, _):
+            return fn(store) if store is not None else default
+
+    def evict(self, user_id: str) -> bool:
+        # False if the shard is unknown or has a call in flight
+        with self._lock:
+            return self._evict(user_id)
+
+    def _evict(self, user_id: str) -> bool:
+        if user_id in self._in_use or user_id not in self._shards:
+            return False
+        store = self._shards.pop(user_id)
+        del self._shard_locks[user_id]
+        del self._last_used[user_id]
+        self._total_bytes -= store.nbytes
+        self.evictions += 1
+        close = getattr(store, "close", None)
+        if close is not None:
+            close()  # before anyone can reopen the same directory
+        return True
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        for user_id in list(self._shards):
+            if now - self._last_used[user_id] <= self.ttl:
+                break
+            self._evict(user_id)
+
+    def _enforce_caps(self, keep: str):
+        # Least recently used first; shards in use are skipped and get another chance when released
+        for user_id in list(self._shards):
+            if self._total_bytes <= self.max_total_bytes and len(self._shards) <= self.max_shards:
+                break
+            if user_id != keep:
+                self._evict(user_id)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            self._total_bytes = sum(store.nbytes for store in self._shards.values())
+            return self._total_bytes
+
+    def usage(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return {user_id: {"turns": len(store), "bytes": store.nbytes,
+                              "idle_s": now - self._last_used[user_id]}
+                    for user_id, store in self._shards.items()}
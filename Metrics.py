@@ -0,0 +1,192 @@
+# Agent Instrumentation - per-call spans aggregated into HDR-style histograms (JSON / Prometheus export)
+
+# Off by default: a traced call then costs one global check. Turn on with enable() or AGENT_METRICS=1.
+
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Callable, Dict, List
+
+ENABLED = os.environ.get("AGENT_METRICS") == "1"
+TRACK_ALLOCATIONS = False
+
+def enable(allocations: bool = False):
+    # allocations=True starts tracemalloc; its counters are process-wide, so concurrent stages bleed into
+    # each other's numbers
+    global ENABLED, TRACK_ALLOCATIONS
+    ENABLED = True
+    TRACK_ALLOCATIONS = allocations
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global ENABLED, TRACK_ALLOCATIONS
+    ENABLED = False
+    if TRACK_ALLOCATIONS and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    TRACK_ALLOCATIONS = False
+
+# ----------------------------- HISTOGRAM -----------------------------
+class Histogram:
+    # HdrHistogram-style log-linear buckets: values are integers in `unit`s, each power of two is split into
+    # 2**(bits - 1) linear sub-buckets, so any recorded value is within 2**-(bits - 1) relative error
+    def __init__(self, unit: float = 1e-6, bits: int = 6):
+        self.unit = unit
+        self.bits = bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        v = max(0, int(value / self.unit))
+        shift = max(0, v.bit_length() - self.bits)
+        return (shift << self.bits) + (v >> shift)
+
+    def _upper(self, index: int) -> float:
+        shift, mantissa = index >> self.bits, index & ((1 << self.bits) - 1)
+        return ((mantissa + 1) << shift) * self.unit
+
+    def record(self, value: float):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {"count": self.count, "sum": self.total, "mean": self.total / self.count if self.count else 0.0,
+                "p50": self.percentile(0.50), "p90": self.percentile(0.90), "p99": self.percentile(0.99),
+                "max": self.max}
+
+# ----------------------------- PER-AGENT STATS -----------------------------
+class AgentStats:
+    def __init__(self):
+        self.wall = Histogram()
+        self.cpu = Histogram()
+        self.alloc_blocks = Histogram(unit=1)
+        self.alloc_bytes = Histogram(unit=1)
+        self.errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def to_dict(self) -> Dict:
+        data = {"calls": self.wall.count, "errors": self.errors, "wall_seconds": self.wall.summary(),
+                "cpu_seconds": self.cpu.summary(),
+                "cache": {"hits": self.cache_hits, "misses": self.cache_misses}}
+        if self.alloc_blocks.count:
+            data["alloc_blocks"] = self.alloc_blocks.summary()
+            data["alloc_bytes"] = self.alloc_bytes.summary()
+        return data
+
+
+_stats: Dict[str, AgentStats] = {}
+_lock = threading.Lock()
+
+def _agent(name: str) -> AgentStats:
+    stats = _stats.get(name)
+    if stats is None:
+        with _lock:
+            stats = _stats.setdefault(name, AgentStats())
+    return stats
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+# ----------------------------- RECORDING -----------------------------
+def traced(name: str) -> Callable:
+    def decorate(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            return _traced_call(name, fn, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def _traced_call(name: str, fn: Callable, args, kwargs):
+    allocations = TRACK_ALLOCATIONS
+    if allocations:
+        blocks_before = sys.getallocatedblocks()
+        bytes_before = tracemalloc.get_traced_memory()[0]
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    failed = False
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        stats = _agent(name)
+        with _lock:
+            stats.wall.record(wall)
+            stats.cpu.record(cpu)
+            stats.errors += failed
+            if allocations:
+                stats.alloc_blocks.record(max(0, sys.getallocatedblocks() - blocks_before))
+                stats.alloc_bytes.record(max(0, tracemalloc.get_traced_memory()[0] - bytes_before))
+
+
+def record_cache(name: str, hit: bool):
+    if not ENABLED:
+        return
+    stats = _agent(name)
+    with _lock:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+# ----------------------------- EXPORT -----------------------------
+def snapshot() -> Dict:
+    with _lock:
+        return {name: stats.to_dict() for name, stats in sorted(_stats.items())}
+
+
+def to_json(indent: int = 2) -> str:
+    return json.dumps(snapshot(), indent=indent)
+
+
+def to_prometheus(prefix: str = "agent") -> str:
+    lines: List[str] = []
+    data = snapshot()
+    for metric, key, help_text in [("wall_seconds", "wall_seconds", "Wall-clock time per agent call"),
+                                   ("cpu_seconds", "cpu_seconds", "Thread CPU time per agent call"),
+                                   ("alloc_blocks", "alloc_blocks", "Net memory blocks allocated per call")]:
+        rows = [(agent, stats[key]) for agent, stats in data.items() if key in stats]
+        if not rows:
+            continue
+        lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} summary"]
+        for agent, summary in rows:
+            for q in ("p50", "p90", "p99"):
+                lines.append(f'{prefix}_{metric}{{agent="{agent}",quantile="0.{q[1:]}"}} {summary[q]:.9g}')
+            lines.append(f'{prefix}_{metric}_sum{{agent="{agent}"}} {summary["sum"]:.9g}')
+            lines.append(f'{prefix}_{metric}_count{{agent="{agent}"}} {summary["count"]}')
+    for metric, key in [("errors_total", "errors"), ("cache_hits_total", "hits"), ("cache_misses_total", "misses")]:
+        lines += [f"# TYPE {prefix}_{metric} counter"]
+        for agent, stats in data.items():
+            value = stats["errors"] if key == "errors" else stats["cache"][key]
+            lines.append(f'{prefix}_{metric}{{agent="{agent}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,159 @@
+# Pipeline Orchestrator - runs agent stages as a dependency graph (shared by Main.py and App.py)
+
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# ----------------------------- STAGES -----------------------------
+class Stage:
+    # fn is called with the outputs of its deps as keyword arguments, e.g. fn(nlp=..., engagement=...).
+    # If it misses its budget (seconds) or raises, the run continues with `fallback` instead: a value, or a
+    # callable taking the same arguments as fn.
+    def __init__(self, name: str, fn: Callable, deps: Tuple[str, ...] = (), budget: Optional[float] = None,
+                 fallback: Any = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.budget = budget
+        self.fallback = fallback
+
+    def fallback_output(self, inputs: Dict[str, Any]):
+        return self.fallback(**inputs) if callable(self.fallback) else self.fallback
+
+
+class PipelineRun:
+    def __init__(self):
+        self.outputs: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}  # seconds spent inside each stage
+        self.degraded: Dict[str, str] = {}  # stage -> "timeout" / "over budget" / "backlog" / "error: ..."
+        self.total = 0.0
+
+    def timing_report(self) -> str:
+        stages = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.timings.items())
+        return f"{stages} | total {self.total * 1000:.1f}ms"
+
+# ----------------------------- STAGE POOLS -----------------------------
+class StageExecutors:
+    # A thread pool per stage name, so calls that run past their budget only hold workers of their own stage.
+    # Those late calls are counted until they finish; once a stage has max_abandoned of them, further runs
+    # skip it ("backlog") rather than queue behind stuck workers, so it never needs more than its own pool.
+    # `shared` puts every stage on one caller-owned pool instead, still counting late calls per stage.
+    def __init__(self, workers_per_stage: int = 8, max_abandoned: int = 6,
+                 shared: Optional[ThreadPoolExecutor] = None):
+        self.workers_per_stage = workers_per_stage
+        self.max_abandoned = max_abandoned
+        self.shared = shared
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._abandoned: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, name: str) -> ThreadPoolExecutor:
+        if self.shared is not None:
+            return self.shared
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                pool = self._pools[name] = ThreadPoolExecutor(max_workers=self.workers_per_stage,
+                                                              thread_name_prefix=f"pipeline-{name}")
+            return pool
+
+    def saturated(self, name: str) -> bool:
+        with self._lock:
+            return self._abandoned.get(name, 0) >= self.max_abandoned
+
+    def submit(self, stage: Stage, inputs: Dict[str, Any]) -> Future:
+        return self.pool(stage.name).submit(_timed, stage, inputs)
+
+    def abandon(self, name: str, future: Future):
+        # Called when a run stops waiting for `future`; it counts against the stage until it finishes
+        if future.cancel():  # still queued, so it never takes a worker
+            return
+        with self._lock:
+            self._abandoned[name] = self._abandoned.get(name, 0) + 1
+        future.add_done_callback(lambda _: self._release(name))
+
+    def _release(self, name: str):
+        with self._lock:
+            self._abandoned[name] -= 1
+
+    def abandoned(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: count for name, count in self._abandoned.items() if count}
+
+# ----------------------------- ORCHESTRATOR -----------------------------
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+def default_executor() -> StageExecutors:
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = StageExecutors()
+        return _default_executor
+
+
+def _timed(stage: Stage, inputs: Dict[str, Any]):
+    start = time.perf_counter()
+    output = stage.fn(**inputs)
+    return output, time.perf_counter() - start
+
+
+def run_stages(stages: List[Stage], executor: Optional[Union[StageExecutors, ThreadPoolExecutor]] = None,
+               budget: Optional[float] = None) -> PipelineRun:
+    # Each stage starts as soon as all of its deps have finished; independent stages overlap.
+    # A stage's deadline is its own budget, capped by the overall budget; stages that miss it are
+    # replaced by their fallback (the late thread is abandoned, not waited for, and counted by StageExecutors).
+    if not isinstance(executor, StageExecutors):
+        executor = StageExecutors(shared=executor) if executor is not None else default_executor()
+    run = PipelineRun()
+    waiting = {stage.name: stage for stage in stages}
+    running = {}
+    start = time.perf_counter()
+    overall_deadline = start + budget if budget is not None else None
+
+    def degrade(stage: Stage, inputs: Dict[str, Any], launched: float, reason: str):
+        run.outputs[stage.name] = stage.fallback_output(inputs)
+        run.timings[stage.name] = time.perf_counter() - launched
+        run.degraded[stage.name] = reason
+
+    while waiting or running:
+        for name, stage in list(waiting.items()):
+            if not all(dep in run.outputs for dep in stage.deps):
+                continue
+            del waiting[name]
+            inputs = {dep: run.outputs[dep] for dep in stage.deps}
+            launched = time.perf_counter()
+            if overall_deadline is not None and launched >= overall_deadline:
+                degrade(stage, inputs, launched, "over budget")
+                continue
+            if executor.saturated(name):
+                degrade(stage, inputs, launched, "backlog")
+                continue
+            deadline = launched + stage.budget if stage.budget is not None else None
+            if overall_deadline is not None:
+                deadline = overall_deadline if deadline is None else min(deadline, overall_deadline)
+            running[executor.submit(stage, inputs)] = (stage, inputs, launched, deadline)
+        if not running:
+            if waiting:
+                raise ValueError(f"Stages with unsatisfiable dependencies: {sorted(waiting)}")
+            break
+
+        deadlines = [deadline for *_, deadline in running.values() if deadline is not None]
+        timeout = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            stage, inputs, launched, _ = running.pop(future)
+            try:
+                run.outputs[stage.name], run.timings[stage.name] = future.result()
+            except Exception as exc:
+                degrade(stage, inputs, launched, f"error: {exc!r}")
+        now = time.perf_counter()
+        for future, (stage, inputs, launched, deadline) in list(running.items()):
+            if deadline is not None and now >= deadline:
+                executor.abandon(stage.name, future)
+                del running[future]
+                degrade(stage, inputs, launched, "timeout")
+    run.total = time.perf_counter() - start
+    return run
@@ -0,0 +1,106 @@
+# Benchmark suite CLI
+#   python -m benchmarks run [--out results.json] [--n 200] [--sections agents,pipeline] [--frames rec.mp4]
+#   python -m benchmarks compare baseline.json results.json [--threshold 0.15] [--floor-ms 0.05]
+# compare exits with status 1 when any latency grew (or throughput dropped) by more than the threshold, or when a
+# baseline metric is missing from the new run (its benchmark raised, or was dropped).
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+from benchmarks.suite import SECTIONS, run_suite
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "/"))
+        elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.startswith("throughput")):
+            flat[path] = float(value)
+    return flat
+
+
+def errors(results: Dict, prefix: str = "") -> Dict[str, str]:
+    # Rows that guarded() replaced with {"error": ...}, by path
+    found = {}
+    for key, value in results.items():
+        if key == "error" and isinstance(value, str):
+            found[prefix.rstrip("/")] = value
+        elif isinstance(value, dict) and key != "meta":
+            found.update(errors(value, f"{prefix}{key}/"))
+    return found
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, floor_ms: float = 0.05) -> Tuple[List[str], List[str]]:
+    # Relative change per metric; latencies regress upwards, throughput regresses downwards.
+    # Latencies under floor_ms in both runs are timer noise and never flagged. A baseline metric the new run
+    # doesn't have is always a regression: a benchmark that now raises must not pass the gate.
+    old, new = flatten(baseline), flatten(current)
+    failed = errors(current)
+    lines, regressions = [], []
+    for metric in sorted(old.keys() & new.keys()):
+        before, after = old[metric], new[metric]
+        if before <= 0:
+            continue
+        change = (after - before) / before
+        worse = -change if metric.endswith("throughput_per_s") else change
+        noise = metric.endswith("_ms") and max(before, after) < floor_ms
+        flag = "REGRESSION" if worse > threshold and not noise else ""
+        lines.append(f"{metric:70} {before:12.3f} {after:12.3f} {change:+8.1%} {flag}")
+        if flag:
+            regressions.append(metric)
+    for metric in sorted(old.keys() - new.keys()):
+        row = next((path for path in failed if metric.startswith(path + "/")), None)
+        reason = f"error: {failed[row]}" if row is not None else "missing from the new run"
+        lines.append(f"{metric:70} {old[metric]:12.3f} {'':>12} {'':>8} REGRESSION ({reason})")
+        regressions.append(metric)
+    return lines, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the suite and write JSON results")
+    run.add_argument("--out", default="benchmark_results.json")
+    run.add_argument("--n", type=int, default=200, help="synthetic questions per agent/pipeline")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--sections", default=",".join(SECTIONS))
+    run.add_argument("--sizes", default="1000,10000,100000", help="memory-store sizes for the scaling curve")
+    run.add_argument("--renders", type=int, default=50)
+    run.add_argument("--frames", default=None, help="recorded frames (.npz or video) instead of synthetic ones")
+    run.add_argument("--budget", type=float, default=None, help="overall pipeline budget in seconds")
+    diff = commands.add_parser("compare", help="diff two result files and flag regressions")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown, e.g. 0.15 = 15%%")
+    diff.add_argument("--floor-ms", type=float, default=0.05, help="ignore latencies below this in both runs")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_suite(args.n, args.seed, args.sections.split(","), [int(s) for s in args.sizes.split(",")],
+                            args.frames, args.renders, args.budget)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📊 Results written to {args.out}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    lines, regressions = compare(baseline, current, args.threshold, args.floor_ms)
+    print(f"{'metric':70} {'baseline':>12} {'current':>12} {'change':>8}")
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    print(f"\n✅ No regressions over {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
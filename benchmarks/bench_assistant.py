@@ -0,0 +1,121 @@
+# /api/assistant/ask load test against the local stub LLM: the async pooled route (Assistant.py) vs the old
+# sync `def ask` that makes a fresh blocking call per request, at increasing client concurrency
+# Run from the repo root: python -m benchmarks.bench_assistant [--latency 0.2] [--seconds 5] [--p99-target 0.4]
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.corpus import synthetic_questions
+
+# ----------------------------- LEGACY ROUTE -----------------------------
+# What Functionality.py's assistant did: a sync route (threadpool worker held for the whole round trip) and a
+# blocking client call with no connection reuse
+def make_legacy_app():
+    import httpx
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+    base_url = os.environ.get("CHAT_BASE_URL", "http://127.0.0.1:8001/v1")
+    app = FastAPI()
+
+    class Query(BaseModel):
+        query: str
+
+    @app.post("/api/assistant/ask")
+    def ask(query: Query):
+        response = httpx.post(f"{base_url}/chat/completions", timeout=30.0, json={
+            "model": "stub", "messages": [{"role": "system", "content": ""}, {"role": "user", "content": query.query}]})
+        return {"answer": response.json()["choices"][0]["message"]["content"]}
+
+    return app
+
+# ----------------------------- SERVERS -----------------------------
+def serve(app: str, port: int, env: Dict[str, str], factory: bool = False) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"]
+                            + (["--factory"] if factory else []), env={**os.environ, **env})
+
+
+def wait_ready(port: int, timeout: float = 20.0):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not come up within {timeout}s")
+
+# ----------------------------- LOAD -----------------------------
+async def closed_loop(url: str, concurrency: int, seconds: float, questions: List[str]) -> Dict:
+    # `concurrency` clients each send their next question as soon as the previous answer arrives
+    import httpx
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        async def worker(i: int):
+            nonlocal errors
+            n = i
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"query": questions[n % len(questions)]})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - t0)
+                except httpx.HTTPError:
+                    errors += 1
+                n += concurrency
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {"concurrency": concurrency, "requests_per_s": len(latencies) / elapsed, "errors": errors,
+            "p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_assistant")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds per completion")
+    parser.add_argument("--seconds", type=float, default=5.0, help="load duration per concurrency level")
+    parser.add_argument("--levels", default="1,8,32,64,128,256")
+    parser.add_argument("--p99-target", type=float, default=None, help="seconds; default 2x the stub latency")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args(argv)
+    target_ms = 1000 * (args.p99_target or 2 * args.latency)
+    stub_url = f"http://127.0.0.1:{args.port}/v1"
+    servers = {"stub": serve("benchmarks.stub_llm:app", args.port, {"STUB_LATENCY": str(args.latency),
+                                                                     "STUB_JITTER": str(args.latency / 10)}),
+               "async": serve("Assistant:app", args.port + 1, {"CHAT_PROVIDER": "stub", "CHAT_BASE_URL": stub_url,
+                                                               "CHAT_MAX_CONCURRENCY": "256",
+                                                               "CHAT_MAX_CONNECTIONS": "256"}),
+               "legacy": serve("benchmarks.bench_assistant:make_legacy_app", args.port + 2,
+                               {"CHAT_BASE_URL": stub_url}, factory=True)}
+    questions = synthetic_questions(500)
+    try:
+        for port in (args.port, args.port + 1, args.port + 2):
+            wait_ready(port)
+        print(f"stub latency {args.latency * 1000:.0f} ms, p99 target {target_ms:.0f} ms")
+        print(f"{'route':>7} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for name, port in (("legacy", args.port + 2), ("async", args.port + 1)):
+            best = 0.0
+            for level in (int(c) for c in args.levels.split(",")):
+                row = asyncio.run(closed_loop(f"http://127.0.0.1:{port}/api/assistant/ask", level, args.seconds,
+                                              questions))
+                print(f"{name:>7} {level:7d} {row['requests_per_s']:8.1f} {row['p50_ms']:8.1f} {row['p99_ms']:8.1f} "
+                      f"{row['errors']:6d}", flush=True)
+                if row["p99_ms"] <= target_ms and not row["errors"]:
+                    best = max(best, row["requests_per_s"])
+            print(f"{name:>7} best throughput with p99 <= {target_ms:.0f} ms: {best:.1f} req/s")
+    finally:
+        for server in servers.values():
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
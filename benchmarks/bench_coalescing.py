@@ -0,0 +1,85 @@
+# In-flight coalescing + short-TTL cache on /api/assistant/ask: a class of students sends the teacher's question
+# within a few seconds. Compares upstream calls and client latency with coalescing on and off, against the stub.
+# Run from the repo root: python -m benchmarks.bench_coalescing [--classes 10] [--students 40] [--spread 3]
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from benchmarks.bench_assistant import serve, wait_ready
+from benchmarks.corpus import synthetic_questions
+
+
+def burst(classes: int, students: int, spread: float, seed: int = 0) -> List[Tuple[float, str]]:
+    # (send time, question): each class repeats one question, with the odd case/whitespace difference
+    rng = random.Random(seed)
+    schedule = []
+    for question in synthetic_questions(classes, seed):
+        for _ in range(students):
+            text = question.lower() if rng.random() < 0.2 else question
+            schedule.append((rng.uniform(0, spread), text + (" " if rng.random() < 0.2 else "")))
+    return sorted(schedule)
+
+
+async def replay(url: str, schedule: List[Tuple[float, str]]) -> Dict:
+    import httpx
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=len(schedule), max_keepalive_connections=64)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+
+        async def send(at: float, question: str):
+            nonlocal errors
+            await asyncio.sleep(max(0.0, start + at - time.perf_counter()))
+            t0 = time.perf_counter()
+            try:
+                response = await client.post(url, json={"query": question})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+            except httpx.HTTPError:
+                errors += 1
+        await asyncio.gather(*(send(at, q) for at, q in schedule))
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99)), "errors": errors}
+
+
+def upstream_calls(port: int) -> int:
+    import httpx
+    return httpx.get(f"http://127.0.0.1:{port}/stats").json()["completions"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_coalescing")
+    parser.add_argument("--classes", type=int, default=10, help="distinct questions")
+    parser.add_argument("--students", type=int, default=40, help="senders per question")
+    parser.add_argument("--spread", type=float, default=3.0, help="seconds over which a class sends")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds to the first token")
+    parser.add_argument("--port", type=int, default=8120)
+    args = parser.parse_args(argv)
+    stub_url = f"http://127.0.0.1:{args.port}/v1"
+    limits = {"CHAT_PROVIDER": "stub", "CHAT_BASE_URL": stub_url, "CHAT_MAX_CONCURRENCY": "32"}
+    servers = {"stub": serve("benchmarks.stub_llm:app", args.port, {"STUB_LATENCY": str(args.latency)}),
+               "off": serve("Assistant:app", args.port + 1, {**limits, "CHAT_COALESCE": "0", "CHAT_CACHE_TTL": "0"}),
+               "on": serve("Assistant:app", args.port + 2, {**limits, "CHAT_CACHE_TTL": "10"})}
+    schedule = burst(args.classes, args.students, args.spread)
+    try:
+        for port in (args.port, args.port + 1, args.port + 2):
+            wait_ready(port)
+        print(f"{len(schedule)} requests: {args.classes} questions x {args.students} students within "
+              f"{args.spread:.0f}s, stub {args.latency * 1000:.0f} ms, 32 upstream slots")
+        print(f"{'coalescing':>10} {'upstream':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for name, port in (("off", args.port + 1), ("on", args.port + 2)):
+            before = upstream_calls(args.port)
+            row = asyncio.run(replay(f"http://127.0.0.1:{port}/api/assistant/ask", schedule))
+            calls = upstream_calls(args.port) - before
+            print(f"{name:>10} {calls:8d} {row['p50_ms']:8.1f} {row['p99_ms']:8.1f} {row['errors']:6d}", flush=True)
+    finally:
+        for server in servers.values():
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Compressed dialogue memory: recall@1 at Main.py's 0.1 threshold vs RAM bytes per vector and query latency,
+# for each CompressedIndex codec against the exact float32 VectorIndex
+# Run from the repo root: python -m benchmarks.bench_compressed [turns] [queries]
+
+import sys
+import tempfile
+import time
+import numpy as np
+from Memory import CompressedIndex, VectorIndex
+
+DIM = 300
+THRESHOLD = 0.1  # retrieve_similar_query's squared-L2 cutoff on unit vectors
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def corpus(n: int, queries: int, rng):
+    # Clustered unit vectors (topics), half the queries re-ask a stored turn with a little noise, half are new
+    centers = rng.standard_normal((max(1, n // 100), DIM))
+    stored = unit(centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, DIM)))
+    repeats = unit(stored[rng.integers(0, n, queries // 2)] + 0.012 * rng.standard_normal((queries // 2, DIM)))
+    fresh = unit(centers[rng.integers(0, len(centers), queries - len(repeats))]
+                 + 0.6 * rng.standard_normal((queries - len(repeats), DIM)))
+    return stored, np.vstack([repeats, fresh])
+
+
+def evaluate(index, queries, truth):
+    # recall@1: the exact hit under THRESHOLD is returned; false hits: something returned where exact has none
+    found, false_hits, latencies = 0, 0, []
+    for query, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        hits = index.search(query, k=1, threshold=THRESHOLD)
+        latencies.append(time.perf_counter() - t0)
+        got = hits[0][0] if hits else None
+        found += expected is not None and got == expected
+        false_hits += expected is None and got is not None
+    positives = sum(expected is not None for expected in truth)
+    return found / positives if positives else 1.0, false_hits, np.percentile(np.array(latencies) * 1000, [50, 99])
+
+
+def main(n: int, queries: int):
+    rng = np.random.default_rng(0)
+    stored, probes = corpus(n, queries, rng)
+    texts = [f"turn {i}" for i in range(n)]
+    exact = VectorIndex(DIM)
+    exact.add_many(texts, stored)
+    truth = [hits[0][0] if hits else None for hits in (exact.search(q, k=1, threshold=THRESHOLD) for q in probes)]
+    recall, false_hits, (p50, p99) = evaluate(exact, probes, truth)
+    with_hit = sum(t is not None for t in truth)
+    print(f"{n} turns x {DIM} dims, {queries} queries ({with_hit} with a hit under {THRESHOLD})")
+    print(f"{'codec':>18} {'bytes/vec':>9} {'recall@1':>8} {'false':>5} {'p50 ms':>7} {'p99 ms':>7} {'build s':>7}")
+    print(f"{'float32 (exact)':>18} {4 * DIM + 4:9d} {recall:8.3f} {false_hits:5d} {p50:7.3f} {p99:7.3f} {'-':>7}")
+    configs = [("fp16", None, True), ("sq", DIM, True), ("sq", 3 * DIM // 4, True), ("sq", DIM // 2, True),
+               ("sq", DIM // 2, False), ("ivfpq", 60, True), ("ivfpq", 30, True), ("ivfpq", 30, False)]
+    for codec, code_size, rerank in configs:
+        with tempfile.TemporaryDirectory() as path:
+            # Exact vectors on disk; build = append + training on the codec's default sample + encoding
+            index = CompressedIndex(DIM, codec, code_size, rerank=rerank, nlist=max(16, n // 1000), path=path)
+            start = time.perf_counter()
+            index.add_many(texts, stored)
+            build = time.perf_counter() - start
+            recall, false_hits, (p50, p99) = evaluate(index, probes, truth)
+            label = f"{codec}/{index.code_bytes(DIM)}B" + ("" if rerank else " no-rerank")
+            print(f"{label:>18} {index.code_bytes(DIM) + 8:9d} {recall:8.3f} {false_hits:5d} {p50:7.3f} {p99:7.3f} "
+                  f"{build:7.2f}", flush=True)
+            index.exact.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 1_000)
@@ -0,0 +1,75 @@
+# Context assembly for /api/assistant/ask: build time, prompt tokens per question, and how much of each prompt is
+# a byte-identical prefix of the same student's previous one (what provider-side prefix caching can skip), per
+# token budget, with the chosen turns in canonical order vs nearest-first
+# Run from the repo root: python -m benchmarks.bench_context [students] [questions_per_student]
+
+import sys
+import time
+import zlib
+import numpy as np
+from Context import ContextBuilder, Tokenizer
+from Memory import ShardedMemory, VectorIndex
+from benchmarks.corpus import synthetic_questions
+
+DIM = 300
+BUDGETS = (128, 256, 512, 1024)
+
+
+def hashed_embed(text: str) -> np.ndarray:
+    # Bag-of-words feature hashing instead of spaCy vectors: questions sharing words land close, no model needed
+    vector = np.zeros(DIM, dtype=np.float32)
+    for word in text.lower().replace("?", " ").replace(",", " ").split():
+        h = zlib.crc32(word.encode("utf-8"))
+        vector[h % DIM] += 1.0 if h & 1 << 31 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def answer_for(question: str) -> str:
+    # About the length of a short tutoring answer (~80 tokens)
+    return (f"Here is an explanation of: {question} Start from the definition, then look at how each part "
+            f"interacts with the others. A worked example usually helps: take the simplest case, write down "
+            f"every step, and check the result against what you expect. Finally, connect it to the topics you "
+            f"already know, because the exam often asks how ideas relate rather than for definitions alone.")
+
+
+def simulate(students: int, questions: int, budget: int, canonical: bool, tokenizer: Tokenizer):
+    # Each student asks in turn; every question is answered (stub text) and remembered, like Assistant.py
+    memory = ShardedMemory(lambda user_id: VectorIndex(capacity=16), max_turns_per_shard=500)
+    builder = ContextBuilder(memory, hashed_embed, k=4, budget=budget, threshold=None, tokenizer=tokenizer,
+                             canonical=canonical)
+    conversations = {f"student-{s}": synthetic_questions(questions, seed=s) for s in range(students)}
+    latencies = []
+    for i in range(questions):
+        for user_id, asked in conversations.items():
+            t0 = time.perf_counter()
+            builder.build(asked[i], user_id)
+            latencies.append(time.perf_counter() - t0)
+            builder.remember(asked[i], answer_for(asked[i]), user_id)
+    return builder.stats(), np.array(latencies) * 1e6
+
+
+def main(students: int, questions: int):
+    tokenizer = Tokenizer()
+    sample = answer_for(synthetic_questions(1)[0])
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        tokenizer.encode(sample)
+    encode_us = (time.perf_counter() - t0) * 1000
+    print(f"{students} students x {questions} questions, k=4, tokenizer {tokenizer.name} "
+          f"({tokenizer.count(sample)} tokens per answer, {encode_us:.1f} us to encode one)")
+    print(f"{'budget':>6} {'order':>9} {'turns':>5} {'prompt tok':>10} {'cached':>7} {'trimmed':>7} "
+          f"{'p50 us':>7} {'p99 us':>7}")
+    for budget in BUDGETS:
+        for canonical in (True, False):
+            stats, latencies = simulate(students, questions, budget, canonical, tokenizer)
+            builds = stats["builds"]
+            print(f"{budget:6d} {'canonical' if canonical else 'nearest':>9} {stats['turns'] / builds:5.2f} "
+                  f"{stats['prompt_tokens'] / builds:10.1f} {stats['cached_ratio']:7.1%} "
+                  f"{stats['trimmed_tokens'] / builds:7.1f} {np.percentile(latencies, 50):7.1f} "
+                  f"{np.percentile(latencies, 99):7.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 40)
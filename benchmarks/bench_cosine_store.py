@@ -0,0 +1,55 @@
+# CosineStore vs per-query NearestNeighbors refit (old App.py): throughput
+# (sklearn parity is checked in tests/test_memory.py)
+# Run from the repo root: python -m benchmarks.bench_cosine_store [n_stored] [n_queries]
+
+import sys
+import time
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from Memory import CosineStore
+
+DIM = 96  # en_core_web_sm doc.vector size
+
+
+def legacy_lookup(memory_embeddings, vec, k=1):
+    model = NearestNeighbors(n_neighbors=k, metric="cosine").fit(memory_embeddings)
+    return model.kneighbors(vec.reshape(1, -1))
+
+
+def main(n_stored: int, n_queries: int):
+    rng = np.random.default_rng(0)
+    stored = rng.standard_normal((n_stored, DIM)).astype(np.float32)
+    stored[::7] = 0.0  # spaCy returns zero vectors for out-of-vocabulary text
+    queries = np.concatenate([
+        stored[rng.integers(0, n_stored, n_queries // 2)] + 0.05 * rng.standard_normal((n_queries // 2, DIM)),
+        rng.standard_normal((n_queries - n_queries // 2, DIM)),
+    ]).astype(np.float32)
+
+    store = CosineStore(DIM)
+    store.add_many([str(i) for i in range(n_stored)], stored)
+
+    memory_embeddings = list(stored)
+    sample = queries[:min(20, n_queries)]
+    start = time.perf_counter()
+    for q in sample:
+        legacy_lookup(memory_embeddings, q)
+    legacy = len(sample) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for q in queries:
+        store.search(q, k=1, threshold=0.2)
+    single = n_queries / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    store.search_many(queries, k=1, threshold=0.2)
+    batched = n_queries / (time.perf_counter() - start)
+
+    print(f"{n_stored} stored vectors, queries/sec:")
+    print(f"  sklearn refit per query : {legacy:12.1f}")
+    print(f"  CosineStore.search      : {single:12.1f}")
+    print(f"  CosineStore.search_many : {batched:12.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 500)
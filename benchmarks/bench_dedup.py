@@ -0,0 +1,71 @@
+# MinHash LSH near-duplicate pre-filter: precision/recall and lookup latency on a duplicate-heavy question
+# stream, against the spaCy parse it saves retrieve_similar_query(ies) in App.py (run_pipeline skips the parse
+# only for exact repeats that are also in the response cache)
+# Run from the repo root: python -m benchmarks.bench_dedup [questions] [thresholds]
+#   e.g. python -m benchmarks.bench_dedup 5000 0.6,0.7,0.8,0.9
+
+import sys
+import time
+import numpy as np
+from Dedup import MinHashLSH
+from Embedding import normalize_text
+from benchmarks.corpus import duplicate_heavy_questions
+
+
+def run_stream(lsh: MinHashLSH, stream, originals):
+    # Ask every question in order (lookup, then remember it), like retrieve_similar_query + store_dialogue.
+    # A repeat is a positive; a hit is correct when the returned turn was asked about the same original.
+    origin = {}  # stored text -> normalized original it repeats
+    asked = set()
+    tp = fp = fn = 0
+    hit_times, miss_times = [], []
+    for text, source in stream:
+        truth = normalize_text(originals[source] if source is not None else text)
+        positive = source is not None or truth in asked
+        t0 = time.perf_counter()
+        hit = lsh.find(text)
+        (hit_times if hit else miss_times).append(time.perf_counter() - t0)
+        if hit and origin.get(hit[0]) == truth:
+            tp += 1
+        elif hit:
+            fp += 1
+        elif positive:
+            fn += 1
+        lsh.add(text)
+        origin.setdefault(text, truth)
+        asked.add(truth)
+    return tp, fp, fn, np.array(hit_times) * 1e6, np.array(miss_times) * 1e6
+
+
+def parse_cost(texts) -> str:
+    try:
+        from App import get_nlp
+        nlp = get_nlp()
+    except Exception as exc:
+        return f"unavailable ({exc!r})"
+    nlp(texts[0])
+    start = time.perf_counter()
+    for text in texts:
+        nlp(text)
+    return f"{(time.perf_counter() - start) / len(texts) * 1e6:.0f} us/question"
+
+
+def main(n: int, thresholds):
+    stream, originals = duplicate_heavy_questions(n)
+    repeats = sum(source is not None for _, source in stream)
+    print(f"{n} questions, {repeats} repeats of {len(originals)} originals")
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'hit us p50':>10} {'p99':>7} "
+          f"{'miss us p50':>11} {'p99':>7}")
+    for threshold in thresholds:
+        tp, fp, fn, hits, misses = run_stream(MinHashLSH(threshold=threshold), stream, originals)
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 1.0
+        print(f"{threshold:9.2f} {precision:9.3f} {recall:7.3f} "
+              f"{np.percentile(hits, 50):10.1f} {np.percentile(hits, 99):7.1f} "
+              f"{np.percentile(misses, 50):11.1f} {np.percentile(misses, 99):7.1f}")
+    print(f"spaCy parse (skipped on a hit): {parse_cost([text for text, _ in stream[:200]])}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         [float(t) for t in sys.argv[2].split(",")] if len(sys.argv) > 2 else [0.6, 0.7, 0.8, 0.9])
@@ -0,0 +1,58 @@
+# Concept-map render cost and soak test: RSS must stay flat across many renders in one process. Growth after the
+# warm-up (the first tenth of the renders, which also fills the memo cache) above max_growth_mb exits with status 1.
+# Run from the repo root: python -m benchmarks.bench_diagram [renders] [fmt] [max_growth_mb]
+
+import os
+import sys
+import time
+from Diagram import ConceptMapRenderer
+from benchmarks.corpus import TOPICS
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # not Linux: fall back to peak RSS
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def term_list(i: int):
+    # Unique per i, so every render misses the memo cache and really draws
+    return [TOPICS[(i + j) % len(TOPICS)] for j in range(5)] + [f"case {i}"]
+
+
+def main(renders: int, fmt: str, max_growth_mb: float = 20.0) -> int:
+    renderer = ConceptMapRenderer(cache_size=64)
+    renderer.render(term_list(-1), fmt)  # warm up fonts and the Agg renderer
+    baseline = None
+    checkpoints = max(1, renders // 10)
+    print(f"{'renders':>8} {'RSS MB':>8} {'ms/render':>10}")
+    start = time.perf_counter()
+    for i in range(renders):
+        renderer.render(term_list(i), fmt)
+        if (i + 1) % checkpoints == 0:
+            elapsed = time.perf_counter() - start
+            rss = rss_mb()
+            print(f"{i + 1:>8} {rss:8.1f} {elapsed / (i + 1) * 1000:10.2f}")
+            if baseline is None:
+                baseline = rss
+    growth = rss_mb() - baseline
+    start = time.perf_counter()
+    for _ in range(1000):
+        renderer.render(term_list(renders - 1), fmt)
+    cached_us = (time.perf_counter() - start) / 1000 * 1e6
+    print(f"RSS growth after warm-up: {growth:+.1f} MB over {renders - checkpoints} renders")
+    print(f"memoized render: {cached_us:.1f} us, {renderer.metrics()}")
+    if growth > max_growth_mb:
+        print(f"⚠️ RSS grew {growth:.1f} MB, more than {max_growth_mb:.1f} MB: renders leak")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+                  sys.argv[2] if len(sys.argv) > 2 else "png",
+                  float(sys.argv[3]) if len(sys.argv) > 3 else 20.0))
@@ -0,0 +1,53 @@
+# Memory-mapped dialogue store: append throughput, reopen time after a restart, query latency, resident memory
+# Run from the repo root: python -m benchmarks.bench_disk_store [turns] [dir]
+
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+from Memory import DiskDialogueStore
+from benchmarks.bench_diagram import rss_mb
+
+DIM = 300
+
+
+def main(turns: int, path: str):
+    rng = np.random.default_rng(0)
+    store = DiskDialogueStore(path, DIM, metric="l2")
+    start = time.perf_counter()
+    for begin in range(0, turns, 10_000):
+        n = min(10_000, turns - begin)
+        store.add_many([f"turn {begin + i}" for i in range(n)], rng.random((n, DIM), dtype=np.float32))
+    elapsed = time.perf_counter() - start
+    print(f"appended {turns:,} turns in {elapsed:.1f}s ({turns / elapsed:,.0f}/s), "
+          f"{store.disk_bytes / 2**20:,.0f} MB on disk")
+    store.close()
+
+    before = rss_mb()
+    start = time.perf_counter()
+    store = DiskDialogueStore(path, metric="l2")
+    print(f"reopen: {(time.perf_counter() - start) * 1000:.1f} ms, {len(store):,} turns, "
+          f"RSS {rss_mb() - before:+.1f} MB")
+    queries = rng.random((20, DIM), dtype=np.float32)
+    start = time.perf_counter()
+    store.search(queries[0])
+    print(f"first query (pages vectors in, builds norms): {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    for q in queries:
+        store.search(q)
+    print(f"steady query: {(time.perf_counter() - start) / len(queries) * 1000:.1f} ms, "
+          f"resident bookkeeping {store.nbytes / 2**20:.1f} MB")
+    store.close()
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    if len(sys.argv) > 2:
+        main(turns, sys.argv[2])
+    else:
+        tmp = tempfile.mkdtemp()
+        try:
+            main(turns, tmp)
+        finally:
+            shutil.rmtree(tmp)
@@ -0,0 +1,45 @@
+# Embedding throughput and cache hit rate for Main.py's memory agent
+# Run from the repo root: python -m benchmarks.bench_embedding [questions] [batch_size]
+
+import os
+import sys
+import tempfile
+import time
+from Embedding import Embedder
+from benchmarks.corpus import synthetic_questions
+
+
+def main(n: int, batch_size: int):
+    questions = synthetic_questions(n)  # templated, so many repeats and case/punctuation variants
+    model = Embedder().nlp  # load once and share it across the configurations below
+    embedder = Embedder(load=lambda: model, batch_size=batch_size, maxsize=0)
+
+    start = time.perf_counter()
+    for q in questions:
+        embedder.embed(q)
+    one_by_one = time.perf_counter() - start
+    start = time.perf_counter()
+    embedder.embed_many(questions)
+    batched = time.perf_counter() - start
+    print(f"no LRU: one at a time {n / one_by_one:,.0f} texts/s, one batch {n / batched:,.0f} texts/s")
+
+    cached = Embedder(load=lambda: model, batch_size=batch_size)
+    start = time.perf_counter()
+    for q in questions:
+        cached.embed(q)
+    elapsed = time.perf_counter() - start
+    print(f"LRU cache: {n / elapsed:,.0f} texts/s, {cached.stats()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.sqlite")
+        Embedder(load=lambda: model, cache_path=path).embed_many(questions)
+        restarted = Embedder(load=lambda: model, cache_path=path)  # fresh process: empty LRU, warm disk
+        start = time.perf_counter()
+        restarted.embed_many(questions)
+        elapsed = time.perf_counter() - start
+        print(f"disk cache after restart: {n / elapsed:,.0f} texts/s, {restarted.stats()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 256)
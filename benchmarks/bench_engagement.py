@@ -0,0 +1,44 @@
+# Engagement CPU time: emotion model on every frame vs the staged GatedDetector path
+# Run from the repo root: python -m benchmarks.bench_engagement [fer|deepface] [recording.mp4|frames.npz] [max_frames]
+# Without a recording, a synthetic "mostly static classroom" clip is generated.
+
+import sys
+import time
+import numpy as np
+from Engagement import DeepFaceDetector, FERDetector, GatedDetector, emotion_to_score
+from benchmarks.corpus import load_frames, synthetic_frames
+
+
+def run(detector, frames):
+    scores = []
+    start = time.process_time()
+    for frame in frames:
+        try:
+            scores.append(emotion_to_score(detector.dominant_emotion(frame)))
+        except Exception:
+            scores.append(0.5)
+    return time.process_time() - start, scores
+
+
+def main(model: str, path: str, max_frames: int):
+    frames = load_frames(path, max_frames) if path else synthetic_frames(max_frames)
+    detector = FERDetector() if model == "fer" else DeepFaceDetector()
+    detector.dominant_emotion(frames[0])  # warm up outside the timed region
+
+    full_cpu, full_scores = run(detector, frames)
+    gated = GatedDetector(detector)
+    gated_cpu, gated_scores = run(gated, frames)
+
+    agree = np.mean(np.array(full_scores) == np.array(gated_scores))
+    print(f"{model}: {len(frames)} frames from {path or 'synthetic clip'}")
+    print(f"  every frame : {full_cpu:8.2f} s CPU ({full_cpu / len(frames) * 1000:.1f} ms/frame)")
+    print(f"  gated       : {gated_cpu:8.2f} s CPU ({gated_cpu / len(frames) * 1000:.1f} ms/frame), "
+          f"{full_cpu / max(gated_cpu, 1e-9):.1f}x less")
+    print(f"  stages      : {gated.stats}")
+    print(f"  score agreement with the ungated path: {agree:.1%}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "fer",
+         sys.argv[2] if len(sys.argv) > 2 else "",
+         int(sys.argv[3]) if len(sys.argv) > 3 else 300)
@@ -0,0 +1,68 @@
+# App.py key phrases: rake_nltk's per-call Rake(), a Rake built once, and the process-wide RakeExtractor
+# (Keyphrase.py), per call and batched, after checking they give the same ranking on the keyphrase corpus.
+# Speedups are against the Rake built once, so they don't count the construction the old code repeated.
+# Run from the repo root: python -m benchmarks.bench_keyphrase [documents]
+
+import sys
+import time
+import numpy as np
+from Keyphrase import RakeExtractor, load_stopwords
+from benchmarks.corpus import ENGLISH_STOPWORDS, keyphrase_documents
+
+
+def legacy_factory():
+    # What extract_key_phrases did: a new Rake() per call, which re-reads NLTK's stopword list. Without nltk_data
+    # the same list is passed in, so the baseline skips that file read and the speedup is understated.
+    from rake_nltk import Rake
+    try:
+        load_stopwords()
+        return Rake, "Rake()"
+    except LookupError:
+        stopwords = set(ENGLISH_STOPWORDS)
+        return lambda: Rake(stopwords=stopwords), "Rake(stopwords=...) - no nltk_data"
+
+
+def legacy(factory, sentences):
+    rake = factory()
+    rake.extract_keywords_from_sentences(sentences)
+    return rake.get_ranked_phrases()
+
+
+def per_call(fn, documents):
+    latencies = []
+    for sentences in documents:
+        t0 = time.perf_counter()
+        fn(sentences)
+        latencies.append(time.perf_counter() - t0)
+    return np.array(latencies) * 1e6
+
+
+def main(n: int):
+    documents = keyphrase_documents(n)
+    factory, label = legacy_factory()
+    extractor = RakeExtractor(stopwords=None if label == "Rake()" else ENGLISH_STOPWORDS)
+    full = extractor.ranked_phrases_many(documents, topn=None)
+    expected = [legacy(factory, sentences) for sentences in documents]
+    top5 = sum(extractor.ranked_phrases(sentences) == ranked[:5] for sentences, ranked in zip(documents, expected))
+    print(f"{n} documents, {sum(map(len, documents))} sentences; parity with {label}: top 5 {top5}/{n}, "
+          f"full ranking {sum(a == b for a, b in zip(full, expected))}/{n}")
+    per_call(extractor.ranked_phrases, documents[:100])  # warm the vocabulary
+    rake = factory()  # reusable: extract_keywords_from_sentences resets the instance's state
+    rows = [(label + " per call", per_call(lambda s: legacy(factory, s)[:5], documents)),
+            ("Rake built once, per call", per_call(lambda s: legacy(lambda: rake, s)[:5], documents)),
+            ("RakeExtractor per call", per_call(extractor.ranked_phrases, documents))]
+    t0 = time.perf_counter()
+    extractor.ranked_phrases_many(documents)
+    batch_us = (time.perf_counter() - t0) * 1e6 / n
+    print(f"{'':>44} {'mean us':>8} {'p50 us':>8} {'p99 us':>8}")
+    for name, latencies in rows:
+        print(f"{name:>44} {latencies.mean():8.1f} {np.percentile(latencies, 50):8.1f} "
+              f"{np.percentile(latencies, 99):8.1f}")
+    print(f"{'RakeExtractor batch of ' + str(n):>44} {batch_us:8.1f}")
+    baseline = rows[1][1].mean()
+    print(f"vs a Rake built once: per call {baseline / rows[2][1].mean():.1f}x, batched {baseline / batch_us:.1f}x; "
+          f"constructing Rake per call costs {rows[0][1].mean() - baseline:.1f} us")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
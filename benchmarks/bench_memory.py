@@ -0,0 +1,70 @@
+# Memory lookup benchmark: rebuild-per-query (old Main.py) vs the long-lived VectorIndex in each mode. Flat
+# lookups grow linearly with the history; ivf and hnsw should stay roughly flat from 1k to 1M turns, at a recall@1
+# (against the exact scan) shown next to them. ivf scans exactly until it has train_size turns ("exact" below).
+# Run from the repo root: python -m benchmarks.bench_memory [sizes] [modes]
+#   e.g. python -m benchmarks.bench_memory 1000,10000,100000,1000000 flat,ivf,hnsw
+
+import sys
+import time
+import numpy as np
+from Memory import VectorIndex
+
+DIM = 300
+QUERIES = 50
+
+
+def legacy_lookup(memory, embedding):
+    import faiss
+    index = faiss.IndexFlatL2(len(embedding))
+    data = np.array([e for _, e in memory]).astype('float32')
+    index.add(data)
+    D, I = index.search(np.array([embedding]).astype('float32'), 1)
+    return memory[I[0][0]][0] if D[0][0] < 0.1 else None
+
+
+def time_lookups(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def build_index(mode: str, vectors: np.ndarray, chunk: int = 50_000) -> VectorIndex:
+    index = VectorIndex(DIM, mode=mode, nlist=256)
+    for start in range(0, len(vectors), chunk):
+        part = vectors[start:start + chunk]
+        index.add_many([f"turn {start + i}" for i in range(len(part))], part)
+    return index
+
+
+def main(sizes, modes, legacy_max: int = 100_000):
+    rng = np.random.default_rng(0)
+    print(f"{'turns':>10} {'mode':>8} {'index':>6} {'build s':>9} {'lookup ms':>10} {'recall@1':>9} {'legacy ms':>10}")
+    for n in sizes:
+        vectors = rng.random((n, DIM), dtype=np.float32)
+        # Rephrasings of earlier turns: a stored vector plus a little noise, so the nearest turn is well defined
+        queries = vectors[rng.integers(0, n, QUERIES)] + rng.normal(0, 0.01, (QUERIES, DIM)).astype(np.float32)
+        legacy = "-"
+        if n <= legacy_max:
+            memory = [(f"turn {i}", v) for i, v in enumerate(vectors)]
+            legacy = f"{time_lookups(lambda q: legacy_lookup(memory, q), queries[:5]):10.2f}"
+        exact = None
+        for mode in ["flat"] + [mode for mode in modes if mode != "flat"]:
+            start = time.perf_counter()
+            index = build_index(mode, vectors)
+            build = time.perf_counter() - start
+            lookup = time_lookups(lambda q: index.search(q, k=1, threshold=0.1), queries)
+            found = [index.search(q, k=1)[0][0] for q in queries]
+            exact = exact or found
+            if mode in modes:
+                recall = sum(a == b for a, b in zip(found, exact)) / len(queries)
+                kind = "exact" if index._index is None else "faiss"
+                print(f"{n:>10} {mode:>8} {kind:>6} {build:9.2f} {lookup:10.3f} {recall:9.2f} {legacy:>10}")
+            del index
+        del vectors
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1_000, 10_000, 100_000, 1_000_000]
+    modes = sys.argv[2].split(",") if len(sys.argv) > 2 else list(VectorIndex.MODES)
+    main(sizes, modes)
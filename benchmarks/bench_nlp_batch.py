@@ -0,0 +1,35 @@
+# nlp_agent looped one text at a time vs nlp_agent_batch over nlp.pipe
+# Run from the repo root: python -m benchmarks.bench_nlp_batch [App|Main] [n_texts] [batch_size] [n_process]
+
+import importlib
+import sys
+import time
+from benchmarks.corpus import synthetic_questions
+
+
+def main(module_name: str, n_texts: int, batch_size: int, n_process: int):
+    agent = importlib.import_module(module_name)
+    texts = synthetic_questions(n_texts)
+    agent.nlp("warm up")
+    if hasattr(agent, "doc_cache"):
+        agent.doc_cache = agent.DocCache(maxsize=0)  # measure parsing, not App.py's Doc LRU
+
+    start = time.perf_counter()
+    looped = [agent.nlp_agent(text) for text in texts]
+    looped_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = list(agent.nlp_agent_batch(texts, batch_size=batch_size, n_process=n_process))
+    batched_s = time.perf_counter() - start
+
+    assert batched == looped, "nlp_agent_batch must return the same dicts, in order, as nlp_agent"
+    print(f"{module_name}: {n_texts} texts, batch_size={batch_size}, n_process={n_process}")
+    print(f"  looped nlp_agent : {n_texts / looped_s:10.1f} texts/sec")
+    print(f"  nlp_agent_batch  : {n_texts / batched_s:10.1f} texts/sec ({looped_s / batched_s:.2f}x)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "App",
+         int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 64,
+         int(sys.argv[4]) if len(sys.argv) > 4 else 1)
@@ -0,0 +1,59 @@
+# Deadline report: p50/p95/p99 of the stage graph with slow, heavy-tailed fake agents against the budget
+# (tests/test_pipeline.py holds the p99 gate, with a margin for loaded machines)
+# Run from the repo root: python -m benchmarks.bench_pipeline [runs] [budget_ms]
+
+import random
+import sys
+import time
+from collections import Counter
+from Pipeline import Stage, run_stages
+
+
+def slow(median_s: float, tail_s: float, tail_p: float, output):
+    # Usually ~median_s, but with probability tail_p it stalls for tail_s (camera hiccup, `dot`, DeepFace)
+    def stage(**_):
+        time.sleep(tail_s if random.random() < tail_p else random.uniform(0.5, 1.5) * median_s)
+        return output
+    return stage
+
+
+def fake_stages(stage_budgets):
+    nlp = {"key_terms": ["photosynthesis", "light"], "triples": [], "topic_type": "process"}
+    return [
+        Stage("engagement", slow(0.002, 1.0, 0.05, 0.8), budget=stage_budgets["engagement"], fallback=0.5),
+        Stage("nlp", slow(0.030, 0.5, 0.02, nlp), budget=stage_budgets.get("nlp"), fallback=nlp),
+        Stage("diagram", slow(0.060, 2.0, 0.10, "concept.png"), ("nlp",),
+              budget=stage_budgets["diagram"], fallback=None),
+        Stage("memory", slow(0.005, 0.8, 0.05, "earlier question"), ("nlp",),
+              budget=stage_budgets["memory"], fallback=None),
+        Stage("adaptive", lambda engagement, **_: f"response @ {engagement}", ("engagement", "diagram", "memory"),
+              fallback=lambda engagement, **_: f"response @ {engagement}"),
+    ]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main(runs: int, budget_ms: float):
+    random.seed(0)
+    budget = budget_ms / 1000
+    stage_budgets = {"engagement": 0.02, "diagram": 0.1, "memory": 0.05}
+    latencies, degraded = [], Counter()
+    for _ in range(runs):
+        start = time.perf_counter()
+        run = run_stages(fake_stages(stage_budgets), budget=budget)
+        latencies.append(time.perf_counter() - start)
+        assert run.outputs["adaptive"].startswith("response"), "pipeline must always produce a response"
+        degraded.update(f"{stage} ({reason})" for stage, reason in run.degraded.items())
+    p50, p95, p99 = (percentile(latencies, q) * 1000 for q in (0.50, 0.95, 0.99))
+    print(f"{runs} runs, budget {budget_ms:.0f}ms: p50 {p50:.1f}ms  p95 {p95:.1f}ms  p99 {p99:.1f}ms  "
+          f"max {max(latencies) * 1000:.1f}ms")
+    print(f"degraded stages: {dict(degraded)}")
+    print(f"p99 {p99 - budget_ms:+.1f}ms against the budget")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 150)
@@ -0,0 +1,46 @@
+# Semantic response cache: lookup cost vs cache size, and hit rate on the repeat-heavy synthetic corpus
+# Run from the repo root: python -m benchmarks.bench_response_cache [lookups]
+
+import sys
+import time
+import numpy as np
+from Cache import ResponseCache
+from benchmarks.corpus import synthetic_questions
+
+DIM = 300
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def main(lookups: int):
+    rng = np.random.default_rng(0)
+    for size in (64, 256, 1024, 4096):
+        cache = ResponseCache(threshold=0.05, maxsize=size)
+        stored = unit(rng.standard_normal((size, DIM)).astype(np.float32))
+        for i, vec in enumerate(stored):
+            cache.put(vec, {"nlp": {}, "diagram": f"concept_{i}.png", "response": "cached"})
+        repeats = unit(stored[rng.integers(0, size, lookups)] + 0.005 * rng.standard_normal((lookups, DIM)))
+        start = time.perf_counter()
+        for vec in repeats:
+            cache.get(vec)
+        elapsed = time.perf_counter() - start
+        print(f"{size:>5} entries: {elapsed / lookups * 1e6:7.1f} us/lookup, hit rate {cache.stats()['hit_rate']:.2f}")
+
+    # Distinct questions in the corpus stand in for distinct embeddings: how often a class repeats itself
+    questions = [" ".join(q.casefold().strip("?").split()) for q in synthetic_questions(lookups)]
+    ids = {q: i for i, q in enumerate(dict.fromkeys(questions))}
+    vectors = unit(rng.standard_normal((len(ids), DIM)).astype(np.float32))
+    cache = ResponseCache(threshold=0.05, maxsize=1024)
+    for q in questions:
+        vec = vectors[ids[q]]
+        if cache.get(vec) is None:
+            cache.put(vec, {"nlp": {}, "diagram": "", "response": q})
+    stats = cache.stats()
+    print(f"synthetic corpus: {lookups} questions, {len(ids)} distinct, hit rate {stats['hit_rate']:.2f}, "
+          f"evictions {stats['evictions']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
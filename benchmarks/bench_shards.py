@@ -0,0 +1,48 @@
+# Per-user shards vs one global store: lookup cost should follow one user's history, not total traffic
+# Run from the repo root: python -m benchmarks.bench_shards [users] [turns_per_user]
+
+import sys
+import time
+import numpy as np
+from Memory import ShardedMemory, VectorIndex
+
+DIM = 300
+
+
+def main(users: int, turns: int):
+    rng = np.random.default_rng(0)
+    sharded = ShardedMemory(lambda user_id: VectorIndex(DIM, capacity=16), max_turns_per_shard=turns,
+                            max_total_bytes=2**40)
+    everyone = VectorIndex(DIM)
+    for u in range(users):
+        vectors = rng.random((turns, DIM), dtype=np.float32)
+        everyone.add_many([f"user {u} turn {t}" for t in range(turns)], vectors)
+        for t, vec in enumerate(vectors):
+            sharded.add(f"user {u}", f"turn {t}", vec)
+    queries = rng.random((200, DIM), dtype=np.float32)
+    start = time.perf_counter()
+    for q in queries:
+        everyone.search(q)
+    global_ms = (time.perf_counter() - start) / len(queries) * 1000
+    start = time.perf_counter()
+    for i, q in enumerate(queries):
+        sharded.search(f"user {i % users}", q)
+    shard_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"{users} users x {turns} turns: global store {global_ms:.3f} ms/lookup, own shard {shard_ms:.3f} ms/lookup")
+    usage = sharded.usage()
+    per_shard = np.array([row["bytes"] for row in usage.values()])
+    print(f"shards {len(usage)}, total {sharded.nbytes / 2**20:.1f} MB, "
+          f"per shard mean {per_shard.mean() / 1024:.0f} KB (global store {everyone.nbytes / 2**20:.1f} MB)")
+
+    capped = ShardedMemory(lambda user_id: VectorIndex(DIM, capacity=16), max_turns_per_shard=turns // 2,
+                           max_total_bytes=sharded.nbytes // 4)
+    for u in range(users):
+        for t in range(turns):
+            capped.add(f"user {u}", f"turn {t}", queries[t % len(queries)])
+    print(f"with caps ({turns // 2} turns/shard, {capped.max_total_bytes / 2**20:.1f} MB total): "
+          f"{len(capped)} shards resident, {capped.evictions} evicted, {capped.nbytes / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,56 @@
+# Cold-start benchmark: module import time and first-use cost per agent, each in a fresh interpreter
+# Run from the repo root: python -m benchmarks.bench_startup [App|Main ...]
+
+import subprocess
+import sys
+
+# What each agent loads the first time it runs
+COLD_START = {
+    "Main": {
+        "nlp_agent": "Main.get_nlp(); import textacy.extract",
+        "generate_diagram": "import graphviz",
+        "dialogue_memory": "Main.dialogue_memory.search('default', __import__('numpy').zeros(300))",
+        "monitor_engagement": "import cv2; from deepface import DeepFace",
+    },
+    "App": {
+        "nlp_agent": "App.get_nlp(); App.get_rake()",
+        "generate_diagram": "App.concept_map_renderer.render(['photosynthesis', 'light'])",
+        "dialogue_memory": "App.dialogue_memory.search('default', __import__('numpy').zeros(96))",
+        "monitor_engagement": "import cv2; from fer import FER; FER(mtcnn=True)",
+    },
+}
+
+
+def timed(module: str, snippet: str = "") -> str:
+    code = (
+        "import time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "t_import = time.perf_counter() - t\n"
+        "t = time.perf_counter()\n"
+        f"{snippet or 'pass'}\n"
+        "print(f'{t_import:.6f} {time.perf_counter() - t:.6f}')\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        return f"failed: {proc.stderr.strip().splitlines()[-1]}"
+    return proc.stdout.strip()
+
+
+def main(modules):
+    for module in modules:
+        result = timed(module)
+        if result.startswith("failed"):
+            print(f"{module}: import {result}")
+            continue
+        print(f"{module}: import {float(result.split()[0]) * 1000:8.1f} ms")
+        for agent, snippet in COLD_START[module].items():
+            result = timed(module, snippet)
+            if result.startswith("failed"):
+                print(f"  {agent:<20} {result}")
+            else:
+                print(f"  {agent:<20} cold start {float(result.split()[1]) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["Main", "App"])
@@ -0,0 +1,85 @@
+# Streaming vs whole-answer /api/assistant/ask against the local stub: time-to-first-token as the client sees
+# it, total latency, and the server-reported ttft_ms/total_ms from the final SSE event
+# Run from the repo root: python -m benchmarks.bench_streaming [--latency 0.2] [--token-delay 0.01] [--n 50]
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+import numpy as np
+from benchmarks.bench_assistant import serve, wait_ready
+from benchmarks.corpus import synthetic_questions
+
+
+async def ask(client, url: str, question: str, stream: bool) -> Dict:
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post(url, json={"query": question})
+        response.raise_for_status()
+        total = time.perf_counter() - start
+        return {"ttft": total, "total": total}
+    ttft, done = None, {}
+    async with client.stream("POST", url, json={"query": question, "stream": True}) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                if event == "done":
+                    done = json.loads(line[5:])
+                elif event is None and ttft is None:
+                    ttft = time.perf_counter() - start
+            elif not line:
+                event = None
+    return {"ttft": ttft, "total": time.perf_counter() - start, "server_ttft_ms": done.get("ttft_ms"),
+            "server_total_ms": done.get("total_ms")}
+
+
+async def run(url: str, questions: List[str], stream: bool, concurrency: int) -> List[Dict]:
+    import httpx
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        async def one(question):
+            async with semaphore:
+                return await ask(client, url, question, stream)
+        return await asyncio.gather(*(one(q) for q in questions))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_streaming")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds to the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub seconds between tokens")
+    parser.add_argument("--n", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8110)
+    args = parser.parse_args(argv)
+    stub = serve("benchmarks.stub_llm:app", args.port, {"STUB_LATENCY": str(args.latency), "STUB_JITTER": "0",
+                                                        "STUB_TOKEN_DELAY": str(args.token_delay)})
+    app = serve("Assistant:app", args.port + 1, {"CHAT_PROVIDER": "stub",
+                                                 "CHAT_BASE_URL": f"http://127.0.0.1:{args.port}/v1"})
+    questions = synthetic_questions(args.n)
+    url = f"http://127.0.0.1:{args.port + 1}/api/assistant/ask"
+    try:
+        wait_ready(args.port)
+        wait_ready(args.port + 1)
+        print(f"stub: {args.latency * 1000:.0f} ms to first token, {args.token_delay * 1000:.0f} ms per token; "
+              f"{args.n} questions, {args.concurrency} at a time")
+        print(f"{'mode':>8} {'ttft p50':>9} {'ttft p99':>9} {'total p50':>9} {'total p99':>9} {'server ttft':>11}")
+        for stream in (False, True):
+            rows = asyncio.run(run(url, questions, stream, args.concurrency))
+            ttft = np.array([r["ttft"] for r in rows]) * 1000
+            total = np.array([r["total"] for r in rows]) * 1000
+            server = [r["server_ttft_ms"] for r in rows if r.get("server_ttft_ms") is not None]
+            print(f"{'stream' if stream else 'whole':>8} {np.percentile(ttft, 50):9.1f} {np.percentile(ttft, 99):9.1f} "
+                  f"{np.percentile(total, 50):9.1f} {np.percentile(total, 99):9.1f} "
+                  f"{np.median(server) if server else float('nan'):11.1f}")
+    finally:
+        for server in (stub, app):
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Synthetic student-question corpus shared by the benchmarks (deterministic for a given seed)
+
+import random
+from typing import List
+import numpy as np
+
+TOPICS = [
+    "photosynthesis", "gravity", "the water cycle", "cell division", "supply and demand",
+    "the French Revolution", "binary search", "neural networks", "plate tectonics", "the immune system",
+    "electric circuits", "chemical bonding", "the Pythagorean theorem", "climate change", "DNA replication",
+    "compound interest", "the nitrogen cycle", "Newton's laws of motion", "object oriented programming",
+    "the Roman Empire", "black holes", "protein synthesis", "linear regression", "the carbon cycle",
+]
+TEMPLATES = [
+    "How does {} work?",
+    "What is {}?",
+    "Can you explain {} in simple terms?",
+    "Why is {} important for the exam?",
+    "How is {} related to {}?",
+    "What are the main steps of {}?",
+    "I don't understand {}, the teacher said it is the basis of {}.",
+    "Explain how {} affects {} with an example.",
+]
+
+
+def synthetic_questions(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        template = rng.choice(TEMPLATES)
+        topics = rng.sample(TOPICS, template.count("{}"))
+        questions.append(template.format(*topics))
+    return questions
+
+
+def near_duplicate(question: str, rng: random.Random) -> str:
+    # A copy-paste repeat: case, spacing and punctuation changes, sometimes a one-letter typo or a filler word
+    edits = rng.sample(["upper", "lower", "spaces", "punct", "typo", "filler"], rng.randint(1, 3))
+    if "typo" in edits:
+        i = rng.randrange(len(question))
+        question = question[:i] + question[i + 1:]
+    if "filler" in edits:
+        question = rng.choice(["Please, ", "Hi! ", "Quick question: "]) + question
+    if "upper" in edits:
+        question = question.upper()
+    if "lower" in edits:
+        question = question.lower()
+    if "spaces" in edits:
+        question = "  ".join(question.split()) + " "
+    if "punct" in edits:
+        question = question.rstrip("?.!") + rng.choice(["??", "", "!?", " ?"])
+    return question
+
+
+def duplicate_heavy_questions(n: int, seed: int = 0, repeat_rate: float = 0.7):
+    # (question, source index or None): repeat_rate of the stream re-asks an earlier question, literally
+    # or with near_duplicate() edits; the rest are fresh questions from synthetic_questions()
+    rng = random.Random(seed)
+    fresh = iter(synthetic_questions(n, seed + 1))
+    stream, originals = [], []
+    for _ in range(n):
+        if originals and rng.random() < repeat_rate:
+            source = rng.randrange(len(originals))
+            text = originals[source]
+            stream.append((text if rng.random() < 0.5 else near_duplicate(text, rng), source))
+        else:
+            originals.append(next(fresh))
+            stream.append((originals[-1], None))
+    return stream, originals
+
+
+# NLTK's english stopword list, so keyphrase benchmarks run without nltk_data
+ENGLISH_STOPWORDS = """i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself
+yourselves he him his himself she she's her hers herself it it's its itself they them their theirs themselves what
+which who whom this that that'll these those am is are was were be been being have has had having do does did doing a
+an the and but if or because as until while of at by for with about against between into through during before after
+above below to from up down in out on off over under again further then once here there when where why how all any
+both each few more most other some such no nor not only own same so than too very s t can will just don don't should
+should've now d ll m o re ve y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven
+haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't weren
+weren't won won't wouldn wouldn't""".split()
+
+EXTRA_SENTENCES = [
+    "Really?! The teacher said (DNA), replication matters.",
+    "Photosynthesis converts light energy into chemical energy; photosynthesis feeds plants.",
+    "Schrödinger's cat and İstanbul's bridges are examples, not definitions.",
+    "Big fast cheap reliable modern scalable distributed replicated storage systems fail gracefully.",
+    "In 1905 Einstein published 4 papers -- each changed physics.",
+    "",
+    "...",
+]
+
+
+def keyphrase_documents(n: int, seed: int = 0) -> List[List[str]]:
+    # Documents as sentence lists (what App.py hands RAKE from doc.sents): 1-6 questions, sometimes with an
+    # awkward sentence - punctuation runs, repeats, non-ASCII, long stopword-free runs, empty sentences
+    rng = random.Random(seed)
+    questions = synthetic_questions(4 * n, seed)
+    documents = []
+    for _ in range(n):
+        sentences = [rng.choice(questions) for _ in range(rng.randint(1, 6))]
+        if rng.random() < 0.3:
+            sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(EXTRA_SENTENCES))
+        documents.append(sentences)
+    return documents
+
+
+def synthetic_frames(n: int, seed: int = 0, size=(480, 640)) -> List[np.ndarray]:
+    # Stand-in for a webcam/lecture recording: long static stretches, a scene change every 30 frames, sensor noise
+    rng = np.random.default_rng(seed)
+    frames, scene = [], rng.integers(0, 255, (*size, 3), dtype=np.uint8)
+    for i in range(n):
+        if i % 30 == 0:
+            scene = rng.integers(0, 255, (*size, 3), dtype=np.uint8)
+        noise = rng.integers(-2, 3, scene.shape)
+        frames.append(np.clip(scene.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def load_frames(path: str, max_frames: int) -> List[np.ndarray]:
+    # Recorded frames: an .npz with a "frames" array, or any video file OpenCV can decode
+    if path.endswith(".npz"):
+        return list(np.load(path)["frames"][:max_frames])
+    import cv2
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
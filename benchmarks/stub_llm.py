@@ -0,0 +1,77 @@
+# Local stand-in for an OpenAI-compatible /v1/chat/completions server: no model, no network, a fixed answer
+# after a configurable delay, so the assistant endpoint can be load-tested offline. Like a real model it takes
+# `latency` to the first token and `token_delay` per further token; "stream": true sends them as SSE chunks.
+# Run from the repo root: python -m benchmarks.stub_llm [--port 8001] [--latency 0.2] [--token-delay 0.01]
+#   STUB_LATENCY / STUB_JITTER / STUB_TOKEN_DELAY (seconds) do the same under uvicorn benchmarks.stub_llm:app
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY = float(os.environ.get("STUB_LATENCY", 0.2))
+JITTER = float(os.environ.get("STUB_JITTER", 0.05))
+TOKEN_DELAY = float(os.environ.get("STUB_TOKEN_DELAY", 0.01))
+
+app = FastAPI()
+calls = {"completions": 0}
+
+
+def answer_for(messages) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    return f"Here is an explanation of: {prompt}. It is a process with several steps."
+
+
+def tokens_for(content: str):
+    words = content.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+async def stream_chunks(completion_id: str, model: str, content: str):
+    for token in tokens_for(content):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(TOKEN_DELAY)
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    calls["completions"] += 1
+    completion_id, model = f"stub-{calls['completions']}", body.get("model", "stub")
+    await asyncio.sleep(max(0.0, random.gauss(LATENCY, JITTER)))
+    content = answer_for(body.get("messages", []))
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(completion_id, model, content), media_type="text/event-stream")
+    await asyncio.sleep(TOKEN_DELAY * (len(tokens_for(content)) - 1))  # same total time as the stream
+    return {"id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": 0}}
+
+
+@app.get("/stats")
+def stats():
+    return calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stub_llm")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="mean seconds to the first token")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="standard deviation in seconds")
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY, help="seconds between streamed tokens")
+    args = parser.parse_args(argv)
+    os.environ["STUB_LATENCY"], os.environ["STUB_JITTER"] = str(args.latency), str(args.jitter)
+    os.environ["STUB_TOKEN_DELAY"] = str(args.token_delay)
+    import uvicorn
+    uvicorn.run("benchmarks.stub_llm:app", host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Reproducible benchmark suite: every agent of Main.py and App.py, memory-store scaling, diagram render cost
+# and the end-to-end pipeline, on the synthetic corpus and synthetic (or recorded) frames - no webcam, no network.
+# Run from the repo root: python -m benchmarks run --out results.json   (see benchmarks/__main__.py)
+
+import importlib
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional
+from Engagement import FakeFrameSource
+from benchmarks.corpus import TOPICS, load_frames, synthetic_frames, synthetic_questions
+
+SECTIONS = ("agents", "memory_scaling", "diagram", "pipeline")
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict:
+    values = np.sort(np.asarray(latencies)) * 1000
+    return {"n": len(values), "throughput_per_s": len(values) / elapsed if elapsed else 0.0,
+            "mean_ms": float(values.mean()), "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95)), "p99_ms": float(np.percentile(values, 99))}
+
+
+def measure(fn: Callable, inputs: Iterable, warmup: int = 3) -> Dict:
+    # Latency of fn(x) for each x; the first `warmup` inputs are run untimed (lazy model loads, caches)
+    inputs = list(inputs)
+    for x in inputs[:warmup]:
+        fn(x)
+    latencies = []
+    start = time.perf_counter()
+    for x in inputs[warmup:] or inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def guarded(fn: Callable, *args) -> Dict:
+    # A missing optional model (FER, DeepFace, textacy, `dot`) skips that row instead of the whole run
+    try:
+        return fn(*args)
+    except Exception as exc:
+        return {"error": repr(exc)}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+# ----------------------------- AGENTS -----------------------------
+def bench_agents(name: str, questions: List[str], frames) -> Dict:
+    module = importlib.import_module(name)
+    module.start_engagement_sampler(source=FakeFrameSource(frames))
+    nlp = [module.nlp_fallback(q) for q in questions]
+    rows = {"input_agent": guarded(measure, module.input_agent, questions),
+            "nlp_agent": guarded(measure, module.nlp_agent, questions),
+            "monitor_engagement": guarded(measure, lambda _: module.monitor_engagement(), questions),
+            "adaptive_teaching": guarded(measure, lambda s: module.adaptive_teaching("response", s),
+                                         np.linspace(0, 1, len(questions)))}
+    if name == "Main":
+        rng = np.random.default_rng(0)
+        vectors = rng.random((len(questions), 300), dtype=np.float32)
+        rows["generate_diagram"] = guarded(measure, lambda r: module.generate_diagram(r["key_terms"],
+                                                                                      r["topic_type"]).result(), nlp)
+        rows["embed_text"] = guarded(measure, module.embed_text, questions)
+        rows["store_dialogue"] = guarded(measure, lambda i: module.store_dialogue(questions[i], vectors[i]),
+                                         range(len(questions)))
+        rows["retrieve_similar_query"] = guarded(measure, module.retrieve_similar_query, vectors)
+    else:
+        rows["generate_diagram"] = guarded(measure, lambda r: module.generate_diagram(r["key_terms"]), nlp)
+        rows["store_dialogue"] = guarded(measure, module.store_dialogue, questions)
+        rows["retrieve_similar_query"] = guarded(measure, module.retrieve_similar_query, questions)
+    return {f"{name}.{agent}": row for agent, row in rows.items()}
+
+# ----------------------------- MEMORY SCALING -----------------------------
+def bench_memory_scaling(sizes: List[int], queries: int = 100, dim: int = 300) -> Dict:
+    from Memory import CompressedIndex, CosineStore, VectorIndex
+    rng = np.random.default_rng(0)
+    stores = {"VectorIndex/flat": lambda: VectorIndex(dim), "VectorIndex/hnsw": lambda: VectorIndex(dim, mode="hnsw"),
+              "CompressedIndex/sq": lambda: CompressedIndex(dim, "sq"), "CosineStore": lambda: CosineStore(dim)}
+    probes = rng.random((queries, dim), dtype=np.float32)
+    curves = {}
+    for label, factory in stores.items():
+        curve = {}
+        for n in sizes:
+            def lookup_at(n=n):
+                store = factory()
+                store.add_many([f"turn {i}" for i in range(n)], rng.random((n, dim), dtype=np.float32))
+                return measure(lambda q: store.search(q, k=1), probes)
+            curve[str(n)] = guarded(lookup_at)
+        curves[label] = curve
+    return curves
+
+# ----------------------------- DIAGRAM RENDER COST -----------------------------
+def bench_diagram(renders: int) -> Dict:
+    from Diagram import ConceptMapRenderer, DiagramService
+    term_lists = [[TOPICS[(i + j) % len(TOPICS)] for j in range(5)] + [f"case {i}"] for i in range(renders)]
+    renderer = ConceptMapRenderer(cache_size=renders)
+    service = DiagramService(out_dir=os.path.join(os.getcwd(), "bench_diagrams"))
+    results = {"ConceptMapRenderer/render": guarded(measure, renderer.render, term_lists),
+               "ConceptMapRenderer/memoized": guarded(measure, renderer.render, term_lists),
+               "DiagramService/render": guarded(measure, lambda t: service.render(t, "process"), term_lists),
+               "DiagramService/cached": guarded(measure, lambda t: service.render(t, "process"), term_lists)}
+    service.shutdown()
+    return results
+
+# ----------------------------- END-TO-END PIPELINE -----------------------------
+def bench_pipeline(name: str, questions: List[str], budget: Optional[float]) -> Dict:
+    module = importlib.import_module(name)
+    degraded = {}
+
+    def run(question):
+        result = module.run_pipeline(question, budget=budget)
+        for stage in result.degraded:
+            degraded[stage] = degraded.get(stage, 0) + 1
+
+    row = guarded(measure, run, questions)
+    row["degraded"] = degraded
+    cache = module.response_cache.stats()
+    row["response_cache"] = {"hits": cache["hits"], "misses": cache["misses"], "hit_rate": cache["hit_rate"]}
+    return row
+
+# ----------------------------- RUNNER -----------------------------
+def run_suite(n: int = 200, seed: int = 0, sections=SECTIONS, sizes=(1_000, 10_000, 100_000),
+              frames_path: Optional[str] = None, renders: int = 50, budget: Optional[float] = None) -> Dict:
+    questions = synthetic_questions(n, seed)
+    frames = load_frames(frames_path, 300) if frames_path else synthetic_frames(300, seed, size=(240, 320))
+    results = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": git_commit(),
+                        "python": sys.version.split()[0], "platform": platform.platform(),
+                        "numpy": np.__version__, "n": n, "seed": seed,
+                        "frames": frames_path or "synthetic", "budget": budget}}
+    repo = os.getcwd()
+    for name in ("Main", "App"):
+        importlib.import_module(name)  # resolve against the repo before leaving it
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)  # diagrams and other agent output stay out of the working tree
+        try:
+            if "agents" in sections:
+                results["agents"] = {**bench_agents("Main", questions, frames),
+                                     **bench_agents("App", questions, frames)}
+            if "memory_scaling" in sections:
+                results["memory_scaling"] = bench_memory_scaling(list(sizes))
+            if "diagram" in sections:
+                results["diagram"] = bench_diagram(renders)
+            if "pipeline" in sections:
+                results["pipeline"] = {name: bench_pipeline(name, questions, budget) for name in ("Main", "App")}
+        finally:
+            os.chdir(repo)
+            for name in ("Main", "App"):
+                sampler = getattr(sys.modules.get(name), "engagement_sampler", None)
+                if sampler is not None:
+                    sampler.stop()
+    return results
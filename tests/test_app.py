@@ -0,0 +1,196 @@
+import os
+import threading
+import types
+import pytest
+import App
+from App import DocCache
+from Cache import TextResponseCache
+from Dedup import dedup_factory
+from Keyphrase import RakeExtractor
+from Memory import CosineStore, ShardedMemory
+from benchmarks.corpus import ENGLISH_STOPWORDS
+from test_context import hashed_embed
+
+
+class FakeToken:
+    def __init__(self, text: str, dep: str):
+        self.text = text
+        self.dep_ = dep
+        self.lefts = []
+        self.rights = []
+
+
+class FakeSpan:
+    # A three-word sentence parses as subject-verb-object; in any other the first word is a ROOT without
+    # dependents
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = [FakeToken(word, "dep") for word in text.split()]
+        if len(self.tokens) == 3:
+            subject, verb, obj = self.tokens
+            subject.dep_, verb.dep_, obj.dep_ = "nsubj", "ROOT", "dobj"
+            verb.lefts, verb.rights = [subject], [obj]
+        elif self.tokens:
+            self.tokens[0].dep_ = "ROOT"
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+
+class FakeDoc:
+    def __init__(self, text: str):
+        self.text = text
+        self.sents = [FakeSpan(part.strip() + ".") for part in text.split(".") if part.strip()]
+        self.vector = hashed_embed(text)
+
+
+class FakeNLP:
+    # Stands in for a spaCy Language: counts parses, one Doc per call and per piped text
+    meta = {"name": "core_fake_sm", "version": "0.0.0"}
+
+    def __init__(self):
+        self.parsed = []
+        self.piped = []
+
+    def __call__(self, text: str) -> FakeDoc:
+        self.parsed.append(text)
+        return FakeDoc(text)
+
+    def pipe(self, texts, as_tuples: bool = False, batch_size: int = 1000, n_process: int = 1):
+        for item in texts:
+            text, context = item if as_tuples else (item, None)
+            self.piped.append(text)
+            yield (FakeDoc(text), context) if as_tuples else FakeDoc(text)
+
+
+@pytest.fixture
+def nlp(monkeypatch):
+    fake = FakeNLP()
+    monkeypatch.setattr(App, "get_nlp", lambda: fake)
+    monkeypatch.setattr(App, "get_rake", lambda: RakeExtractor(stopwords=ENGLISH_STOPWORDS))
+    monkeypatch.setattr(App, "doc_cache", DocCache())
+    return fake
+
+
+def test_doc_cache_parses_each_distinct_text_once(nlp):
+    cache = DocCache()
+    questions = ["What is a stack?", "What is a queue?", "  What is a   stack? ", "What is a stack?"]
+    docs = [cache.parse(text) for text in questions]
+    assert nlp.parsed == ["What is a stack?", "What is a queue?"]
+    assert docs[0] is docs[2] is docs[3] and docs[1] is not docs[0]
+    assert cache.stats() == {"hits": 2, "misses": 2, "size": 2, "hit_rate": 0.5}
+
+
+def test_doc_cache_evicts_the_least_recently_used(nlp):
+    cache = DocCache(maxsize=2)
+    for text in ("first", "second", "first", "third"):  # "second" is the oldest when "third" arrives
+        cache.parse(text)
+    assert cache.stats()["size"] == 2
+    cache.parse("first")
+    cache.parse("second")
+    assert nlp.parsed == ["first", "second", "third", "second"]
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_empty_doc_cache_stats():
+    assert DocCache().stats() == {"hits": 0, "misses": 0, "size": 0, "hit_rate": 0.0}
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 64])
+def test_nlp_agent_batch_matches_one_call_per_text(nlp, batch_size):
+    texts = ["Plants make sugar. How does photosynthesis convert light energy?", "Cells divide.",
+             "What is the derivative of x squared?", "Enzymes speed reactions. Heat denatures them.",
+             "How do vaccines train the immune system?"]
+    expected = [App.nlp_agent(text) for text in texts]
+    assert any(result["triples"] for result in expected) and all(result["key_terms"] for result in expected)
+    batched = App.nlp_agent_batch(iter(texts), batch_size=batch_size)
+    assert not nlp.piped  # lazy until consumed
+    assert list(batched) == expected
+    assert nlp.piped == texts
+
+
+def test_nlp_agent_batch_of_nothing(nlp):
+    assert list(App.nlp_agent_batch([])) == []
+    assert nlp.parsed == [] and nlp.piped == []
+
+
+@pytest.fixture
+def stages(nlp, monkeypatch, tmp_path):
+    # run_pipeline's agents swapped for fakes that log their calls; `release` unblocks stalled ones at teardown
+    fakes = types.SimpleNamespace(calls=[], engagement=0.9, release=threading.Event(), stall=set(), fail=set())
+
+    def agent(name, fn):
+        def call(*args, **kwargs):
+            fakes.calls.append((name, args))
+            if name in fakes.stall:
+                fakes.release.wait(10.0)
+            if name in fakes.fail:
+                raise RuntimeError(f"{name} failed")
+            return fn(*args, **kwargs)
+        return call
+
+    def draw(key_terms):
+        path = str(tmp_path / f"{'-'.join(key_terms) or 'empty'}.png")
+        with open(path, "w") as f:
+            f.write("png")
+        return path
+
+    monkeypatch.setattr(App, "monitor_engagement", agent("engagement", lambda: fakes.engagement))
+    monkeypatch.setattr(App, "generate_diagram", agent("diagram", draw))
+    monkeypatch.setattr(App.doc_cache, "parse", agent("parse", App.doc_cache.parse))
+    monkeypatch.setattr(App, "concept_map_renderer", types.SimpleNamespace(cached_file=lambda *_, **__: None))
+    monkeypatch.setattr(App, "dialogue_memory", ShardedMemory(dedup_factory(lambda user_id: CosineStore(capacity=16))))
+    monkeypatch.setattr(App, "response_cache", TextResponseCache(maxsize=16, version=App.model_version))
+    yield fakes
+    fakes.release.set()
+
+
+def called(fakes, name):
+    return [args for stage, args in fakes.calls if stage == name]
+
+
+def test_pipeline_wires_each_stage_to_its_dependencies(stages, nlp):
+    question = "Plants make sugar. How does photosynthesis work?"
+    run = App.run_pipeline(question, user_id="alice")
+    assert run.degraded == {}
+    assert run.outputs["lookup"] is None and run.outputs["memory"] is None
+    assert run.outputs["parse"].text == question
+    assert run.outputs["nlp"] == App.nlp_agent(question, run.outputs["parse"])
+    assert called(stages, "diagram") == [(run.outputs["nlp"]["key_terms"],)]
+    assert os.path.exists(run.outputs["diagram"])
+    assert run.outputs["adaptive"] == App.adaptive_teaching(App.BASE_RESPONSE, 0.9)
+    assert nlp.parsed == [question]
+    assert App.dialogue_memory.apply("alice", lambda store: store.texts) == [question]
+
+    # The exact repeat is answered from the cache entry: no parse, no NLP agent, no render
+    stages.engagement = 0.1
+    again = App.run_pipeline(question, user_id="alice")
+    assert again.degraded == {} and "parse" not in again.outputs
+    assert again.outputs["lookup"]["nlp"] == again.outputs["nlp"] == run.outputs["nlp"]
+    assert again.outputs["diagram"] == run.outputs["diagram"]
+    assert again.outputs["memory"] == question
+    assert again.outputs["adaptive"] == App.adaptive_teaching(App.BASE_RESPONSE, 0.1)
+    assert len(called(stages, "parse")) == 1 and len(called(stages, "diagram")) == 1 and nlp.parsed == [question]
+
+    # Someone else asking it has no memory of it, but still gets the cached answer
+    other = App.run_pipeline(question, user_id="bob")
+    assert other.outputs["memory"] is None and other.outputs["nlp"] == run.outputs["nlp"]
+    assert len(called(stages, "diagram")) == 1
+
+
+def test_pipeline_falls_back_when_stages_fail_or_stall(stages, nlp):
+    stages.fail = {"engagement", "parse"}
+    stages.stall = {"diagram"}
+    question = "How does photosynthesis work?"
+    run = App.run_pipeline(question, stage_budgets={"engagement": 1.0, "diagram": 0.05}, user_id="alice")
+    assert run.degraded["diagram"] == "timeout"
+    assert run.degraded["engagement"].startswith("error: RuntimeError")
+    assert run.degraded["parse"].startswith("error: RuntimeError")
+    assert set(run.degraded) == {"engagement", "parse", "diagram"}
+    assert run.outputs["engagement"] == App.DEFAULT_ENGAGEMENT
+    assert run.outputs["parse"] is None and run.outputs["memory"] is None
+    assert run.outputs["nlp"] == App.nlp_fallback(question)
+    assert run.outputs["diagram"] is None  # nothing rendered for these key terms yet
+    assert run.outputs["adaptive"] == App.BASE_RESPONSE
+    assert len(App.response_cache) == 0  # fallbacks are never cached
+    assert App.dialogue_memory.shard("alice", create=False) is None
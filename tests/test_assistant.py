@@ -0,0 +1,106 @@
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+import Assistant
+from Chat import ChatBackend, ChatBusy, OpenAIProvider
+from Context import ContextBuilder, Tokenizer
+from Memory import ShardedMemory, VectorIndex
+from test_chat import fake_llm
+from test_context import hashed_embed
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    # The app on a fake OpenAI-compatible server, with a context builder that needs no spaCy model
+    def serve(transport, **options):
+        backend = ChatBackend(OpenAIProvider("http://llm.test/v1", model="fake", api_key=""),
+                              transport=transport, **options)
+        builder = ContextBuilder(ShardedMemory(lambda user_id: VectorIndex(capacity=16)), hashed_embed,
+                                 threshold=None, tokenizer=Tokenizer(None))
+        monkeypatch.setattr(Assistant, "chat_backend", backend)
+        monkeypatch.setattr(Assistant, "context_builder", builder)
+        return TestClient(Assistant.app)
+    return serve
+
+
+def events(body: str):
+    # (event, data) per SSE message; messages are separated by a blank line
+    parsed = []
+    for message in body.split("\n\n"):
+        if not message:
+            continue
+        fields = dict(line.split(": ", 1) for line in message.split("\n"))
+        parsed.append((fields.get("event"), json.loads(fields["data"])))
+    return parsed
+
+
+def test_ask_returns_the_whole_answer(serve):
+    with serve(fake_llm()) as client:
+        response = client.post("/api/assistant/ask", json={"query": "What is a stack?", "user_id": "alice"})
+    assert response.status_code == 200 and response.json() == {"answer": "Hello there"}
+    assert len(Assistant.context_builder.memory.shard("alice")) == 1
+
+
+def test_questions_without_a_user_id_are_counted_as_anonymous(serve, monkeypatch):
+    monkeypatch.setattr(Assistant, "questions", {"grounded": 0, "anonymous": 0})
+    with serve(fake_llm()) as client:
+        client.post("/api/assistant/ask", json={"query": "What is a stack?"})
+        client.post("/api/assistant/ask", json={"query": "What is a queue?", "user_id": "alice"})
+        stats = client.get("/api/assistant/stats").json()
+    assert stats["questions"] == {"grounded": 1, "anonymous": 1}
+
+
+def test_ask_streams_sse_tokens_then_timings(serve):
+    with serve(fake_llm(("A", " stack", " is"), delay=0.02)) as client:
+        response = client.post("/api/assistant/ask", json={"query": "What is a stack?", "stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.endswith("\n\n")
+    parsed = events(response.text)
+    assert parsed[:3] == [(None, {"token": "A"}), (None, {"token": " stack"}), (None, {"token": " is"})]
+    event, timings = parsed[3]
+    assert event == "done" and len(parsed) == 4
+    assert 20 <= timings["ttft_ms"] <= timings["total_ms"]
+    assert timings["total_ms"] >= 60
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_upstream_failures_map_to_status_codes(serve, stream):
+    def timeout(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    for transport, status in ((fake_llm(status=500), 502), (httpx.MockTransport(timeout), 504)):
+        with serve(transport) as client:
+            response = client.post("/api/assistant/ask", json={"query": "What is a stack?", "stream": stream})
+        assert response.status_code == status
+
+
+def test_busy_is_503_with_retry_after():
+    exc = Assistant.http_error(ChatBusy("full"))
+    assert exc.status_code == 503 and exc.headers == {"Retry-After": "1"}
+
+
+def test_failure_after_the_first_token_is_an_error_event(serve):
+    with serve(fake_llm(("A", " stack", " is"), fail_after=2)) as client:
+        response = client.post("/api/assistant/ask",
+                               json={"query": "What is a stack?", "stream": True, "user_id": "alice"})
+    assert response.status_code == 200
+    parsed = events(response.text)
+    assert parsed[:2] == [(None, {"token": "A"}), (None, {"token": " stack"})]
+    assert parsed[2][0] == "error" and len(parsed) == 3
+    assert Assistant.context_builder.memory.shard("alice", create=False) is None  # nothing remembered
+
+
+def test_empty_answers_are_not_remembered_or_cached(serve):
+    calls = []
+    with serve(fake_llm(()), calls=None) if False else serve(fake_llm((), calls=calls)) as client:
+        for stream in (True, True, False, False):  # repeats within the cache TTL go upstream again
+            response = client.post("/api/assistant/ask",
+                                   json={"query": "What is a stack?", "stream": stream, "user_id": "alice"})
+            if stream:
+                assert [event for event, _ in events(response.text)] == ["done"]
+            else:
+                assert response.json() == {"answer": ""}
+    assert len(calls) == 4
+    assert Assistant.context_builder.memory.shard("alice", create=False) is None
@@ -0,0 +1,39 @@
+import pytest
+from benchmarks.__main__ import compare, main
+
+
+def row(p50_ms: float, throughput: float = 100.0):
+    return {"p50_ms": p50_ms, "throughput_per_s": throughput}
+
+
+def test_compare_flags_slowdowns_beyond_the_threshold():
+    baseline = {"agents": {"App": {"nlp_agent": row(10.0), "input_agent": row(0.01)}}}
+    current = {"agents": {"App": {"nlp_agent": row(11.0, 80.0), "input_agent": row(0.02)}}}
+    _, regressions = compare(baseline, current, threshold=0.15)
+    assert regressions == ["agents/App/nlp_agent/throughput_per_s"]  # +10% p50 is fine, input is timer noise
+    _, regressions = compare(baseline, current, threshold=0.05)
+    assert regressions == ["agents/App/nlp_agent/p50_ms", "agents/App/nlp_agent/throughput_per_s"]
+
+
+def test_errored_or_missing_benchmarks_are_regressions():
+    baseline = {"agents": {"App": {"nlp_agent": row(10.0), "diagram": row(5.0)}}, "meta": {"seed": 0}}
+    current = {"agents": {"App": {"nlp_agent": {"error": "RuntimeError('boom')"}}}, "meta": {"seed": 0}}
+    lines, regressions = compare(baseline, current, threshold=0.15)
+    assert sorted(regressions) == ["agents/App/diagram/p50_ms", "agents/App/diagram/throughput_per_s",
+                                   "agents/App/nlp_agent/p50_ms", "agents/App/nlp_agent/throughput_per_s"]
+    assert any("RuntimeError('boom')" in line for line in lines)
+
+
+def test_compare_exits_non_zero_when_a_benchmark_raises(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline.write_text('{"pipeline": {"App": {"p50_ms": 50.0}}}')
+    current.write_text('{"pipeline": {"App": {"error": "ValueError()"}}}')
+    assert main(["compare", str(baseline), str(current)]) == 1
+    assert main(["compare", str(baseline), str(baseline)]) == 0
+
+
+def test_concept_map_soak_stays_flat(capsys):
+    pytest.importorskip("matplotlib")
+    from benchmarks import bench_diagram
+    assert bench_diagram.main(200, "png", max_growth_mb=20.0) == 0
+    assert "RSS growth after warm-up" in capsys.readouterr().out
@@ -0,0 +1,164 @@
+import asyncio
+import numpy as np
+import pytest
+import Cache
+from Cache import BaseResponseCache, ResponseCache, SingleFlight, TextResponseCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(Cache, "time", clock)
+    return clock
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_response_cache_cosine_threshold():
+    cache = ResponseCache(threshold=0.05, metric="cosine")
+    cache.put(unit(1, 0, 0), {"answer": "x"})
+    assert cache.get(unit(1, 0.1, 0)) == {"answer": "x"}  # cosine distance ~0.005
+    assert cache.get(unit(1, 0.5, 0)) is None  # ~0.106
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_response_cache_ttl_expiry(clock):
+    cache = ResponseCache(threshold=0.05, ttl=10.0)
+    cache.put(unit(1, 0), {"answer": "x"})
+    clock.now = 9.0
+    assert cache.get(unit(1, 0)) == {"answer": "x"}
+    clock.now = 11.0
+    assert cache.get(unit(1, 0)) is None
+    assert len(cache) == 0
+
+
+def test_response_cache_version_invalidation():
+    version = ["model-1"]
+    cache = ResponseCache(threshold=0.05, version=lambda: version[0])
+    cache.put(unit(1, 0), {"answer": "x"})
+    version[0] = "model-2"
+    assert cache.get(unit(1, 0)) is None
+    assert len(cache) == 0 and cache.invalidations == 1
+
+
+def test_response_cache_evicts_least_recently_used_slot():
+    cache = ResponseCache(threshold=0.01, maxsize=2)
+    cache.put(unit(1, 0, 0), {"answer": "a"})
+    cache.put(unit(0, 1, 0), {"answer": "b"})
+    assert cache.get(unit(1, 0, 0)) == {"answer": "a"}  # b is now the oldest
+    cache.put(unit(0, 0, 1), {"answer": "c"})
+    assert cache.evictions == 1
+    assert cache.get(unit(0, 1, 0)) is None
+    assert cache.get(unit(1, 0, 0)) == {"answer": "a"} and cache.get(unit(0, 0, 1)) == {"answer": "c"}
+
+
+def test_text_response_cache_matches_normalized_text_only(clock):
+    version = ["model-1"]
+    cache = TextResponseCache(maxsize=2, ttl=10.0, version=lambda: version[0])
+    cache.put("What is a stack?", {"answer": "stack"})
+    assert cache.get("what is a  STACK") == {"answer": "stack"}
+    assert cache.get("What is a queue?") is None
+    cache.put("What is a queue?", {"answer": "queue"})
+    cache.put("What is a heap?", {"answer": "heap"})
+    assert cache.evictions == 1 and cache.get("What is a stack?") is None
+    clock.now = 11.0
+    assert cache.get("What is a heap?") is None
+    cache.put("What is a heap?", {"answer": "heap"})
+    version[0] = "model-2"
+    assert cache.get("What is a heap?") is None and cache.invalidations == 1
+
+
+def test_response_caches_must_define_their_keys():
+    class Lookups(BaseResponseCache):  # _find without _slot
+        def _find(self, question):
+            return None
+
+    for incomplete in (BaseResponseCache, Lookups):
+        with pytest.raises(TypeError, match="_slot"):
+            incomplete()
+
+
+def test_ttl_cache_expiry_and_lru_eviction(clock):
+    cache = TTLCache(ttl=10.0, maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # b is now the oldest
+    cache.put("c", 3)
+    assert cache.evictions == 1 and cache.get("b") is None
+    clock.now = 10.5
+    cache.put("c", 4)  # a refreshed entry gets a new expiry
+    clock.now = 11.0
+    assert cache.get("a") is None and cache.get("c") == 4
+    assert cache.expirations == 1 and len(cache) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_ttl_cache_disabled_by_zero_ttl():
+    cache = TTLCache(ttl=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_singleflight_collapses_concurrent_calls():
+    flight, calls = SingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["answer"] * 10
+    assert len(calls) == 1 and (flight.leaders, flight.followers) == (1, 9) and len(flight) == 0
+
+
+def test_singleflight_cancelled_follower_leaves_the_call_running():
+    flight, calls = SingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(run()) == "answer" and len(calls) == 1
+
+
+def test_singleflight_errors_reach_every_waiter_and_are_not_cached():
+    flight, calls = SingleFlight(), []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):  # the next call starts afresh instead of replaying the failure
+            await flight.do("key", fail)
+
+    asyncio.run(run())
+    assert len(calls) == 2 and len(flight) == 0
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import httpx
+import pytest
+from Chat import ChatBackend, ChatBusy, ChatError, ChatProvider, ChatTimeout, OpenAIProvider
+
+
+class FakeStream(httpx.AsyncByteStream):
+    # An SSE body from an OpenAI-compatible server: one chunk per token, `delay` seconds apart, then [DONE].
+    # fail_after=n raises a read error after n tokens instead of finishing.
+    def __init__(self, tokens, delay: float = 0.0, fail_after=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.fail_after = fail_after
+
+    async def __aiter__(self):
+        yield b": keep-alive\n\n"
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise httpx.ReadError("connection reset")
+            await asyncio.sleep(self.delay)
+            yield f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+
+def fake_llm(tokens=("Hello", " there"), delay: float = 0.0, fail_after=None, status: int = 200, calls=None):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if calls is not None:
+            calls.append(body)
+        if status != 200:
+            return httpx.Response(status, json={"error": "upstream"})
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  stream=FakeStream(tokens, delay, fail_after))
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "".join(tokens)}}]})
+    return httpx.MockTransport(handler)
+
+
+def make_backend(transport, **options) -> ChatBackend:
+    return ChatBackend(OpenAIProvider("http://llm.test/v1", model="fake", api_key=""), transport=transport,
+                       **options)
+
+
+async def collect(backend: ChatBackend, prompt: str = "What is a stack?"):
+    try:
+        return [token async for token in backend.stream(prompt)]
+    finally:
+        await backend.aclose()
+
+
+def test_chat_parses_the_answer():
+    calls = []
+    backend = make_backend(fake_llm(calls=calls))
+    assert asyncio.run(backend.chat("What is a stack?", "context")) == "Hello there"
+    assert calls[0]["messages"] == [{"role": "system", "content": "context"},
+                                    {"role": "user", "content": "What is a stack?"}]
+    assert "stream" not in calls[0]
+
+
+def test_stream_yields_tokens_and_records_ttft():
+    calls = []
+    backend = make_backend(fake_llm(("A", " stack", " is"), calls=calls))
+    assert asyncio.run(collect(backend)) == ["A", " stack", " is"]
+    assert calls[0]["stream"] is True
+    assert backend.ttft.count == 1 and backend.latency.count == 1 and backend.in_flight == 0
+    # the finished answer is cached and comes back as one chunk without another upstream call
+    assert asyncio.run(collect(backend)) == ["A stack is"] and len(calls) == 1
+
+
+def test_stream_failure_after_the_first_token_is_a_chat_error():
+    backend = make_backend(fake_llm(("A", " stack", " is"), fail_after=1))
+
+    async def run():
+        tokens = []
+        with pytest.raises(ChatError):
+            async for token in backend.stream("What is a stack?"):
+                tokens.append(token)
+        await backend.aclose()
+        return tokens
+
+    assert asyncio.run(run()) == ["A"]
+    assert backend.errors == 1 and backend.in_flight == 0
+    assert len(backend.cache) == 0  # a partial answer is never cached
+
+
+def test_http_errors_and_timeouts_are_mapped():
+    with pytest.raises(ChatError):
+        asyncio.run(collect(make_backend(fake_llm(status=500))))
+
+    def timeout(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    backend = make_backend(httpx.MockTransport(timeout))
+    with pytest.raises(ChatTimeout):
+        asyncio.run(backend.chat("What is a stack?"))
+    assert backend.timeouts == 1
+
+
+def test_busy_when_no_slot_frees_up_in_time():
+    backend = make_backend(fake_llm(delay=0.5), max_concurrency=1, queue_timeout=0.05, coalesce=False,
+                           cache_ttl=0)
+
+    async def run():
+        try:
+            return await asyncio.gather(backend.chat("first"), backend.chat("second"), return_exceptions=True)
+        finally:
+            await backend.aclose()
+
+    results = asyncio.run(run())
+    assert results[0] == "Hello there" and isinstance(results[1], ChatBusy)
+    assert backend.busy == 1
+
+
+@pytest.mark.parametrize("line, token", [
+    ('data: {"choices": [{"delta": {"content": "Hi"}}]}', "Hi"),
+    ('data: {"choices": [{"delta": {"role": "assistant"}}]}', None),
+    ("data: [DONE]", None),
+    (": keep-alive", None),
+    ("", None),
+])
+def test_parse_line(line, token):
+    assert OpenAIProvider("http://llm.test/v1").parse_line(line) == token
+
+
+def test_parse_line_rejects_malformed_chunks():
+    with pytest.raises(ChatError):
+        OpenAIProvider("http://llm.test/v1").parse_line("data: {not json")
+
+
+def test_providers_must_define_the_wire_format():
+    class Partial(ChatProvider):  # no streaming pair
+        def request(self, messages, **params):
+            return "/complete", {"messages": messages}, {}
+
+        def parse(self, data):
+            return data["text"]
+
+    for incomplete in (ChatProvider, Partial):
+        with pytest.raises(TypeError, match="parse_line"):
+            incomplete()
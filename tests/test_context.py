@@ -0,0 +1,67 @@
+import threading
+import zlib
+import numpy as np
+from Chat import request_key
+from Context import ContextBuilder, Tokenizer, format_turn, same_question
+from Memory import ShardedMemory, VectorIndex
+
+
+def hashed_embed(text: str) -> np.ndarray:
+    # Bag-of-words feature hashing, as in benchmarks/bench_context.py: no spaCy model needed
+    vector = np.zeros(64, dtype=np.float32)
+    for word in text.lower().replace("?", " ").split():
+        h = zlib.crc32(word.encode("utf-8"))
+        vector[h % 64] += 1.0 if h & 1 << 31 else -1.0
+    return vector / np.linalg.norm(vector)
+
+
+def make_builder() -> ContextBuilder:
+    memory = ShardedMemory(lambda user_id: VectorIndex(capacity=16))
+    return ContextBuilder(memory, hashed_embed, k=4, budget=512, threshold=None, tokenizer=Tokenizer(None))
+
+
+def ask(builder: ContextBuilder, prompt: str, user_id: str, answer: str) -> str:
+    context = builder.build(prompt, user_id)["context"]
+    builder.remember(prompt, answer, user_id)
+    return request_key(prompt, context)
+
+
+def test_repeated_question_keeps_context_and_request_key():
+    builder = make_builder()
+    ask(builder, "What is a stack?", "alice", "A last-in, first-out list.")
+    ask(builder, "How does recursion work?", "alice", "A function calls itself on a smaller input.")
+    keys = [ask(builder, prompt, "alice", f"answer {i}")
+            for i, prompt in enumerate(["What is a stack?", "what is a  stack?", "What is a stack?"])]
+    assert len(set(keys)) == 1
+    assert len(builder.memory.shard("alice")) == 2
+    assert builder.stats()["repeats"] == 3
+
+
+def test_histories_are_per_user():
+    builder = make_builder()
+    ask(builder, "What is a stack?", "alice", "A last-in, first-out list.")
+    assert builder.build("What is a stack?", "bob")["turns"] == 0
+    assert builder.build("What is a stack?", "alice")["turns"] == 1
+
+
+def test_same_question():
+    turn = format_turn(" What is a  Stack? ", "A list.\nA: really")
+    assert same_question(turn, "what is a stack?")
+    assert not same_question(turn, "What is a queue?")
+
+
+def test_concurrent_remembers_store_a_question_once():
+    builder = make_builder()
+    barrier = threading.Barrier(8)
+
+    def remember(user_id: str):
+        barrier.wait()
+        builder.remember("What is a stack?", "A last-in, first-out list.", user_id)
+
+    threads = [threading.Thread(target=remember, args=(user_id,)) for user_id in ["alice"] * 4 + ["bob"] * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builder.memory.shard("alice")) == len(builder.memory.shard("bob")) == 1
+    assert builder.stats()["repeats"] == 6
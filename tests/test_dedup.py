@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from Cache import TextResponseCache
+from Dedup import DedupStore, MinHashLSH, dedup_factory, jaccard, shingles
+from Memory import CosineStore, ShardedMemory
+
+
+def test_exact_and_near_duplicates_are_found():
+    lsh = MinHashLSH()
+    lsh.add("What is the derivative of x squared?")
+    assert lsh.find("  what is the DERIVATIVE of x squared? ") == ("What is the derivative of x squared?", 0.0)
+    text, distance = lsh.find("what is the derivative of x squared please?")
+    assert text == "What is the derivative of x squared?" and 0 < distance <= 0.2
+    assert (lsh.exact_hits, lsh.near_hits) == (1, 1)
+
+
+def test_distinct_questions_are_not_duplicates():
+    lsh = MinHashLSH()
+    lsh.add("What is the derivative of x squared?")
+    assert lsh.find("Explain how photosynthesis works in plants") is None
+    assert lsh.misses == 1
+
+
+@pytest.mark.parametrize("asked, stored", [
+    ("For homework 4 question 5, I got x = 2 but the key says otherwise. Can you check my answer?",
+     "For homework 4 question 3, I got x = 2 but the key says otherwise. Can you check my answer?"),
+    ("Which river flows through the capital of Australia?", "Which river flows through the capital of Austria?"),
+])
+def test_one_word_apart_is_a_near_duplicate_but_not_a_cache_key(asked, stored):
+    # The LSH index may match these (Jaccard >= 0.8); App's response cache must still treat them as different
+    assert jaccard(shingles(asked), shingles(stored)) >= 0.8
+    lsh = MinHashLSH()
+    lsh.add(stored)
+    assert lsh.find(asked)[0] == stored
+    cache = TextResponseCache()
+    cache.put(stored, {"answer": stored})
+    assert cache.get(asked) is None
+
+
+def test_threshold_is_a_lower_bound_on_jaccard():
+    stored = "Which river flows through the capital of Austria?"
+    asked = "Which river flows through the capital of Australia?"
+    similarity = jaccard(shingles(asked), shingles(stored))
+    strict, loose = MinHashLSH(threshold=min(1.0, similarity + 0.01)), MinHashLSH(threshold=similarity - 0.01)
+    for lsh in (strict, loose):
+        lsh.add(stored)
+    assert strict.find(asked) is None
+    assert loose.find(asked)[0] == stored
+
+
+def test_drop_oldest_leaves_no_stale_buckets():
+    lsh = MinHashLSH()
+    texts = [f"question number {i} about topic {i * 7}" for i in range(50)]
+    for text in texts:
+        lsh.add(text)
+    lsh.add(texts[0])  # a repeat: the exact-match map must keep pointing at the newer copy
+    lsh.drop_oldest(50)
+    assert len(lsh) == 1
+    remaining = set(lsh._entries)
+    assert all(set(ids) <= remaining for buckets in lsh._buckets for ids in buckets.values())
+    assert sum(len(ids) for buckets in lsh._buckets for ids in buckets.values()) == lsh.bands
+    assert lsh.find(texts[0]) == (texts[0], 0.0)
+    assert lsh.find(texts[1]) is None
+    lsh.drop_oldest(5)
+    assert len(lsh) == 0 and lsh._exact == {} and all(not buckets for buckets in lsh._buckets)
+
+
+def test_dedup_store_keeps_store_and_index_in_step():
+    store = DedupStore(CosineStore(capacity=4))
+    vectors = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+    store.add_many(["first question", "second question", "third question"], vectors)
+    store.drop_oldest(2)
+    assert store.texts == ["third question"] and len(store.lsh) == 1
+    assert store.find_duplicate("first question") is None
+    assert store.find_duplicate("third question") == ("third question", 0.0)
+
+
+def test_shards_do_not_share_duplicates():
+    memory = ShardedMemory(dedup_factory(lambda user_id: CosineStore(capacity=4)))
+    memory.add("alice", "What is the capital of Austria?", np.ones(8, dtype=np.float32))
+    assert memory.apply("alice", lambda store: store.find_duplicate("What is the capital of Austria?"))
+    assert memory.apply("bob", lambda store: store.find_duplicate("What is the capital of Austria?")) is None
+    memory.add("bob", "unrelated", np.ones(8, dtype=np.float32))
+    assert memory.apply("bob", lambda store: store.find_duplicate("What is the capital of Austria?")) is None
@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import types
+import pytest
+from Diagram import ConceptMapRenderer, DiagramService, diagram_key
+
+
+@pytest.fixture
+def graphviz(monkeypatch):
+    # Stands in for the graphviz package: render() writes the file dot would, and can be held or made to fail
+    state = types.SimpleNamespace(renders=0, release=threading.Event(), fail=False)
+    state.release.set()
+
+    class Digraph:
+        def __init__(self, comment=None):
+            self.nodes = []
+
+        def node(self, name, label):
+            self.nodes.append(label)
+
+        def edge(self, tail, head):
+            pass
+
+        def render(self, filename, directory, format, cleanup):
+            state.renders += 1
+            state.release.wait(5)
+            if state.fail:
+                raise RuntimeError("dot failed")
+            path = os.path.join(directory, f"{filename}.{format}")
+            with open(path, "w") as f:
+                f.write(" -> ".join(self.nodes))
+            return path
+
+    state.Digraph = Digraph
+    monkeypatch.setitem(sys.modules, "graphviz", state)
+    return state
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = DiagramService(out_dir=str(tmp_path), max_workers=4)
+    yield service
+    service.shutdown()
+
+
+def test_a_rendered_diagram_is_reused_by_its_content_hash(graphviz, service, tmp_path):
+    path = service.render(["light", "glucose"], "process")
+    assert path == service.path_for(["light", "glucose"], "process")
+    assert os.path.basename(path) == f"concept_{diagram_key(['light', 'glucose'], 'process', 'png')}.png"
+    with open(path) as f:
+        assert f.read() == "light -> glucose"
+    assert os.listdir(tmp_path) == [os.path.basename(path)]  # the private render name was renamed away
+    # a second service (e.g. after a restart) finds the file without rendering
+    again = DiagramService(out_dir=str(tmp_path))
+    assert again.render(["light", "glucose"], "process") == path
+    assert again.cached(["light", "glucose"], "process") == path
+    assert graphviz.renders == 1 and (again.hits, again.misses) == (1, 0)
+    again.shutdown()
+
+
+def test_identical_requests_in_flight_share_one_future(graphviz, service):
+    graphviz.release.clear()
+    futures = []
+    threads = [threading.Thread(target=lambda: futures.append(service.submit(["cell", "nucleus"], "theory")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert service.cached(["cell", "nucleus"], "theory") is None  # still rendering
+    graphviz.release.set()
+    assert len({id(future) for future in futures}) == 1
+    assert futures[0].result(5) == service.path_for(["cell", "nucleus"], "theory")
+    assert graphviz.renders == 1 and (service.hits, service.misses) == (7, 1)
+
+
+def test_distinct_inputs_get_distinct_paths(graphviz, service):
+    requests = [(["a", "b"], "process", "png"), (["b", "a"], "process", "png"), (["a", "b"], "theory", "png"),
+                (["a", "b"], "process", "svg"), (["a", "b", "c"], "process", "png"), (["a b"], "process", "png")]
+    paths = [service.render(terms, topic, fmt) for terms, topic, fmt in requests]
+    assert len(set(paths)) == len(requests)
+    assert all(os.path.exists(path) for path in paths)
+    assert paths[3].endswith(".svg")
+    assert graphviz.renders == len(requests)
+
+
+def test_a_failed_render_leaves_nothing_cached(graphviz, service, tmp_path):
+    graphviz.fail = True
+    with pytest.raises(RuntimeError):
+        service.render(["atom"], "theory")
+    assert service.cached(["atom"], "theory") is None
+    assert os.listdir(tmp_path) == []
+    # the next request renders again instead of getting the failed Future back
+    graphviz.fail = False
+    assert service.render(["atom"], "theory") == service.path_for(["atom"], "theory")
+    assert graphviz.renders == 2 and (service.hits, service.misses) == (0, 2)
+
+
+def test_concept_map_memo_is_a_bounded_lru():
+    pytest.importorskip("matplotlib")
+    renderer = ConceptMapRenderer(cache_size=3, figsize=(2, 1), dpi=20)
+    for terms in (["a"], ["b"], ["c"]):
+        renderer.render(terms)
+    assert renderer.render(["a"]) == renderer.render(["a"], "png")  # hits refresh "a"
+    renderer.render(["d"])  # evicts "b", the least recently used
+    assert len(renderer._cache) == 3
+    assert renderer.metrics() == {"hits": 2, "misses": 4, "hit_rate": 2 / 6, "cached": 3}
+    renderer.render(["a"])
+    renderer.render(["b"])
+    assert (renderer.hits, renderer.misses) == (3, 5)
+    assert renderer.render(["a"], "svg").lstrip().startswith(b"<?xml")  # the format is part of the key
+    assert renderer.misses == 6
+
+
+def test_concept_map_reuses_one_figure_per_thread():
+    pytest.importorskip("matplotlib")
+    renderer = ConceptMapRenderer(figsize=(2, 1), dpi=20)
+    renderer.render(["light", "leaf"])
+    figure = renderer._local.figure
+    renderer.render(["cell", "wall", "cell"])
+    assert renderer._local.figure is figure and len(figure.axes) == 1  # cleared, not stacked up
+    other = []
+    thread = threading.Thread(target=lambda: (renderer.render(["atom"]), other.append(renderer._local.figure)))
+    thread.start()
+    thread.join()
+    assert other[0] is not figure
+
+
+def test_render_to_file_replaces_atomically(tmp_path, monkeypatch):
+    pytest.importorskip("matplotlib")
+    renderer = ConceptMapRenderer(figsize=(2, 1), dpi=20)
+    path = renderer.path_for(["light", "leaf"], str(tmp_path))
+    replaced = []
+    real_replace = os.replace
+
+    def replace(src, dst):
+        # the finished bytes appear under the final name in one step
+        assert dst == path and not os.path.exists(dst)
+        with open(src, "rb") as f:
+            assert f.read() == renderer.render(["light", "leaf"])
+        replaced.append(src)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace)
+    assert renderer.render_to_file(["light", "leaf"], str(tmp_path)) == path
+    assert renderer.render_to_file(["light", "leaf"], str(tmp_path)) == path  # an existing file is kept
+    assert len(replaced) == 1 and os.listdir(tmp_path) == [os.path.basename(path)]
+    assert renderer.cached_file(["light", "leaf"], str(tmp_path)) == path
+
+    def broken(key_terms, fmt):
+        raise RuntimeError("draw failed")
+
+    monkeypatch.setattr(renderer, "render", broken)
+    with pytest.raises(RuntimeError):
+        renderer.render_to_file(["atom"], str(tmp_path))
+    assert os.listdir(tmp_path) == [os.path.basename(path)]  # no half-written or temp file
@@ -0,0 +1,26 @@
+import numpy as np
+import Embedding
+from Embedding import Embedder
+
+
+class FakeDoc:
+    def __init__(self, text: str):
+        self.vector = np.array([len(text), text.count("a") + 1.0], dtype=np.float32)
+
+
+class FakeVectors:
+    meta = {"lang": "en", "name": "fake", "version": "0"}
+
+    def pipe(self, texts, batch_size=None):
+        return (FakeDoc(text) for text in texts)
+
+
+def test_mixed_batch_records_hits_and_misses_per_key(monkeypatch):
+    embedder = Embedder(load=FakeVectors)
+    embedder.embed_many(["cached question", "another cached one"])
+    recorded = []
+    monkeypatch.setattr(Embedding, "record_cache", lambda name, hit: recorded.append(hit))
+    # cached and new texts interleaved, and a repeat of a new one within the batch
+    embedder.embed_many(["Cached question?", "new question", "another cached one", "fresh", "New question"])
+    assert recorded == [True, False, True, False, True]
+    assert (embedder.hits, embedder.misses) == (3, 4)
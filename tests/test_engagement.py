@@ -0,0 +1,236 @@
+import concurrent.futures
+import logging
+import sys
+import time
+import types
+import numpy as np
+import pytest
+import Engagement
+from Engagement import DEFAULT_ENGAGEMENT, EngagementSampler, FakeFrameSource, GatedDetector, analyze_video
+
+
+class FakeEmotionDetector:
+    def __init__(self, emotion: str = "happy"):
+        self.emotion = emotion
+        self.calls = 0
+
+    def dominant_emotion(self, frame, faces=None):
+        self.calls += 1
+        return self.emotion
+
+
+class FakeFaceDetector:
+    # A face wherever the frame isn't black
+    def faces(self, gray):
+        return [(0, 0, gray.shape[1], gray.shape[0])] if gray.mean() > 0 else []
+
+
+def frames(levels):
+    return [np.full((48, 64, 3), level, dtype=np.uint8) for level in levels]
+
+
+class FakeClock:
+    # Time only moves when a frame is read (costs[i] seconds for the i-th read) or the sampler waits;
+    # the sampler is stopped after `stop_after` waits
+    def __init__(self, costs, stop_after: int):
+        self.now = 0.0
+        self.costs = costs
+        self.stop_after = stop_after
+        self.reads = []
+        self.waits = []
+        self.sampler = None
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def wait(self, seconds: float):
+        self.waits.append(seconds)
+        self.now += seconds
+        if len(self.waits) == self.stop_after:
+            self.sampler.stop()
+
+
+class TimedSource(FakeFrameSource):
+    def __init__(self, clock: FakeClock):
+        super().__init__(frames([100]))
+        self.clock = clock
+
+    def read(self):
+        self.clock.reads.append(self.clock.now)
+        self.clock.now += self.clock.costs[len(self.clock.reads) - 1]
+        return super().read()
+
+
+def test_sampler_keeps_its_rate():
+    clock = FakeClock(costs=[0.005] * 25, stop_after=25)
+    clock.sampler = EngagementSampler(TimedSource(clock), FakeEmotionDetector, rate_hz=50.0, window=5,
+                                      clock=clock.monotonic, wait=clock.wait)
+    clock.sampler._run()  # on the test's thread: deterministic
+    assert clock.sampler.samples == 25
+    assert clock.reads == pytest.approx([i * 0.02 for i in range(25)])  # one frame per 1/rate_hz
+    assert clock.waits == pytest.approx([0.015] * 25)  # the read's cost comes out of the wait
+    assert clock.sampler.current_engagement() == pytest.approx(0.8)
+
+
+def test_a_slow_read_does_not_cause_a_burst():
+    clock = FakeClock(costs=[0.005, 0.05, 0.005, 0.005], stop_after=4)
+    clock.sampler = EngagementSampler(TimedSource(clock), FakeEmotionDetector, rate_hz=50.0,
+                                      clock=clock.monotonic, wait=clock.wait)
+    clock.sampler._run()
+    assert clock.waits == pytest.approx([0.015, 0.0, 0.015, 0.015])
+    assert clock.reads == pytest.approx([0.0, 0.02, 0.07, 0.09])
+
+
+def test_sampler_thread_samples_until_stopped():
+    source = FakeFrameSource(frames([100]))
+    sampler = EngagementSampler(source, FakeEmotionDetector, rate_hz=200.0).start()
+    deadline = time.monotonic() + 5.0
+    while sampler.samples < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sampler.stop(timeout=1.0)
+    assert not sampler.running and sampler.samples >= 3
+    samples = sampler.samples
+    time.sleep(0.05)
+    assert sampler.samples == samples and source.reads == samples
+
+
+def test_gated_detector_only_infers_on_changed_frames_with_a_face():
+    pytest.importorskip("cv2")
+    emotions = FakeEmotionDetector()
+    gated = GatedDetector(emotions, FakeFaceDetector())
+    # changed+face, unchanged, unchanged, changed+face, no face, unchanged, changed+face
+    source = FakeFrameSource(frames([100, 100, 101, 200, 0, 1, 150]), loop=False)
+    sampler = EngagementSampler(source, lambda: gated, rate_hz=200.0)
+    sampler.start()
+    deadline = time.monotonic() + 2.0
+    while sampler.samples < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sampler.stop(timeout=1.0)
+    assert gated.stats == {"frames": 7, "unchanged": 3, "no_face": 1, "inferred": 3}
+    assert emotions.calls == 3
+
+
+def test_failed_detector_is_not_respawned():
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ImportError("no model")
+
+    sampler = EngagementSampler(FakeFrameSource(frames([100])), broken)
+    for _ in range(5):
+        sampler.start()
+        if sampler._thread is not None:
+            sampler._thread.join(1.0)
+    assert len(attempts) == 1
+    assert isinstance(sampler.error, ImportError)
+    assert sampler.current_engagement() == DEFAULT_ENGAGEMENT
+
+
+class FakeCapture:
+    # cv2.VideoCapture over `frames` frames whose pixels are their own index; counts seeks and grabs
+    def __init__(self, frames: int, fps: float, reported: int):
+        self.frames, self.fps, self.reported = frames, fps, reported
+        self.position = 0
+        self.seeks = []
+        self.grabs = 0
+        self.reads = 0
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return self.fps if prop == "fps" else self.reported
+
+    def set(self, prop, value):
+        assert prop == "pos"
+        self.seeks.append(value)
+        self.position = value
+
+    def grab(self):
+        self.grabs += 1
+        self.position += 1
+        return self.position <= self.frames
+
+    def read(self):
+        if self.position >= self.frames:
+            return False, None
+        self.reads += 1
+        self.position += 1
+        return True, np.full((4, 4, 3), self.position - 1, dtype=np.int64)
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def video(monkeypatch):
+    # A fake cv2 whose captures all replay one video; returns the list of opened captures
+    captures = []
+
+    def open_video(frames: int = 100, fps: float = 10.0, reported=None):
+        def capture(path):
+            captures.append(FakeCapture(frames, fps, frames if reported is None else reported))
+            return captures[-1]
+        cv2 = types.SimpleNamespace(VideoCapture=capture, CAP_PROP_FPS="fps", CAP_PROP_FRAME_COUNT="count",
+                                    CAP_PROP_POS_FRAMES="pos")
+        monkeypatch.setitem(sys.modules, "cv2", cv2)
+        return captures
+    monkeypatch.setattr(Engagement, "_worker_detector", None)
+    return open_video
+
+
+class IndexDetector:
+    # happy on even frames, sad on odd ones, fails on frame 40
+    def dominant_emotion(self, frame, faces=None):
+        index = int(frame[0, 0, 0])
+        if index == 40:
+            raise RuntimeError("model error")
+        return "sad" if index % 2 else "happy"
+
+
+def expected_score(index: int) -> float:
+    return DEFAULT_ENGAGEMENT if index == 40 else (0.2 if index % 2 else 0.8)
+
+
+@pytest.mark.parametrize("indices, seeks, grabs", [
+    ([0, 10, 20, 30], [], 27),  # short hops are decoded through: 0 + 9 + 9 + 9
+    ([0, 45, 90], [45, 90], 0),  # long ones seek
+    ([35, 40, 41], [35], 4),
+])
+def test_score_segment_seeks_or_grabs_to_each_index(video, monkeypatch, indices, seeks, grabs):
+    captures = video()
+    monkeypatch.setattr(Engagement, "_worker_detector", IndexDetector())
+    rows = Engagement._score_segment(("video.mp4", indices, 2))
+    assert rows.shape == (len(indices), 2)
+    assert rows[:, 0].tolist() == indices
+    assert rows[:, 1].tolist() == [expected_score(i) for i in indices]
+    assert (captures[0].seeks, captures[0].grabs, captures[0].reads) == (seeks, grabs, len(indices))
+
+
+def test_score_segment_stops_at_the_real_end_of_the_video(video, monkeypatch):
+    video(frames=25)
+    monkeypatch.setattr(Engagement, "_worker_detector", IndexDetector())
+    rows = Engagement._score_segment(("video.mp4", [0, 10, 20, 30, 40], 16))
+    assert rows[:, 0].tolist() == [0, 10, 20]
+    assert Engagement._score_segment(("video.mp4", [], 16)).shape == (0, 2)
+
+
+@pytest.mark.parametrize("segment_size, batch_size", [(6, 4), (256, 16), (1, 1)])
+def test_analyze_video_series(video, monkeypatch, tmp_path, caplog, segment_size, batch_size):
+    # Frame counts can overstate the video: indices past its real end are dropped, not scored
+    captures = video(frames=100, fps=10.0, reported=120)
+    monkeypatch.setitem(Engagement.DETECTORS, "fake", IndexDetector)
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", concurrent.futures.ThreadPoolExecutor)
+    out_path = tmp_path / "engagement.csv"
+    with caplog.at_level(logging.INFO, logger="Engagement"):
+        series = analyze_video("video.mp4", stride_s=0.5, batch_size=batch_size, workers=2, model="fake",
+                               gated=False, segment_size=segment_size, out_path=str(out_path))
+    indices = list(range(0, 100, 5))  # stride 0.5 s at 10 fps
+    assert series.shape == (20, 2)
+    assert series[:, 0] == pytest.approx([i / 10.0 for i in indices])
+    assert series[:, 1].tolist() == [expected_score(i) for i in indices]
+    assert len(captures) == 1 + -(-24 // segment_size)  # the probe, then one capture per segment
+    assert "Processed 20 frames" in caplog.text
+    saved = np.loadtxt(out_path, delimiter=",", skiprows=1)
+    assert saved == pytest.approx(series)
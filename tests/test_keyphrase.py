@@ -0,0 +1,56 @@
+import random
+import pytest
+from Keyphrase import RakeExtractor
+from benchmarks.corpus import ENGLISH_STOPWORDS, keyphrase_documents
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return RakeExtractor(stopwords=ENGLISH_STOPWORDS)
+
+
+def rake_ranking(sentences):
+    rake_nltk = pytest.importorskip("rake_nltk")
+    rake = rake_nltk.Rake(stopwords=set(ENGLISH_STOPWORDS))
+    rake.extract_keywords_from_sentences(sentences)
+    return rake.get_ranked_phrases()
+
+
+def test_matches_rake_nltk_on_the_keyphrase_corpus(extractor):
+    documents = keyphrase_documents(300)
+    expected = [rake_ranking(sentences) for sentences in documents]
+    assert extractor.ranked_phrases_many(documents, topn=None) == expected
+    assert [extractor.ranked_phrases(sentences) for sentences in documents] == [ranked[:5] for ranked in expected]
+
+
+def test_matches_rake_nltk_on_unicode(extractor):
+    # Lowercasing can change length or split differently outside ASCII (İ, ß, Σ), so those sentences go
+    # token by token
+    rng = random.Random(0)
+    alphabet = "aeiouxyz ÀÉÎÕÜßİıΣσςДжŉǅﬁ,.;-'0123456789" + " the of and is to"
+    for _ in range(500):
+        sentences = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+                     for _ in range(rng.randint(1, 3))]
+        assert extractor.ranked_phrases(sentences, topn=None) == rake_ranking(sentences), sentences
+
+
+def test_ties_break_on_the_phrase_text_high_to_low(extractor):
+    ranked = extractor.ranked_phrases(["apple and cherry and banana"], topn=None)
+    assert ranked == ["cherry", "banana", "apple"]  # each scores 1.0
+    assert extractor.ranked_phrases(["apple and cherry and banana"], topn=2) == ["cherry", "banana"]
+
+
+def test_longer_phrases_rank_higher(extractor):
+    ranked = extractor.ranked_phrases(["Photosynthesis converts light energy into chemical energy."], topn=None)
+    assert ranked == ["photosynthesis converts light energy", "chemical energy"]
+
+
+@pytest.mark.parametrize("topn", [0, -3])
+def test_non_positive_topn_is_empty(extractor, topn):
+    assert extractor.ranked_phrases(["apple and cherry and banana"], topn=topn) == []
+
+
+@pytest.mark.parametrize("sentences", [[], [""], ["   "], ["the of and is"], ["!"], [", ."]])
+def test_documents_without_phrases(extractor, sentences):
+    assert extractor.ranked_phrases(sentences) == []
+    assert extractor.ranked_phrases_many([sentences, ["apple"]]) == [[], ["apple"]]
@@ -0,0 +1,113 @@
+import threading
+import types
+import pytest
+import Main
+from Cache import ResponseCache
+from Diagram import DiagramService
+from Memory import ShardedMemory, VectorIndex
+from test_context import hashed_embed
+
+
+@pytest.fixture
+def stages(monkeypatch, tmp_path):
+    # run_pipeline's agents swapped for fakes that log their calls; `release` unblocks stalled ones at teardown
+    fakes = types.SimpleNamespace(calls=[], engagement=0.9, release=threading.Event(), stall=set(), fail=set())
+
+    def agent(name, fn):
+        def call(*args, **kwargs):
+            fakes.calls.append((name, args))
+            if name in fakes.stall:
+                fakes.release.wait(10.0)
+            if name in fakes.fail:
+                raise RuntimeError(f"{name} failed")
+            return fn(*args, **kwargs)
+        return call
+
+    def analyze(text, doc=None):
+        return {"key_terms": [word.strip("?").lower() for word in text.split()[-2:]], "triples": [],
+                "topic_type": "process" if "how" in text.lower() else "theory"}
+
+    def draw(key_terms, topic_type):
+        path = service.path_for(key_terms, topic_type)
+        with open(path, "w") as f:
+            f.write("png")
+        return path
+
+    service = DiagramService(out_dir=str(tmp_path))
+    monkeypatch.setattr(Main, "diagram_service", service)
+    monkeypatch.setattr(Main, "monitor_engagement", agent("engagement", lambda: fakes.engagement))
+    monkeypatch.setattr(Main, "embed_text", agent("embed", hashed_embed))
+    monkeypatch.setattr(Main, "nlp_agent", agent("nlp", analyze))
+    monkeypatch.setattr(Main, "generate_diagram", agent("diagram", draw))
+    monkeypatch.setattr(Main, "retrieve_similar_query", agent("memory", Main.retrieve_similar_query))
+    monkeypatch.setattr(Main, "dialogue_memory", ShardedMemory(lambda user_id: VectorIndex(capacity=16)))
+    monkeypatch.setattr(Main, "response_cache", ResponseCache(threshold=0.05, metric="l2", maxsize=16))
+    yield fakes
+    fakes.release.set()
+    service.shutdown()
+
+
+def called(fakes, name):
+    return [args for stage, args in fakes.calls if stage == name]
+
+
+def test_pipeline_wires_each_stage_to_its_dependencies(stages):
+    question = "How does photosynthesis work?"
+    run = Main.run_pipeline(question, user_id="alice")
+    assert run.degraded == {}
+    assert run.outputs["lookup"] is None and run.outputs["memory"] is None
+    assert run.outputs["nlp"] == {"key_terms": ["photosynthesis", "work"], "triples": [], "topic_type": "process"}
+    assert called(stages, "diagram") == [(["photosynthesis", "work"], "process")]
+    assert run.outputs["diagram"] == Main.diagram_service.path_for(["photosynthesis", "work"], "process")
+    assert run.outputs["adaptive"] == Main.adaptive_teaching(Main.BASE_RESPONSE, 0.9)
+    assert Main.dialogue_memory.apply("alice", lambda store: store.texts) == [question]
+
+    # The repeat is a cache hit: the NLP agent and the render are skipped, memory remembers the first time
+    stages.engagement = 0.1
+    again = Main.run_pipeline(question, user_id="alice")
+    assert again.degraded == {}
+    assert again.outputs["lookup"]["nlp"] == again.outputs["nlp"] == run.outputs["nlp"]
+    assert again.outputs["diagram"] == run.outputs["diagram"]
+    assert again.outputs["memory"] == question
+    assert again.outputs["adaptive"] == Main.adaptive_teaching(Main.BASE_RESPONSE, 0.1)
+    assert len(called(stages, "nlp")) == 1 and len(called(stages, "diagram")) == 1
+    assert called(stages, "embed") == [(question,), (question,)]  # once per run, shared by lookup and memory
+
+
+def test_pipeline_falls_back_when_stages_fail_or_stall(stages):
+    stages.fail = {"nlp", "memory"}
+    stages.stall = {"engagement"}
+    question = "What is a stack?"
+    run = Main.run_pipeline(question, stage_budgets={"engagement": 0.05}, user_id="alice")
+    assert run.degraded["engagement"] == "timeout"
+    assert run.degraded["nlp"].startswith("error: RuntimeError")
+    assert run.degraded["memory"].startswith("error: RuntimeError")
+    assert set(run.degraded) == {"engagement", "nlp", "memory"}
+    assert run.outputs["engagement"] == Main.DEFAULT_ENGAGEMENT
+    assert run.outputs["nlp"] == Main.nlp_fallback(question)
+    assert run.outputs["memory"] is None
+    assert called(stages, "diagram") == [([], "theory")]  # the fallback's key terms still reach the diagram
+    assert run.outputs["adaptive"] == Main.BASE_RESPONSE
+    assert len(Main.response_cache) == 0  # fallbacks are never cached
+
+
+def test_a_stalled_diagram_falls_back_to_an_earlier_render(stages, monkeypatch):
+    question = "How does photosynthesis work?"
+    first = Main.run_pipeline(question)
+    monkeypatch.setattr(Main, "response_cache", ResponseCache(threshold=0.05, metric="l2", maxsize=16))  # a miss
+    stages.stall = {"diagram"}
+    run = Main.run_pipeline(question, stage_budgets={"diagram": 0.05})
+    assert run.degraded == {"diagram": "timeout"}
+    assert run.outputs["diagram"] == first.outputs["diagram"]
+
+
+def test_a_failed_embedding_skips_lookup_and_memory(stages):
+    stages.fail = {"embed"}
+    question = "How does photosynthesis work?"
+    run = Main.run_pipeline(question, user_id="alice")
+    assert set(run.degraded) == {"embed"}
+    assert run.outputs["lookup"] is None and run.outputs["memory"] is None
+    assert run.outputs["nlp"]["key_terms"] == ["photosynthesis", "work"] and run.outputs["diagram"]
+    assert called(stages, "memory") == [] and len(called(stages, "embed")) == 1
+    assert len(Main.response_cache) == 0
+    assert Main.dialogue_memory.shard("alice", create=False) is None
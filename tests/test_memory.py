@@ -0,0 +1,300 @@
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pytest
+from Memory import (CosineStore, DiskDialogueStore, ShardedMemory, VectorIndex, compressed_shard_factory,
+                    disk_shard_factory)
+
+
+def test_compressed_shards_must_be_able_to_train(tmp_path):
+    with pytest.raises(ValueError, match="training sample"):
+        compressed_shard_factory(str(tmp_path), "ivfpq", max_turns=500)
+    compressed_shard_factory(str(tmp_path), "sq", max_turns=500)
+
+
+def test_ivfpq_trains_from_a_sample(tmp_path):
+    sample = np.random.default_rng(0).standard_normal((2000, 32)).astype(np.float32)
+    open_shard = compressed_shard_factory(str(tmp_path), "ivfpq", sample, max_turns=500, nlist=16, train_size=1000)
+    shard = open_shard("alice")
+    shard.add("q", sample[0])
+    assert shard.trained
+    assert shard.search(sample[0], k=1)[0][0] == "q"
+
+
+@pytest.mark.parametrize("store", [lambda user_id: VectorIndex(capacity=16), lambda user_id: CosineStore(capacity=16)])
+def test_concurrent_adds_keep_texts_and_vectors_aligned(store):
+    # Pipeline stages add to one student's shard from pool threads; switch threads as often as possible
+    memory = ShardedMemory(store, max_turns_per_shard=256)
+    vectors = np.random.default_rng(0).standard_normal((400, 300)).astype(np.float32)
+    errors = []
+
+    def add(worker: int):
+        try:
+            for i, vector in enumerate(vectors):
+                memory.add("student", f"{worker}-{i}", vector)
+                memory.search("student", vector, k=2)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=add, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    shard = memory.shard("student")
+    assert not errors
+    assert len(shard.texts) == len(shard.vectors) == 256
+    for text, row in zip(shard.texts, shard.vectors.view):
+        expected = vectors[int(text.split("-")[1])]
+        assert np.allclose(row, expected / np.linalg.norm(expected) if isinstance(shard, CosineStore) else expected)
+
+
+def test_apply_runs_on_the_users_shard():
+    memory = ShardedMemory(lambda user_id: VectorIndex(capacity=16))
+    assert memory.apply("student", len, default=-1) == -1
+    memory.add("student", "q", np.ones(4, dtype=np.float32))
+    assert memory.apply("student", len) == 1
+
+
+def test_disk_store_compacts_dropped_rows(tmp_path):
+    path = str(tmp_path / "shard")
+    store = DiskDialogueStore(path, metric="l2")
+    vectors = np.random.default_rng(0).standard_normal((5000, 32)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        store.add(f"turn {i}", vector)
+        if len(store) > 10:
+            store.drop_oldest(len(store) - 10)
+        if i == 2500:
+            store.search(vector, k=1)  # fill the l2 norms, which compaction must carry over
+    assert store.compactions > 0
+    assert store.count <= 21 and len(store._offsets) <= 21 and len(store._sq_norms) <= 21
+    assert store.disk_bytes < 1024 * 32 * 4 + 21 * 16
+    assert store.texts == [f"turn {i}" for i in range(4990, 5000)]
+    assert store.search(vectors[4995], k=1)[0] == ("turn 4995", 0.0)
+    store.close()
+    reopened = DiskDialogueStore(path, metric="l2")
+    assert reopened.texts == [f"turn {i}" for i in range(4990, 5000)]
+    assert reopened.vectors_at(np.arange(10)).tolist() == vectors[4990:].tolist()
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine"])
+def test_disk_store_reopens_with_the_same_texts_and_results(tmp_path, metric):
+    path = str(tmp_path / "shard")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((60, 16)).astype(np.float32)
+    texts = [f"turn {i}: ¿qué es una pila? 栈" if i % 3 else f"turn {i}" for i in range(60)]
+    store = DiskDialogueStore(path, metric=metric, chunk_rows=8)  # several remaps as it grows
+    for start in range(0, 50, 7):
+        store.add_many(texts[start:min(start + 7, 50)], vectors[start:min(start + 7, 50)])
+    store.drop_oldest(5)
+    queries = vectors[::4] + rng.normal(0, 0.1, (15, 16)).astype(np.float32)
+    before = ([store.search(query, k=3) for query in queries], store.search_many(queries, k=2, threshold=1.0))
+    store.close()
+
+    reopened = DiskDialogueStore(path, metric=metric)  # dim comes from the header
+    assert len(reopened) == 45 and reopened.dim == 16
+    assert reopened.texts == texts[5:50]
+    assert ([reopened.search(query, k=3) for query in queries],
+            reopened.search_many(queries, k=2, threshold=1.0)) == before
+    reopened.add_many(texts[50:], vectors[50:])  # appends after a reopen land after the old rows
+    reopened.close()
+    assert DiskDialogueStore(path, metric=metric).texts == texts[5:]
+
+
+def test_disk_store_finishes_an_interrupted_swap(tmp_path):
+    path = str(tmp_path / "shard")
+    store = DiskDialogueStore(path, metric="cosine")
+    store.add("kept", np.ones(4, dtype=np.float32))
+    store.close()
+    os.rename(path, path + ".compact")
+    os.makedirs(path + ".old")
+    assert DiskDialogueStore(path, metric="cosine").texts == ["kept"]
+    assert not os.path.exists(path + ".compact") and not os.path.exists(path + ".old")
+
+
+def test_shards_in_use_are_not_evicted(tmp_path):
+    memory = ShardedMemory(disk_shard_factory(str(tmp_path), "cosine"))
+    memory.add("alice", "q", np.ones(4, dtype=np.float32))
+    assert memory.apply("alice", lambda store: memory.evict("alice")) is False
+    store = memory.shard("alice")
+    assert memory.evict("alice") and memory.evictions == 1
+    assert store._texts.closed  # unmapped and closed, so a reopen is the only writer
+    assert memory.shard("alice").texts == ["q"]
+
+
+def test_concurrent_adds_around_eviction_keep_disk_shards_intact(tmp_path):
+    # A byte cap of one shard forces an eviction on nearly every add; each user's turns must survive the
+    # close/reopen cycles, in order, with no second writer on a shard directory
+    memory = ShardedMemory(disk_shard_factory(str(tmp_path), "cosine"), max_total_bytes=1)
+    users = [f"user{u}" for u in range(3)]
+    errors = []
+
+    def add(worker: int):
+        try:
+            for i in range(60):
+                user_id = users[(worker + i) % len(users)]
+                memory.add(user_id, f"{worker}-{i}", np.full(8, worker * 100 + i + 1, dtype=np.float32))
+                memory.search(users[i % len(users)], np.ones(8, dtype=np.float32), k=1)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=add, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors
+    assert memory.evictions > 0
+    total = 0
+    for user_id in users:
+        memory.evict(user_id)
+        store = memory.shard(user_id)  # reopened from disk
+        texts = store.texts
+        total += len(texts)
+        assert len(texts) == len(store) == store.count
+        for worker in range(4):
+            mine = [int(text.split("-")[1]) for text in texts if text.startswith(f"{worker}-")]
+            assert mine == sorted(mine)
+    assert total == 4 * 60
+
+
+def test_cosine_store_matches_sklearn_nearest_neighbors():
+    # CosineStore replaced a NearestNeighbors(metric="cosine") refit per query in App.py
+    neighbors = pytest.importorskip("sklearn.neighbors")
+    rng = np.random.default_rng(0)
+    stored = rng.standard_normal((2000, 96)).astype(np.float32)
+    stored[::7] = 0.0  # spaCy returns zero vectors for out-of-vocabulary text
+    queries = np.concatenate([stored[rng.integers(0, 2000, 100)] + 0.05 * rng.standard_normal((100, 96)),
+                              rng.standard_normal((100, 96))]).astype(np.float32)
+    store = CosineStore(96)
+    store.add_many([str(i) for i in range(2000)], stored)
+    ref_dist, ref_idx = neighbors.NearestNeighbors(n_neighbors=5, metric="cosine").fit(stored).kneighbors(queries)
+    for hits, dists, idxs in zip(store.search_many(queries, k=5), ref_dist, ref_idx):
+        assert [int(text) for text, _ in hits] == idxs.tolist()
+        assert np.allclose([dist for _, dist in hits], dists, atol=1e-5)
+    top1 = store.search_many(queries, k=1, threshold=0.2)  # App.py's cut-off
+    assert [bool(hits) for hits in top1] == (ref_dist[:, 0] < 0.2).tolist()
+
+
+def test_open_shards_are_capped(tmp_path):
+    # Disk shards cost file descriptors, not bytes: the byte cap alone never closes them
+    memory = ShardedMemory(disk_shard_factory(str(tmp_path), "cosine"), max_shards=4)
+    fds = lambda: len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else 0
+    before = fds()
+    for u in range(40):
+        memory.add(f"user{u}", f"question from {u}", np.ones(8, dtype=np.float32))
+    assert len(memory) == 4 and memory.evictions == 36
+    assert fds() - before <= 4 * 3
+    assert memory.shard("user0").texts == ["question from 0"]  # closed, not lost
+
+
+def test_shards_are_built_outside_the_global_lock():
+    release, built = threading.Event(), []
+
+    def factory(user_id: str):
+        built.append(user_id)
+        if user_id == "slow":
+            release.wait(5.0)  # a slow disk open or re-encode
+        return VectorIndex(capacity=16)
+
+    memory = ShardedMemory(factory)
+    slow = [threading.Thread(target=memory.add, args=("slow", "q", np.ones(4, dtype=np.float32)))
+            for _ in range(3)]
+    for thread in slow:
+        thread.start()
+    while "slow" not in built:
+        time.sleep(0.001)
+    memory.add("fast", "q", np.ones(4, dtype=np.float32))  # doesn't wait for the slow build
+    assert len(memory.shard("fast")) == 1 and not release.is_set()
+    release.set()
+    for thread in slow:
+        thread.join()
+    assert built.count("slow") == 1 and len(memory.shard("slow")) == 3
+
+
+def clustered(n: int, dim: int = 16, seed: int = 0):
+    # Well-separated points, so every mode agrees on the nearest one
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((n, dim)) * 10).astype(np.float32)
+
+
+def test_vector_index_search_is_nearest_first():
+    index = VectorIndex(capacity=4)
+    vectors = np.array([[0, 0], [3, 0], [1, 0], [0, 2]], dtype=np.float32)
+    index.add_many(["origin", "far", "near", "up"], vectors)
+    assert index.search(np.zeros(2), k=3) == [("origin", 0.0), ("near", 1.0), ("up", 4.0)]  # squared L2
+    assert [text for text, _ in index.search(np.array([2.9, 0]), k=10)] == ["far", "near", "origin", "up"]
+    assert VectorIndex().search(np.zeros(2)) == []
+
+
+def test_vector_index_threshold_is_exclusive():
+    index = VectorIndex()
+    index.add_many(["a", "b"], np.array([[0, 0], [0, 1]], dtype=np.float32))
+    assert index.search(np.zeros(2), k=2, threshold=1.0) == [("a", 0.0)]
+    assert index.search(np.zeros(2), k=2, threshold=1.01) == [("a", 0.0), ("b", 1.0)]
+    assert index.search(np.array([5, 5]), k=2, threshold=1.0) == []
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="Unknown index mode"):
+        VectorIndex(mode="annoy")
+
+
+@pytest.mark.parametrize("mode, options", [("ivf", {"nlist": 4, "nprobe": 4}), ("hnsw", {"hnsw_m": 8})])
+def test_approximate_modes_find_what_flat_finds(mode, options):
+    pytest.importorskip("faiss")
+    vectors = clustered(300)
+    flat, approximate = VectorIndex(), VectorIndex(mode=mode, **options)
+    texts = [f"turn {i}" for i in range(len(vectors))]
+    flat.add_many(texts[:200], vectors[:200])
+    approximate.add_many(texts[:200], vectors[:200])
+    for text, vector in zip(texts[200:], vectors[200:]):  # incremental adds reach the faiss index too
+        flat.add(text, vector)
+        approximate.add(text, vector)
+    assert approximate._index is not None and approximate._indexed == 300
+    queries = vectors[::7] + 0.01
+    for query in queries:
+        found, expected = approximate.search(query, k=3), flat.search(query, k=3)
+        assert [text for text, _ in found] == [text for text, _ in expected]
+        assert [dist for _, dist in found] == pytest.approx([dist for _, dist in expected], rel=1e-4, abs=1e-2)
+        assert approximate.search(query, k=1, threshold=1e-6) == []
+
+
+def test_ivf_scans_exactly_until_it_can_train():
+    pytest.importorskip("faiss")
+    vectors = clustered(200)
+    index = VectorIndex(mode="ivf", nlist=4, train_size=150)
+    index.add_many([f"turn {i}" for i in range(100)], vectors[:100])
+    assert index._index is None
+    assert index.search(vectors[42], k=1) == [("turn 42", 0.0)]
+    index.add_many([f"turn {i}" for i in range(100, 200)], vectors[100:])
+    assert index._index is not None and index.search(vectors[150], k=1)[0][0] == "turn 150"
+
+
+@pytest.mark.parametrize("mode", ["flat", "ivf", "hnsw"])
+def test_drop_oldest_keeps_texts_and_ids_aligned(mode):
+    if mode != "flat":
+        pytest.importorskip("faiss")
+    vectors = clustered(200)
+    index = VectorIndex(mode=mode, nlist=4, train_size=100, capacity=16)
+    index.add_many([f"turn {i}" for i in range(200)], vectors)
+    index.drop_oldest(120)
+    assert len(index) == 80 and index.texts[0] == "turn 120"
+    assert index.search(vectors[150], k=1)[0][0] == "turn 150"
+    assert all(text != "turn 10" for text, _ in index.search(vectors[10], k=80))
+    index.add("new", vectors[10])
+    assert index.search(vectors[10], k=1) == [("new", pytest.approx(0.0, abs=1e-2))]
+    index.drop_oldest(100)
+    assert len(index) == 0 and index.search(vectors[0]) == []
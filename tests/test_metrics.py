@@ -0,0 +1,96 @@
+import re
+import pytest
+import Metrics
+from Metrics import Histogram, record_cache, to_prometheus, traced
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setattr(Metrics, "ENABLED", True)
+    monkeypatch.setattr(Metrics, "TRACK_ALLOCATIONS", False)
+    Metrics.reset()
+    yield Metrics
+    Metrics.reset()
+
+
+@pytest.mark.parametrize("bits", [4, 6, 8])
+def test_buckets_bound_the_relative_error(bits):
+    histogram = Histogram(unit=1e-6, bits=bits)
+    values = [i * 1e-6 for i in range(1, 300)] + [1.37 ** k * 1e-6 for k in range(60)]
+    for value in values:
+        upper = histogram._upper(histogram._index(value))
+        assert upper >= value * (1 - 1e-12)
+        # below 2**(bits - 1) units buckets are one unit wide, above that relatively narrow
+        assert upper - value <= max(value * 2 ** -(bits - 1), histogram.unit) * (1 + 1e-9)
+
+
+def test_percentiles_of_known_data():
+    histogram = Histogram()
+    for ms in range(1000, 0, -1):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000 and histogram.max == 1.0
+    assert histogram.total == pytest.approx(500.5)
+    for q, expected in ((0.50, 0.5), (0.99, 0.99), (1.0, 1.0)):
+        assert expected <= histogram.percentile(q) <= expected * (1 + 2 ** -5)
+    summary = histogram.summary()
+    assert summary["mean"] == pytest.approx(0.5005) and summary["p50"] == histogram.percentile(0.5)
+
+
+def test_empty_histogram():
+    assert Histogram().percentile(0.99) == 0.0
+    assert Histogram().summary()["mean"] == 0.0
+
+
+def test_a_raising_call_is_timed_and_counted_as_an_error(metrics):
+    @traced("flaky")
+    def flaky(fail: bool):
+        if fail:
+            raise ValueError("boom")
+        return "ok"
+
+    assert flaky(False) == "ok"
+    with pytest.raises(ValueError):
+        flaky(True)
+    stats = metrics.snapshot()["flaky"]
+    assert stats["calls"] == 2 and stats["errors"] == 1
+    assert stats["wall_seconds"]["count"] == 2
+
+
+def test_disabled_tracing_is_a_passthrough(metrics, monkeypatch):
+    monkeypatch.setattr(Metrics, "ENABLED", False)
+
+    @traced("quiet")
+    def add(a, b=1):
+        return a + b
+
+    assert add(2, b=3) == 5 and add.__name__ == "add"
+    record_cache("quiet", True)
+    assert metrics.snapshot() == {}
+
+
+def test_prometheus_text_format(metrics):
+    @traced("nlp_agent")
+    def agent():
+        return None
+
+    for _ in range(3):
+        agent()
+    record_cache("nlp_agent", True)
+    record_cache("nlp_agent", False)
+    record_cache("nlp_agent", False)
+    text = to_prometheus()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert "# TYPE agent_wall_seconds summary" in lines and "# TYPE agent_cpu_seconds summary" in lines
+    assert "# TYPE agent_alloc_blocks summary" not in lines  # only exported when allocations are tracked
+    for q in ("0.50", "0.90", "0.99"):
+        assert any(line.startswith(f'agent_wall_seconds{{agent="nlp_agent",quantile="{q}"}} ') for line in lines)
+    assert 'agent_wall_seconds_count{agent="nlp_agent"} 3' in lines
+    assert 'agent_errors_total{agent="nlp_agent"} 0' in lines
+    assert 'agent_cache_hits_total{agent="nlp_agent"} 1' in lines
+    assert 'agent_cache_misses_total{agent="nlp_agent"} 2' in lines
+    sample = re.compile(r'^[a-z_]+\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\} \S+$')
+    for line in lines:
+        assert line.startswith("# ") or sample.match(line), line
+        if not line.startswith("# "):
+            float(line.rsplit(" ", 1)[1])
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+import pytest
+import Pipeline
+from Pipeline import Stage, StageExecutors, run_stages
+
+
+def test_late_calls_only_hold_their_own_stage():
+    release = threading.Event()
+    pools = StageExecutors(workers_per_stage=2, max_abandoned=1)
+
+    def stages():
+        return [Stage("slow", lambda: release.wait(5.0), budget=0.05, fallback="fallback"),
+                Stage("fast", lambda: "answer", budget=0.05)]
+
+    first = run_stages(stages(), pools)
+    assert first.degraded == {"slow": "timeout"} and first.outputs["fast"] == "answer"
+    assert pools.abandoned() == {"slow": 1}
+    second = run_stages(stages(), pools)
+    assert second.degraded == {"slow": "backlog"} and second.outputs == {"slow": "fallback", "fast": "answer"}
+    release.set()
+    deadline = time.monotonic() + 5.0
+    while pools.abandoned() and time.monotonic() < deadline:  # until the late call returns its worker
+        time.sleep(0.01)
+    assert pools.abandoned() == {}
+    assert run_stages(stages(), pools).outputs["slow"] is True
+
+
+def test_default_executor_is_created_once(monkeypatch):
+    monkeypatch.setattr(Pipeline, "_default_executor", None)
+    barrier, created = threading.Barrier(8), []
+
+    def first_call():
+        barrier.wait()
+        created.append(Pipeline.default_executor())
+
+    threads = [threading.Thread(target=first_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(executor) for executor in created}) == 1
+
+
+@pytest.fixture
+def stall():
+    # A stage body that blocks until the test ends, standing in for a hung camera or `dot` call
+    release = threading.Event()
+    yield lambda **_: release.wait(10.0)
+    release.set()
+
+
+def test_stage_timeout_uses_the_fallback_and_feeds_dependents(stall):
+    run = run_stages([
+        Stage("nlp", stall, budget=0.05, fallback={"key_terms": []}),
+        Stage("diagram", lambda nlp: len(nlp["key_terms"]), ("nlp",)),
+        Stage("memory", stall, ("nlp",), budget=0.05, fallback=lambda nlp: f"fallback for {nlp}"),
+    ], StageExecutors())
+    assert run.degraded == {"nlp": "timeout", "memory": "timeout"}
+    assert run.outputs == {"nlp": {"key_terms": []}, "diagram": 0, "memory": "fallback for {'key_terms': []}"}
+    assert 0.05 <= run.timings["nlp"] < 1.0
+
+
+def test_stage_errors_use_the_fallback():
+    def fail():
+        raise RuntimeError("no camera")
+
+    run = run_stages([Stage("engagement", fail, fallback=0.5),
+                      Stage("adaptive", lambda engagement: engagement * 2, ("engagement",))], StageExecutors())
+    assert run.degraded == {"engagement": "error: RuntimeError('no camera')"}
+    assert run.outputs == {"engagement": 0.5, "adaptive": 1.0}
+
+
+def test_stages_after_the_overall_deadline_are_skipped(stall):
+    calls = []
+    run = run_stages([
+        Stage("nlp", stall, fallback="nlp fallback"),  # no stage budget: bounded by the overall one
+        Stage("diagram", lambda nlp: calls.append(nlp), ("nlp",), fallback="diagram fallback"),
+    ], StageExecutors(), budget=0.05)
+    assert run.degraded == {"nlp": "timeout", "diagram": "over budget"}
+    assert run.outputs == {"nlp": "nlp fallback", "diagram": "diagram fallback"} and calls == []
+    assert 0.05 <= run.total < 1.0
+
+
+def test_unsatisfiable_dependencies_are_an_error():
+    with pytest.raises(ValueError, match="missing"):
+        run_stages([Stage("missing", lambda nlp: nlp, ("nlp",))], StageExecutors())
+
+
+def test_p99_stays_within_the_overall_budget(stall):
+    # Heavy-tailed fake agents: each stalls with some probability, otherwise takes a few milliseconds
+    rng = random.Random(0)
+
+    def agent(median: float, tail_p: float, output):
+        def stage(**_):
+            if rng.random() < tail_p:
+                stall()
+            else:
+                time.sleep(median)
+            return output
+        return stage
+
+    budget, slack = 0.15, 0.1  # slack covers thread wake-ups on a loaded CI machine
+    pools = StageExecutors(workers_per_stage=64, max_abandoned=1000)  # stalls hit their deadline, not a queue
+    latencies, degraded = [], 0
+    for _ in range(100):
+        run = run_stages([
+            Stage("engagement", agent(0.002, 0.05, 0.8), budget=0.02, fallback=0.5),
+            Stage("nlp", agent(0.01, 0.02, {"key_terms": ["light"]}), fallback={"key_terms": []}),
+            Stage("diagram", agent(0.02, 0.1, "concept.png"), ("nlp",), budget=0.1, fallback=None),
+            Stage("memory", agent(0.005, 0.05, "earlier question"), ("nlp",), budget=0.05, fallback=None),
+            Stage("adaptive", lambda engagement, **_: f"response @ {engagement}",
+                  ("engagement", "diagram", "memory"), fallback=lambda engagement, **_: f"response @ {engagement}"),
+        ], pools, budget=budget)
+        assert run.outputs["adaptive"].startswith("response")
+        latencies.append(run.total)
+        degraded += bool(run.degraded)
+    assert degraded > 10  # the tail was exercised
+    assert sorted(latencies)[98] <= budget + slack